@@ -3,11 +3,20 @@ import argparse
 import os
 import sys
 
-import docker
-
-DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCKER_IMAGE_NAME = 'ament_cpplint_linter'
-DOCKERFILE_NAME = 'Dockerfile'
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.diagnostics import reporting
+from ament_lint_pre_commit_hooks.discovery import (GitError, file_source,
+                                                   find_files)
+from ament_lint_pre_commit_hooks.docker_image import (ensure_image,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.filelist import file_arguments
+from ament_lint_pre_commit_hooks.mounts import (CPPLINT_CONTEXT, output_mount,
+                                                source_mounts)
+from ament_lint_pre_commit_hooks.planner import plan_hook, print_plan
+from ament_lint_pre_commit_hooks.profiling import profiling
+from ament_lint_pre_commit_hooks.runner import (DockerBackend,
+                                                add_runner_arguments,
+                                                replay_cached, run_linter)
 
 
 def is_cpp_file(path):
@@ -17,92 +26,80 @@ def is_cpp_file(path):
     return any(filename.endswith('.' + ext) for ext in extensions)
 
 
-def filter_cpp_files(paths, exclude_patterns=None):
+def filter_cpp_files(paths, exclude_patterns=None, source=None):
     """Filter and return only C/C++ files from the input paths."""
-    filtered_files = []
-    exclude_patterns = exclude_patterns or []
-
-    for path in paths:
-        if os.path.isfile(path) and is_cpp_file(path):
-            if not any(exclude in path for exclude in exclude_patterns):
-                filtered_files.append(path)
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if is_cpp_file(file_path):
-                        if not any(exclude in file_path for exclude in exclude_patterns):
-                            filtered_files.append(file_path)
-    return filtered_files
+    return find_files(paths, is_cpp_file, exclude_patterns, source)
+
+
+def collect_files(args):
+    """Return the files selected by the command line arguments."""
+    return filter_cpp_files(args.paths, args.exclude, file_source(args))
+
+
+def build_command(args, cpp_files, cwd):
+    """Return the cpplint command and volumes for the given files."""
+    # Prepare command and volumes
+    cmd = ['ament_cpplint']
+    if args.filters:
+        cmd.extend(['--filter', args.filters])
+    if args.root:
+        cmd.extend(['--root', args.root])
+    if args.output:
+        cmd.extend(['--output', args.output])
+    cmd.extend(['--linelength', str(args.linelength)])
+
+    # Only the directories of the files are mounted, read-only, along with the CPPLINT.cfg
+    # files and repository roots cpplint looks for in their parents
+    volumes = source_mounts(cpp_files, cwd, context=CPPLINT_CONTEXT)
+
+    # Handle xunit file output
+    if args.xunit_file:
+        # The report is written to a dedicated output mount and moved into place afterwards
+        xunit_path, output_volumes = output_mount(args.xunit_file, cwd)
+        cmd.extend(['--xunit-file', xunit_path])
+        volumes.update(output_volumes)
+
+    # Huge or profiled batches are passed in a list file and linted inside the container
+    cmd, file_volumes = file_arguments(cmd, cpp_files, profile=args.profile_files)
+    volumes.update(file_volumes)
+
+    return cmd, volumes
 
 
 def run_cpplint(args):
     """Run cpplint in Docker and properly handle output."""
-    workspace_dir = '/workspace'
-    cpp_files = filter_cpp_files(args.paths, args.exclude)
+    try:
+        cpp_files = collect_files(args)
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if args.plan:
+        return print_plan([plan_hook('ament_cpplint', args, cpp_files)])
+    if not cpp_files:
+        # Nothing to check, so return before loading the docker SDK
+        return 0
+
+    backend = host_backend(args, 'ament_cpplint')
+    if backend is not None:
+        # The linter is installed on the host, so docker is not needed
+        return run_linter(backend, 'ament_cpplint', args, cpp_files, build_command)
+
+    # Results cached for the image are replayed without loading the docker SDK
+    tag = linters_image_tag('ament_cpplint')
+    exit_code = replay_cached('ament_cpplint', args, cpp_files, tag)
+    if exit_code is not None:
+        return exit_code
+
+    import docker
 
-    cwd = os.getcwd()
     client = docker.from_env()
 
     try:
-        # Build the image
-        client.images.build(
-            path=DOCKERFILE_DIR,
-            dockerfile=DOCKERFILE_NAME,
-            tag=DOCKER_IMAGE_NAME,
-        )
-
-        # Prepare command and volumes
-        cmd = ['ament_cpplint']
-        if args.filters:
-            cmd.extend(['--filter', args.filters])
-        if args.root:
-            cmd.extend(['--root', args.root])
-        if args.output:
-            cmd.extend(['--output', args.output])
-        cmd.extend(['--linelength', str(args.linelength)])
-
-        # Handle xunit file output
-        if args.xunit_file:
-            # Create absolute path and ensure directory exists
-            abs_xunit_path = os.path.abspath(args.xunit_file)
-            os.makedirs(os.path.dirname(abs_xunit_path) or '.', exist_ok=True)
-            # Use relative path inside container
-            rel_xunit_path = os.path.relpath(abs_xunit_path, cwd)
-            cmd.extend(['--xunit-file', rel_xunit_path])
-            # Mount as read-write to allow file creation
-            volumes = {cwd: {'bind': workspace_dir, 'mode': 'rw'}}
-        else:
-            volumes = {cwd: {'bind': workspace_dir, 'mode': 'ro'}}
-
-        cmd.extend(cpp_files)
-
-        # Run container with output capture
-        container = client.containers.run(
-            image=DOCKER_IMAGE_NAME,
-            command=cmd,
-            volumes=volumes,
-            working_dir=workspace_dir,
-            remove=False,
-            detach=True
-        )
-
-        # Stream and capture output
-        for line in container.logs(stream=True, follow=True):
-            line = line.decode('utf-8').strip()
-
-            if workspace_dir in line:
-                # Remove the workspace_dir prefix from the path
-                line = line.replace(workspace_dir + '/', '')
-
-            print(line)
-
-        # Get the exit code
-        container.reload()
-        exit_code = container.attrs['State']['ExitCode']
-        container.remove()
+        # Build the image unless it is already available locally
+        image = ensure_image(client, 'ament_cpplint')
 
-        return exit_code
+        return run_linter(
+            DockerBackend(client, image), 'ament_cpplint', args, cpp_files, build_command)
 
     except docker.errors.BuildError as e:
         print(f'Error building Docker image: {e}', file=sys.stderr)
@@ -115,7 +112,8 @@ def run_cpplint(args):
         return 1
 
 
-def main(argv=sys.argv[1:]):
+def create_parser():
+    """Create the command line parser for this hook."""
     extensions = ['c', 'cc', 'cpp', 'cxx']
     headers = ['h', 'hh', 'hpp', 'hxx']
 
@@ -148,8 +146,14 @@ def main(argv=sys.argv[1:]):
     parser.add_argument(
         '--xunit-file',
         help='Generate a xunit compliant XML file')
-    args = parser.parse_args(argv)
-    return run_cpplint(args)
+    add_runner_arguments(parser)
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_cpplint'), reporting(args):
+        return run_cpplint(args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+from ament_lint_pre_commit_hooks import (ament_cpplint, ament_flake8,
+                                         ament_lint_cmake, ament_mypy,
+                                         ament_pep257, ament_uncrustify,
+                                         ament_xmllint)
+from ament_lint_pre_commit_hooks.backends import (host_backend,
+                                                  record_image_toolchain)
+from ament_lint_pre_commit_hooks.cache import CachedRun
+from ament_lint_pre_commit_hooks.diagnostics import reporter, reporting
+from ament_lint_pre_commit_hooks.discovery import (ExcludeMatcher, GitError,
+                                                   file_source, find_files)
+from ament_lint_pre_commit_hooks.docker_image import (ensure_image, image_id,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.mounts import merge_volumes
+from ament_lint_pre_commit_hooks.planner import plan_linter, print_plan
+from ament_lint_pre_commit_hooks.profiling import (phase, profiler, profiling,
+                                                   total_size)
+from ament_lint_pre_commit_hooks.runner import (DockerBackend,
+                                                add_runner_arguments,
+                                                replay_cached,
+                                                run_commands_in_container,
+                                                run_linter)
+from ament_lint_pre_commit_hooks.watch import add_watch_arguments, open_watcher
+
+# Linter name -> (hook module, predicate deciding which files the linter receives)
+LINTERS = {
+    'cpplint': (ament_cpplint, lambda path, args: ament_cpplint.is_cpp_file(path)),
+    'flake8': (ament_flake8, lambda path, args: ament_flake8.is_python_file(path)),
+    'lint_cmake': (ament_lint_cmake, lambda path, args: ament_lint_cmake.is_cmake_file(path)),
+    'mypy': (ament_mypy, lambda path, args: ament_mypy.is_python_file(path)),
+    'pep257': (ament_pep257, lambda path, args: ament_pep257.is_python_file(path)),
+    'uncrustify': (ament_uncrustify, lambda path, args: ament_uncrustify.is_cpp_file(path)),
+    'xmllint': (
+        ament_xmllint, lambda path, args: ament_xmllint.is_xml_file(path, args.extensions)),
+}
+
+# Linters whose result for one file depends on other files
+UNCACHEABLE_LINTERS = {'mypy'}
+
+
+def linter_list(value):
+    """Parse a comma separated list of linter names."""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in LINTERS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f'unknown linters: {", ".join(unknown)}')
+    return names
+
+
+def option_prefix(name):
+    """Return the command line prefix of the options forwarded to a linter."""
+    return '--' + name.replace('_', '-') + '-'
+
+
+def _value_count(parser, option):
+    """Return how many values an option of a parser takes, or None for a variable number."""
+    actions = parser._option_string_actions
+    action = actions.get(option)
+    if action is None:
+        # Long options may be abbreviated
+        matches = {actions[string] for string in actions if string.startswith(option)}
+        if len(matches) != 1:
+            return None
+        action, = matches
+    if action.nargs is None:
+        return 1
+    return action.nargs if isinstance(action.nargs, int) else None
+
+
+def split_linter_arguments(argv):
+    """Split namespaced linter options from the remaining arguments.
+
+    A linter option takes as many of the following arguments as its parser says it does,
+    and options with a variable number of values take those up to the next option. The
+    arguments after them are the hook's own again.
+    """
+    own_argv = []
+    linter_argv = {name: [] for name in LINTERS}
+    parsers = {}
+
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        index += 1
+        name = next((
+            name for name in LINTERS
+            if arg.startswith('--') and arg.startswith(option_prefix(name))), None)
+        if name is None:
+            own_argv.append(arg)
+            continue
+        option = '--' + arg[len(option_prefix(name)):]
+        linter_argv[name].append(option)
+        if '=' in option:
+            continue
+        if name not in parsers:
+            parsers[name] = LINTERS[name][0].create_parser()
+        count = _value_count(parsers[name], option)
+        if count is None:
+            # nargs '?', '*' or '+'
+            while index < len(argv) and not argv[index].startswith('-'):
+                linter_argv[name].append(argv[index])
+                index += 1
+        else:
+            # Values such as the cpplint filter -whitespace/braces may start with a dash
+            linter_argv[name].extend(argv[index:index + count])
+            index += count
+    return own_argv, linter_argv
+
+
+def parse_linter_arguments(name, argv):
+    """Parse the forwarded options of a linter, returning them and any stray paths."""
+    module, _ = LINTERS[name]
+    parser = module.create_parser()
+    parser.prog = f'{parser.prog} {option_prefix(name)}*'
+    parser.set_defaults(paths=[])
+    args = parser.parse_args(argv)
+    stray_paths, args.paths = args.paths, []
+    return args, stray_paths
+
+
+def expand_paths(paths, source=None):
+    """Return every file below the given paths."""
+    return find_files(paths, lambda path: True, source=source)
+
+
+def run_all(args, linter_args, files=None):
+    """Run every selected linter, sharing one container, and report each result separately.
+
+    The candidate files are found below the paths given on the command line unless given.
+    """
+    if files is None:
+        try:
+            files = expand_paths(args.paths, file_source(args))
+        except GitError as e:
+            print(f'Git error: {e}', file=sys.stderr)
+            return 1
+
+    selected = []
+    for name in args.linters:
+        module, predicate = LINTERS[name]
+        module_args = linter_args[name]
+        module_args.paths = [path for path in files if predicate(path, module_args)]
+        if not module_args.paths:
+            continue
+        # The cache options of the combined hook apply to every linter
+        module_args.no_cache = args.no_cache
+        module_args.cache_size = args.cache_size
+        module_args.jobs = args.jobs
+        module_args.persistent = args.persistent
+        module_args.backend = args.backend
+        module_args.profile_files = args.profile_files
+        linter_files = module.collect_files(module_args)
+        if linter_files:
+            selected.append((name, module, module_args, linter_files))
+
+    if not selected:
+        return print_plan([]) if args.plan else 0
+
+    host_selected = []
+    docker_selected = []
+    for name, module, module_args, linter_files in selected:
+        if module is ament_xmllint:
+            # The XML engine checks the files whose schemas are available locally
+            backend, linter_files, docker_files = ament_xmllint.split_files(
+                module_args, linter_files)
+            if docker_files:
+                docker_selected.append((name, module, module_args, docker_files))
+            if backend is not None:
+                host_selected.append((name, module, module_args, linter_files, backend))
+            continue
+        backend = host_backend(args, f'ament_{name}')
+        if backend is None:
+            docker_selected.append((name, module, module_args, linter_files))
+        else:
+            host_selected.append((name, module, module_args, linter_files, backend))
+    # The smallest image providing the linters
+    tag = linters_image_tag(*(f'ament_{name}' for name, *_ in docker_selected))
+
+    if args.plan:
+        return print_plan([
+            *(plan_linter(
+                f'ament_{name}', module_args, linter_files, backend,
+                cacheable=name not in UNCACHEABLE_LINTERS)
+              for name, _, module_args, linter_files, backend in host_selected),
+            *(plan_linter(
+                f'ament_{name}', module_args, linter_files, image=tag,
+                cacheable=name not in UNCACHEABLE_LINTERS)
+              for name, _, module_args, linter_files in docker_selected),
+        ])
+
+    exit_codes = {}
+    for name, module, module_args, linter_files, backend in host_selected:
+        linter_name = f'ament_{name}'
+        if module is ament_mypy:
+            ament_mypy.configure_backend(module_args, backend)
+        # The linter is installed on the host, so it runs without the container
+        if not reporter.enabled:
+            print(f'==> {linter_name} <==', flush=True)
+        if module is ament_uncrustify:
+            # Reformatting applies the diffs of a read-only check on the host
+            exit_codes[linter_name] = ament_uncrustify.lint(backend, module_args, linter_files)
+            continue
+        exit_codes[linter_name] = run_linter(
+            backend, linter_name, module_args, linter_files, module.build_command,
+            cacheable=name not in UNCACHEABLE_LINTERS)
+
+    # Results cached for the image are replayed without loading the docker SDK
+    uncached = []
+    for name, module, module_args, linter_files in docker_selected:
+        linter_name = f'ament_{name}'
+        exit_code = replay_cached(
+            linter_name, module_args, linter_files, tag,
+            cacheable=name not in UNCACHEABLE_LINTERS,
+            header=None if reporter.enabled else f'==> {linter_name} (cached) <==')
+        if exit_code is None:
+            uncached.append((name, module, module_args, linter_files))
+        else:
+            exit_codes[linter_name] = max(exit_codes.get(linter_name, 0), exit_code)
+    if not uncached:
+        return report_exit_codes(exit_codes)
+
+    import docker
+
+    cwd = os.getcwd()
+    client = docker.from_env()
+
+    try:
+        # Build the image unless it is available locally
+        image = ensure_image(client, *(f'ament_{name}' for name, *_ in docker_selected))
+
+        cached_runs = {}
+        commands = []
+        volumes = []
+        reformat = None
+        for name, module, module_args, linter_files in uncached:
+            linter_name = f'ament_{name}'
+            if args.backend == 'auto':
+                # Learn the versions in the image, so that matching host linters can be used
+                record_image_toolchain(client, image, linter_name)
+            if module is ament_uncrustify and module_args.reformat:
+                # The diffs of a read-only check are applied on the host after the others
+                reformat = module_args, linter_files
+                continue
+            if module is ament_mypy:
+                ament_mypy.configure_backend(module_args, DockerBackend(client, image))
+            cached_run = CachedRun.open(
+                linter_name, module_args, linter_files, image_id(client, image),
+                enabled=name not in UNCACHEABLE_LINTERS)
+            exit_codes[linter_name] = max(exit_codes.get(linter_name, 0), cached_run.replay(
+                header=None if reporter.enabled else f'==> {linter_name} (cached) <==',
+                output=reporter.observer(linter_name)))
+            if not cached_run.pending:
+                continue
+            cached_runs[linter_name] = cached_run
+            cmd, linter_volumes = module.build_command(module_args, cached_run.pending, cwd)
+            commands.append(
+                (linter_name, cmd, reporter.observer(linter_name, cached_run.observe)))
+            volumes.append(linter_volumes)
+
+        if commands:
+            pending = [path for run in cached_runs.values() for path in run.pending]
+            with phase('lint', files=len(pending)) as counts:
+                if profiler.enabled:
+                    counts['bytes'] = total_size(pending)
+                run_exit_codes = run_commands_in_container(
+                    client, image, commands, merge_volumes(*volumes), args)
+            for linter_name, exit_code in run_exit_codes.items():
+                cached_runs[linter_name].record(exit_code)
+                exit_codes[linter_name] = max(exit_codes[linter_name], exit_code)
+
+        if reformat is not None:
+            if not reporter.enabled:
+                print('==> ament_uncrustify <==', flush=True)
+            exit_codes['ament_uncrustify'] = max(
+                exit_codes.get('ament_uncrustify', 0),
+                ament_uncrustify.reformat(DockerBackend(client, image), *reformat))
+
+    except docker.errors.BuildError as e:
+        print(f'Error building Docker image: {e}', file=sys.stderr)
+        return 1
+    except docker.errors.APIError as e:
+        print(f'Docker API error: {e}', file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f'Unexpected error: {e}', file=sys.stderr)
+        return 1
+
+    return report_exit_codes(exit_codes)
+
+
+def watch_all(args, linter_args):
+    """Run every selected linter, then again on the files saved since, until interrupted.
+
+    The watcher starts before the first run, so no save is missed, and routes every saved
+    file to the linters handling it. The docker linters run in the persistent container.
+    """
+    args.persistent = True
+    source = file_source(args)
+    exit_code = 0
+    try:
+        with open_watcher(args.paths, args.debounce) as watcher:
+            changed = None
+            while True:
+                if changed is None or changed:
+                    with reporting(args):
+                        exit_code = run_all(args, linter_args, changed)
+                    print('==> watching for changes, press Ctrl+C to stop <==',
+                          file=sys.stderr, flush=True)
+                # Files no selected linter handles, such as editor swap files, are ignored
+                changed = [
+                    path for path in watcher.wait() if os.path.isfile(path) and any(
+                        LINTERS[name][1](path, linter_args[name]) for name in args.linters)]
+                if source is not None and changed:
+                    try:
+                        changed = source.find_files(changed, lambda path: True, ExcludeMatcher())
+                    except GitError as e:
+                        print(f'Git error: {e}', file=sys.stderr)
+                        changed = []
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f'Cannot watch the files: {e}', file=sys.stderr)
+        return 1
+    return exit_code
+
+
+def report_exit_codes(exit_codes):
+    """Print the result of every linter and return the exit code of the hook."""
+    if not reporter.enabled:
+        # Structured output ends with the number of findings per linter and rule instead
+        print('==> summary <==')
+        for name, exit_code in exit_codes.items():
+            status = 'passed' if exit_code == 0 else f'failed (exit code {exit_code})'
+            print(f'{name}: {status}')
+
+    return 1 if any(exit_codes.values()) else 0
+
+
+def create_parser():
+    """Create the command line parser for this hook."""
+    parser = argparse.ArgumentParser(
+        description='Run all ament linters on the given files in a single container. '
+                    'Options of an individual linter are passed with its name as prefix, '
+                    'e.g. --cpplint-linelength 120 or --flake8-config setup.cfg.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        'paths',
+        nargs='*',
+        default=[os.curdir],
+        help='The files or directories to check. Each file is routed to the linters '
+             'that handle its type.')
+    parser.add_argument(
+        '--linters',
+        metavar='LINTER,LINTER,...',
+        type=linter_list,
+        default=list(LINTERS),
+        help=f'A comma separated list of the linters to run, out of {", ".join(LINTERS)}')
+    add_watch_arguments(parser)
+    add_runner_arguments(parser)
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    own_argv, linter_argv = split_linter_arguments(argv)
+    args = create_parser().parse_args(own_argv)
+
+    linter_args = {}
+    for name in LINTERS:
+        linter_args[name], stray_paths = parse_linter_arguments(name, linter_argv[name])
+        # Files given after a flag-style linter option belong to the main path list
+        if stray_paths:
+            if args.paths == [os.curdir]:
+                args.paths = []
+            args.paths.extend(stray_paths)
+
+    with profiling(args, 'ament_lint_all'):
+        if args.watch:
+            return watch_all(args, linter_args)
+        with reporting(args):
+            return run_all(args, linter_args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
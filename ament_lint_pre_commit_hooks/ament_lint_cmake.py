@@ -3,11 +3,19 @@ import argparse
 import os
 import sys
 
-import docker
-
-DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCKER_IMAGE_NAME = 'ament_lint_cmake_linter'
-DOCKERFILE_NAME = 'Dockerfile'
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.diagnostics import reporting
+from ament_lint_pre_commit_hooks.discovery import (GitError, file_source,
+                                                   find_files)
+from ament_lint_pre_commit_hooks.docker_image import (ensure_image,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.filelist import file_arguments
+from ament_lint_pre_commit_hooks.mounts import output_mount, source_mounts
+from ament_lint_pre_commit_hooks.planner import plan_hook, print_plan
+from ament_lint_pre_commit_hooks.profiling import profiling
+from ament_lint_pre_commit_hooks.runner import (DockerBackend,
+                                                add_runner_arguments,
+                                                replay_cached, run_linter)
 
 
 def is_cmake_file(path):
@@ -18,82 +26,76 @@ def is_cmake_file(path):
             filename.endswith('.cmake.in'))
 
 
-def filter_cmake_files(paths):
+def filter_cmake_files(paths, source=None):
     """Filter and return only CMake files from the input paths."""
-    cmake_files = []
-    for path in paths:
-        if os.path.isfile(path) and is_cmake_file(path):
-            cmake_files.append(path)
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if is_cmake_file(file):
-                        cmake_files.append(os.path.join(root, file))
-    return cmake_files if cmake_files else ['.']
+    return find_files(paths, is_cmake_file, source=source)
 
 
-def run_ament_lint_cmake(args):
-    """Run ament_lint_cmake in Docker and properly handle output."""
-    workspace_dir = '/workspace'
-    cmake_files = filter_cmake_files(args.paths)
+def collect_files(args):
+    """Return the files selected by the command line arguments."""
+    return filter_cmake_files(args.paths, file_source(args))
 
-    cwd = os.getcwd()
-    client = docker.from_env()
 
-    try:
-        # Build the image
-        client.images.build(
-            path=DOCKERFILE_DIR,
-            dockerfile=DOCKERFILE_NAME,
-            tag=DOCKER_IMAGE_NAME,
-        )
+def build_command(args, cmake_files, cwd):
+    """Return the ament_lint_cmake command and volumes for the given files."""
+    # Prepare command and volumes
+    cmd = ['ament_lint_cmake']
+    if args.filters:
+        cmd.extend(['--filters', args.filters])
+    cmd.extend(['--linelength', str(args.linelength)])
 
-        # Prepare command and volumes
-        cmd = ['ament_lint_cmake']
-        if args.filters:
-            cmd.extend(['--filters', args.filters])
-        cmd.extend(['--linelength', str(args.linelength)])
-
-        # Set up xunit file handling
-        volumes = {cwd: {'bind': workspace_dir, 'mode': 'rw'}}
-
-        if args.xunit_file:
-            # Create absolute path and ensure directory exists
-            abs_xunit_path = os.path.abspath(args.xunit_file)
-            os.makedirs(os.path.dirname(abs_xunit_path) or '.', exist_ok=True)
-            # Use relative path inside container to avoid workspace prefix
-            rel_path = os.path.relpath(abs_xunit_path, cwd)
-            cmd.extend(['--xunit-file', rel_path])  # Use relative path here
-
-        cmd.extend(cmake_files)
-
-        # Run container with output capture
-        container = client.containers.run(
-            image=DOCKER_IMAGE_NAME,
-            command=cmd,
-            volumes=volumes,
-            working_dir=workspace_dir,
-            remove=False,
-            detach=True
-        )
+    # Only the directories of the files are mounted, read-only
+    volumes = source_mounts(cmake_files, cwd)
 
-        # Stream and capture output
-        for line in container.logs(stream=True, follow=True):
-            line = line.decode('utf-8').strip()
+    # Set up xunit file handling
+    if args.xunit_file:
+        # The report is written to a dedicated output mount and moved into place afterwards
+        xunit_path, output_volumes = output_mount(args.xunit_file, cwd)
+        cmd.extend(['--xunit-file', xunit_path])
+        volumes.update(output_volumes)
 
-            if workspace_dir in line:
-                # Remove the workspace_dir prefix from the path
-                line = line.replace(workspace_dir + '/', '')
+    # Huge or profiled batches are passed in a list file and linted inside the container
+    cmd, file_volumes = file_arguments(cmd, cmake_files, profile=args.profile_files)
+    volumes.update(file_volumes)
 
-            print(line)
+    return cmd, volumes
 
-        # Get the exit code
-        container.reload()
-        exit_code = container.attrs['State']['ExitCode']
-        container.remove()
 
+def run_ament_lint_cmake(args):
+    """Run ament_lint_cmake in Docker and properly handle output."""
+    try:
+        cmake_files = collect_files(args)
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if args.plan:
+        return print_plan([plan_hook('ament_lint_cmake', args, cmake_files)])
+    if not cmake_files:
+        # Nothing to check, so return before loading the docker SDK
+        return 0
+
+    backend = host_backend(args, 'ament_lint_cmake')
+    if backend is not None:
+        # The linter is installed on the host, so docker is not needed
+        return run_linter(backend, 'ament_lint_cmake', args, cmake_files, build_command)
+
+    # Results cached for the image are replayed without loading the docker SDK
+    tag = linters_image_tag('ament_lint_cmake')
+    exit_code = replay_cached('ament_lint_cmake', args, cmake_files, tag)
+    if exit_code is not None:
         return exit_code
 
+    import docker
+
+    client = docker.from_env()
+
+    try:
+        # Build the image unless it is already available locally
+        image = ensure_image(client, 'ament_lint_cmake')
+
+        return run_linter(
+            DockerBackend(client, image), 'ament_lint_cmake', args, cmake_files, build_command)
+
     except docker.errors.BuildError as e:
         print(f'Error building Docker image: {e}', file=sys.stderr)
         return 1
@@ -105,7 +107,8 @@ def run_ament_lint_cmake(args):
         return 1
 
 
-def main(argv=sys.argv[1:]):
+def create_parser():
+    """Create the command line parser for this hook."""
     parser = argparse.ArgumentParser(
         description='Check CMake code against the style conventions.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -135,9 +138,14 @@ def main(argv=sys.argv[1:]):
     parser.add_argument(
         '--xunit-file',
         help='Generate a xunit compliant XML file')
+    add_runner_arguments(parser)
+    return parser
 
-    args = parser.parse_args(argv)
-    return run_ament_lint_cmake(args)
+
+def main(argv=sys.argv[1:]):
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_lint_cmake'), reporting(args):
+        return run_ament_lint_cmake(args)
 
 
 if __name__ == '__main__':
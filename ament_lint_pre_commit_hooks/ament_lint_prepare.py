@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import re
+import sys
+
+from ament_lint_pre_commit_hooks.ament_lint_all import (LINTERS, expand_paths,
+                                                        parse_linter_arguments)
+from ament_lint_pre_commit_hooks.discovery import (GitError,
+                                                   add_discovery_arguments,
+                                                   file_source)
+from ament_lint_pre_commit_hooks.docker_image import ensure_image, image_target
+from ament_lint_pre_commit_hooks.profiling import (add_profile_arguments,
+                                                   profiling)
+
+PRE_COMMIT_CONFIG = '.pre-commit-config.yaml'
+ALL_HOOK = 'ament_lint_all'
+HOOKS = [f'ament_{name}' for name in LINTERS] + [ALL_HOOK]
+
+# Hook ids in a pre-commit config, which is parsed without a YAML library
+_HOOK_ID_RE = re.compile(r'''^\s*(?:-\s*)?id:\s*['"]?([\w-]+)''', re.MULTILINE)
+
+
+def hook_list(value):
+    """Parse a comma separated list of hook names."""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in HOOKS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f'unknown hooks: {", ".join(unknown)}')
+    return names
+
+
+def configured_hooks(path):
+    """Return the ament hooks enabled in a pre-commit config file."""
+    with open(path) as f:
+        return [hook for hook in _HOOK_ID_RE.findall(f.read()) if hook in HOOKS]
+
+
+def linters_with_files(hooks, args):
+    """Return the linters run by the hooks that have files to check."""
+    files = expand_paths(args.paths, file_source(args))
+    linters = []
+    for name, (_, predicate) in LINTERS.items():
+        linter = f'ament_{name}'
+        if linter not in hooks and ALL_HOOK not in hooks:
+            continue
+        linter_args, _ = parse_linter_arguments(name, [])
+        if any(predicate(path, linter_args) for path in files):
+            linters.append(linter)
+    return linters
+
+
+def image_linters(hooks, linters):
+    """Return the linters of every image the hooks use, keyed by Dockerfile target."""
+    images = {}
+    for linter in linters:
+        if linter in hooks:
+            images.setdefault(image_target([linter]), [linter])
+    if ALL_HOOK in hooks and linters:
+        # ament_lint_all runs every linter with files in the image providing all of them
+        images.setdefault(image_target(linters), linters)
+    return images
+
+
+def prepare(args):
+    """Build the images the hooks need in parallel, unless they are available already."""
+    if args.hooks is not None:
+        hooks = args.hooks
+    elif os.path.isfile(args.config):
+        hooks = configured_hooks(args.config)
+    else:
+        hooks = [hook for hook in HOOKS if hook != ALL_HOOK]
+
+    try:
+        images = image_linters(hooks, linters_with_files(hooks, args))
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if not images:
+        # Nothing to check, so return before loading the docker SDK
+        return 0
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    import docker
+
+    client = docker.from_env()
+
+    try:
+        # Hooks started meanwhile wait for these builds instead of starting their own
+        with ThreadPoolExecutor(max_workers=len(images)) as executor:
+            tags = list(executor.map(
+                lambda linters: ensure_image(client, *linters), images.values()))
+
+    except docker.errors.BuildError as e:
+        print(f'Error building Docker image: {e}', file=sys.stderr)
+        return 1
+    except docker.errors.APIError as e:
+        print(f'Docker API error: {e}', file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f'Unexpected error: {e}', file=sys.stderr)
+        return 1
+
+    for tag in tags:
+        print(f'Prepared {tag}')
+    return 0
+
+
+def create_parser():
+    """Create the command line parser for this command."""
+    parser = argparse.ArgumentParser(
+        description='Build the linter images that the ament hooks of a pre-commit config '
+                    'need for the given files, in parallel, before the hooks start.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        'paths',
+        nargs='*',
+        default=[os.curdir],
+        help='The files or directories the hooks will check. Only the images of hooks '
+             'with files to check are built.')
+    parser.add_argument(
+        '--config',
+        metavar='PATH',
+        default=PRE_COMMIT_CONFIG,
+        help='The pre-commit config listing the hooks. Without it, the images of every '
+             'single linter hook are built')
+    parser.add_argument(
+        '--hooks',
+        metavar='HOOK,HOOK,...',
+        type=hook_list,
+        help=f'A comma separated list of the hooks to prepare instead of those in the '
+             f'config, out of {", ".join(HOOKS)}')
+    add_discovery_arguments(parser)
+    add_profile_arguments(parser)
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_lint_prepare'):
+        return prepare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
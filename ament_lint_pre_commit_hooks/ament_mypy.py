@@ -1,19 +1,35 @@
 #!/usr/bin/env python3
 import argparse
 import os
+import posixpath
+import shutil
 import sys
-from typing import List, Optional
-
-import docker
-
-DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCKER_IMAGE_NAME = 'ament_mypy_linter'
-DOCKERFILE_NAME = 'Dockerfile'
+from typing import List, Optional, Tuple
+
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.diagnostics import reporting
+from ament_lint_pre_commit_hooks.discovery import (GitError, GitFileSource,
+                                                   file_source, find_files)
+from ament_lint_pre_commit_hooks.docker_image import (DOCKERFILE_DIR,
+                                                      ensure_image)
+from ament_lint_pre_commit_hooks.filelist import file_arguments
+from ament_lint_pre_commit_hooks.mounts import (CACHE_VOLUME_DIR,
+                                                cache_volume_mount,
+                                                output_mount, workspace_mount)
+from ament_lint_pre_commit_hooks.planner import plan_hook, print_plan
+from ament_lint_pre_commit_hooks.profiling import profiling
+from ament_lint_pre_commit_hooks.runner import (WORKSPACE_DIR, DockerBackend,
+                                                add_runner_arguments,
+                                                run_linter)
 
 MYPY_CONFIG = os.path.join(DOCKERFILE_DIR, 'config', 'ament_mypy.ini')
+# The incremental caches of mypy are kept below this directory of the cache volume
+MYPY_CACHE_DIR = posixpath.join(CACHE_VOLUME_DIR, 'mypy')
 
 # Define file extensions
 PYTHON_EXTENSIONS = ['py']
+# Endings of the files mypy may read while following imports
+MYPY_TREE = ('.py', '.pyi', 'py.typed')
 
 
 def is_python_file(path: str) -> bool:
@@ -23,92 +39,131 @@ def is_python_file(path: str) -> bool:
 
 
 def filter_python_files(
-        paths: List[str], exclude_patterns: Optional[List[str]] = None) -> List[str]:
+        paths: List[str], exclude_patterns: Optional[List[str]] = None,
+        source: Optional[GitFileSource] = None) -> List[str]:
     """Filter and return only Python files from the input paths."""
-    filtered_files = []
-    exclude_patterns = exclude_patterns or []
-
-    for path in paths:
-        if os.path.isfile(path) and is_python_file(path):
-            if not any(exclude in os.path.basename(path) for exclude in exclude_patterns):
-                filtered_files.append(path)
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if is_python_file(file):
-                        if not any(exclude in file for exclude in exclude_patterns):
-                            filtered_files.append(os.path.join(root, file))
-    return filtered_files
+    return find_files(paths, is_python_file, exclude_patterns, source)
+
+
+def collect_files(args: argparse.Namespace) -> List[str]:
+    """Return the files selected by the command line arguments."""
+    return filter_python_files(args.paths, args.excludes, file_source(args))
+
+
+def cache_key(args: argparse.Namespace, toolchain_id: str) -> str:
+    """Return the key of the incremental mypy cache for the config file and the toolchain."""
+    import hashlib
+
+    digest = hashlib.sha256(toolchain_id.encode('utf-8'))
+    if args.config_file:
+        try:
+            with open(args.config_file, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            # mypy reports the missing config file itself
+            pass
+    return digest.hexdigest()[:16]
+
+
+def configure_backend(args: argparse.Namespace, backend) -> None:
+    """Set up the incremental cache and the daemon for the backend checking the files."""
+    args.mypy_cache_key = None if args.no_cache else cache_key(args, backend.toolchain_id())
+    if not args.daemon:
+        return
+    if backend.name == 'docker' and not args.persistent:
+        reason = 'it needs --persistent to outlive the container'
+    elif backend.name == 'inprocess' or (
+            backend.name == 'host' and shutil.which('dmypy') is None):
+        reason = 'dmypy is not available to the host backend'
+    elif args.xunit_file:
+        reason = 'it cannot write an xunit report'
+    else:
+        # A single daemon checks all the files at once
+        args.jobs = 1
+        return
+    print(f'Not using the mypy daemon, {reason}', file=sys.stderr)
+    args.daemon = False
+
+
+def build_command(
+        args: argparse.Namespace, python_files: List[str], cwd: str) -> Tuple[List[str], dict]:
+    """Return the mypy command and volumes for the given files."""
+    key = getattr(args, 'mypy_cache_key', None)
+    if getattr(args, 'daemon', False):
+        # dmypy keeps the state of the last check in memory, in the persistent container or
+        # on the host, so only files that changed since are checked again
+        import hashlib
+
+        status = hashlib.sha256(f'{cwd}\0{key}'.encode('utf-8')).hexdigest()[:12]
+        cmd = ['dmypy', '--status-file', f'/tmp/ament_lint_dmypy_{status}.json', 'run', '--']
+        config_option = '--config-file'
+    else:
+        cmd = ['ament_mypy']
+        config_option = '--config'
+
+    # mypy follows imports through the package tree, so mount the whole workspace read-only,
+    # and copy every module of the tree into the container with the archive transport
+    volumes = workspace_mount(cwd, tree=MYPY_TREE)
+
+    # Handle config file
+    if args.config_file:
+        abs_config_path = os.path.abspath(args.config_file)
+        rel_config_path = os.path.relpath(abs_config_path, cwd)
+        cmd.extend([config_option, f'{WORKSPACE_DIR}/{rel_config_path}'])
+        volumes[abs_config_path] = {'bind': f'{WORKSPACE_DIR}/{rel_config_path}', 'mode': 'ro'}
+
+    # The incremental cache outlives the container in the cache volume
+    if key:
+        cmd.extend(['--cache-dir', posixpath.join(MYPY_CACHE_DIR, key)])
+        volumes.update(cache_volume_mount())
+
+    # Handle xunit file output
+    if args.xunit_file:
+        # The report is written to a dedicated output mount and moved into place afterwards
+        xunit_path, output_volumes = output_mount(args.xunit_file, cwd)
+        cmd.extend(['--xunit-file', xunit_path])
+        volumes.update(output_volumes)
+
+    # Huge or profiled batches are passed in a list file and linted inside the container
+    cmd, file_volumes = file_arguments(cmd, python_files, profile=args.profile_files)
+    volumes.update(file_volumes)
+
+    return cmd, volumes
 
 
 def run_mypy(args: argparse.Namespace) -> int:
     """Run mypy in Docker and properly handle output."""
-    workspace_dir = '/workspace'
-    python_files = filter_python_files(args.paths, args.excludes)
+    try:
+        python_files = collect_files(args)
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if args.plan:
+        return print_plan([plan_hook('ament_mypy', args, python_files, cacheable=False)])
+    if not python_files:
+        # Nothing to check, so return before loading the docker SDK
+        return 0
+
+    backend = host_backend(args, 'ament_mypy')
+    if backend is not None:
+        # The linter is installed on the host, so docker is not needed
+        configure_backend(args, backend)
+        return run_linter(
+            backend, 'ament_mypy', args, python_files, build_command, cacheable=False)
+
+    import docker
 
-    cwd = os.getcwd()
     client = docker.from_env()
 
     try:
-        # Build the image
-        client.images.build(
-            path=DOCKERFILE_DIR,
-            dockerfile=DOCKERFILE_NAME,
-            tag=DOCKER_IMAGE_NAME,
-        )
-
-        # Prepare command and volumes
-        cmd = ['ament_mypy']
+        # Build the image unless it is already available locally
+        image = ensure_image(client, 'ament_mypy')
 
-        # Default to read-only volumes
-        volumes = {cwd: {'bind': workspace_dir, 'mode': 'ro'}}
-
-        # Handle config file
-        if args.config_file:
-            abs_config_path = os.path.abspath(args.config_file)
-            rel_config_path = os.path.relpath(abs_config_path, cwd)
-            cmd.extend(['--config', f'/workspace/{rel_config_path}'])
-            volumes[abs_config_path] = {'bind': f'/workspace/{rel_config_path}', 'mode': 'ro'}
-
-        # Handle xunit file output
-        if args.xunit_file:
-            # Create absolute path and ensure directory exists
-            abs_xunit_path = os.path.abspath(args.xunit_file)
-            os.makedirs(os.path.dirname(abs_xunit_path) or '.', exist_ok=True)
-            # Use relative path inside container
-            rel_xunit_path = os.path.relpath(abs_xunit_path, cwd)
-            cmd.extend(['--xunit-file', f'/workspace/{rel_xunit_path}'])
-            # Need write access for workspace to create xunit file
-            volumes[cwd]['mode'] = 'rw'
-
-        cmd.extend(python_files)
-
-        # Run container with output capture
-        container = client.containers.run(
-            image=DOCKER_IMAGE_NAME,
-            command=cmd,
-            volumes=volumes,
-            working_dir=workspace_dir,
-            remove=False,
-            detach=True
-        )
-
-        # Stream and capture output
-        for line in container.logs(stream=True, follow=True):
-            line = line.decode('utf-8').strip()
-
-            if workspace_dir in line:
-                # Remove the workspace_dir prefix from the path
-                line = line.replace(workspace_dir + '/', '')
-
-            print(line)
-
-        # Get the exit code
-        container.reload()
-        exit_code = container.attrs['State']['ExitCode']
-        container.remove()
-
-        return exit_code
+        backend = DockerBackend(client, image)
+        configure_backend(args, backend)
+        # mypy follows imports, so results of one file depend on other files
+        return run_linter(
+            backend, 'ament_mypy', args, python_files, build_command, cacheable=False)
 
     except docker.errors.BuildError as e:
         print(f'Error building Docker image: {e}', file=sys.stderr)
@@ -121,8 +176,8 @@ def run_mypy(args: argparse.Namespace) -> int:
         return 1
 
 
-def main(argv: List[str] = sys.argv[1:]) -> int:
-    """Command line tool for static type analysis with mypy."""
+def create_parser() -> argparse.ArgumentParser:
+    """Create the command line parser for this hook."""
     parser = argparse.ArgumentParser(
         description='Check code using mypy',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
@@ -152,9 +207,21 @@ def main(argv: List[str] = sys.argv[1:]) -> int:
         '--xunit-file',
         help='Generate a xunit compliant XML file'
     )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Check the files with dmypy, which keeps the type checking state in memory '
+             'between runs. Needs --persistent unless mypy runs on the host'
+    )
+    add_runner_arguments(parser)
+    return parser
+
 
-    args = parser.parse_args(argv)
-    return run_mypy(args)
+def main(argv: List[str] = sys.argv[1:]) -> int:
+    """Command line tool for static type analysis with mypy."""
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_mypy'), reporting(args):
+        return run_mypy(args)
 
 
 if __name__ == '__main__':
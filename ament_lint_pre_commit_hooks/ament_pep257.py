@@ -3,18 +3,25 @@ import argparse
 import os
 import sys
 
-import docker
-import pydocstyle
-
-DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCKER_IMAGE_NAME = 'ament_pep257_linter'
-DOCKERFILE_NAME = 'Dockerfile'
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.diagnostics import reporting
+from ament_lint_pre_commit_hooks.discovery import (GitError, file_source,
+                                                   find_files)
+from ament_lint_pre_commit_hooks.docker_image import (ensure_image,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.filelist import file_arguments
+from ament_lint_pre_commit_hooks.mounts import output_mount, source_mounts
+from ament_lint_pre_commit_hooks.planner import plan_hook, print_plan
+from ament_lint_pre_commit_hooks.profiling import profiling
+from ament_lint_pre_commit_hooks.runner import (DockerBackend,
+                                                add_runner_arguments,
+                                                replay_cached, run_linter)
 
 # Define file extensions
 PYTHON_EXTENSIONS = ['py']
 
-# Setup pydocstyle conventions
-_conventions = set(pydocstyle.conventions.keys())
+# Setup pydocstyle conventions, listed here since pydocstyle itself only runs in the container
+_conventions = {'pep257', 'numpy', 'google'}
 _conventions.add('ament')
 
 _ament_ignore = [
@@ -29,96 +36,84 @@ def is_python_file(path):
     return any(filename.endswith(f'.{ext}') for ext in PYTHON_EXTENSIONS)
 
 
-def filter_python_files(paths, exclude_patterns=None):
+def filter_python_files(paths, exclude_patterns=None, source=None):
     """Filter and return only Python files from the input paths."""
-    filtered_files = []
-    exclude_patterns = exclude_patterns or []
-
-    for path in paths:
-        if os.path.isfile(path) and is_python_file(path):
-            if not any(exclude in os.path.basename(path) for exclude in exclude_patterns):
-                filtered_files.append(path)
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if is_python_file(file):
-                        if not any(exclude in file for exclude in exclude_patterns):
-                            filtered_files.append(os.path.join(root, file))
-    return filtered_files
+    return find_files(paths, is_python_file, exclude_patterns, source)
+
+
+def collect_files(args):
+    """Return the files selected by the command line arguments."""
+    return filter_python_files(args.paths, args.excludes, file_source(args))
+
+
+def build_command(args, python_files, cwd):
+    """Return the pep257 command and volumes for the given files."""
+    # Prepare command and volumes
+    cmd = ['ament_pep257']
+
+    # Add error code selection options
+    if args.ignore:
+        cmd.extend(['--ignore'] + args.ignore)
+    if args.select:
+        cmd.extend(['--select'] + args.select)
+    if args.convention:
+        cmd.extend(['--convention', args.convention])
+    if args.add_ignore:
+        cmd.extend(['--add-ignore'] + args.add_ignore)
+    if args.add_select:
+        cmd.extend(['--add-select'] + args.add_select)
+
+    # Only the directories of the files are mounted, read-only
+    volumes = source_mounts(python_files, cwd)
+
+    # Handle xunit file output
+    if args.xunit_file:
+        # The report is written to a dedicated output mount and moved into place afterwards
+        xunit_path, output_volumes = output_mount(args.xunit_file, cwd)
+        cmd.extend(['--xunit-file', xunit_path])
+        volumes.update(output_volumes)
+
+    # Huge or profiled batches are passed in a list file and linted inside the container
+    cmd, file_volumes = file_arguments(cmd, python_files, profile=args.profile_files)
+    volumes.update(file_volumes)
+
+    return cmd, volumes
 
 
 def run_pep257(args):
     """Run pep257 checks in Docker and properly handle output."""
-    workspace_dir = '/workspace'
-    python_files = filter_python_files(args.paths, args.excludes)
+    try:
+        python_files = collect_files(args)
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if args.plan:
+        return print_plan([plan_hook('ament_pep257', args, python_files)])
+    if not python_files:
+        # Nothing to check, so return before loading the docker SDK
+        return 0
+
+    backend = host_backend(args, 'ament_pep257')
+    if backend is not None:
+        # The linter is installed on the host, so docker is not needed
+        return run_linter(backend, 'ament_pep257', args, python_files, build_command)
+
+    # Results cached for the image are replayed without loading the docker SDK
+    tag = linters_image_tag('ament_pep257')
+    exit_code = replay_cached('ament_pep257', args, python_files, tag)
+    if exit_code is not None:
+        return exit_code
+
+    import docker
 
-    cwd = os.getcwd()
     client = docker.from_env()
 
     try:
-        # Build the image
-        client.images.build(
-            path=DOCKERFILE_DIR,
-            dockerfile=DOCKERFILE_NAME,
-            tag=DOCKER_IMAGE_NAME,
-        )
-
-        # Prepare command and volumes
-        cmd = ['ament_pep257']
-
-        # Add error code selection options
-        if args.ignore:
-            cmd.extend(['--ignore'] + args.ignore)
-        if args.select:
-            cmd.extend(['--select'] + args.select)
-        if args.convention:
-            cmd.extend(['--convention', args.convention])
-        if args.add_ignore:
-            cmd.extend(['--add-ignore'] + args.add_ignore)
-        if args.add_select:
-            cmd.extend(['--add-select'] + args.add_select)
-
-        # Handle xunit file output
-        if args.xunit_file:
-            # Create absolute path and ensure directory exists
-            abs_xunit_path = os.path.abspath(args.xunit_file)
-            os.makedirs(os.path.dirname(abs_xunit_path) or '.', exist_ok=True)
-            # Use relative path inside container
-            rel_xunit_path = os.path.relpath(abs_xunit_path, cwd)
-            cmd.extend(['--xunit-file', rel_xunit_path])
-            # Need write access for xunit file
-            volumes = {cwd: {'bind': workspace_dir, 'mode': 'rw'}}
-        else:
-            volumes = {cwd: {'bind': workspace_dir, 'mode': 'ro'}}
-
-        cmd.extend(python_files)
-
-        # Run container with output capture
-        container = client.containers.run(
-            image=DOCKER_IMAGE_NAME,
-            command=cmd,
-            volumes=volumes,
-            working_dir=workspace_dir,
-            remove=False,
-            detach=True
-        )
-
-        # Stream and capture output
-        for line in container.logs(stream=True, follow=True):
-            line = line.decode('utf-8').strip()
-
-            if workspace_dir in line:
-                # Remove the workspace_dir prefix from the path
-                line = line.replace(workspace_dir + '/', '')
-
-            print(line)
-
-        # Get the exit code
-        container.reload()
-        exit_code = container.attrs['State']['ExitCode']
-        container.remove()
+        # Build the image unless it is already available locally
+        image = ensure_image(client, 'ament_pep257')
 
-        return exit_code
+        return run_linter(
+            DockerBackend(client, image), 'ament_pep257', args, python_files, build_command)
 
     except docker.errors.BuildError as e:
         print(f'Error building Docker image: {e}', file=sys.stderr)
@@ -131,7 +126,8 @@ def run_pep257(args):
         return 1
 
 
-def main(argv=sys.argv[1:]):
+def create_parser():
+    """Create the command line parser for this hook."""
     parser = argparse.ArgumentParser(
         description='Check docstrings against the style conventions in PEP 257.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -184,9 +180,14 @@ def main(argv=sys.argv[1:]):
     parser.add_argument(
         '--xunit-file',
         help='Generate a xunit compliant XML file')
+    add_runner_arguments(parser)
+    return parser
 
-    args = parser.parse_args(argv)
-    return run_pep257(args)
+
+def main(argv=sys.argv[1:]):
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_pep257'), reporting(args):
+        return run_pep257(args)
 
 
 if __name__ == '__main__':
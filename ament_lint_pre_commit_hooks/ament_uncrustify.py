@@ -3,11 +3,24 @@ import argparse
 import os
 import sys
 
-import docker
-
-DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCKER_IMAGE_NAME = 'ament_uncrustify_linter'
-DOCKERFILE_NAME = 'Dockerfile'
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.cache import CachedRun
+from ament_lint_pre_commit_hooks.diagnostics import reporter, reporting
+from ament_lint_pre_commit_hooks.discovery import (GitError, file_source,
+                                                   find_files)
+from ament_lint_pre_commit_hooks.docker_image import (DOCKERFILE_DIR,
+                                                      ensure_image,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.filelist import file_arguments
+from ament_lint_pre_commit_hooks.mounts import output_mount, source_mounts
+from ament_lint_pre_commit_hooks.patches import (apply_hunks,
+                                                 parse_unified_diffs,
+                                                 write_atomically)
+from ament_lint_pre_commit_hooks.planner import plan_hook, print_plan
+from ament_lint_pre_commit_hooks.profiling import phase, profiling
+from ament_lint_pre_commit_hooks.runner import (WORKSPACE_DIR, DockerBackend,
+                                                add_runner_arguments,
+                                                replay_cached, run_linter)
 
 UNCRUSTIFY_CONFIG = os.path.join(DOCKERFILE_DIR, 'config',
                                  'ament_uncrustify.cfg')
@@ -24,113 +37,184 @@ def is_cpp_file(path):
     return any(filename.endswith(f'.{ext}') for ext in all_extensions)
 
 
-def filter_cpp_files(paths, exclude_patterns=None):
+def filter_cpp_files(paths, exclude_patterns=None, source=None):
     """Filter and return only C/C++ files from the input paths."""
-    filtered_files = []
-    exclude_patterns = exclude_patterns or []
-
-    for path in paths:
-        if os.path.isfile(path) and is_cpp_file(path):
-            if not any(exclude in os.path.basename(path) for exclude in exclude_patterns):
-                filtered_files.append(path)
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if is_cpp_file(file):
-                        if not any(exclude in file for exclude in exclude_patterns):
-                            filtered_files.append(os.path.join(root, file))
-    return filtered_files
+    return find_files(paths, is_cpp_file, exclude_patterns, source)
+
+
+def collect_files(args):
+    """Return the files selected by the command line arguments."""
+    return filter_cpp_files(args.paths, args.exclude, file_source(args))
+
+
+def build_command(args, cpp_files, cwd):
+    """Return the uncrustify command and volumes for the given files."""
+    # Prepare command and volumes
+    cmd = ['ament_uncrustify']
+
+    # Add config file
+    if args.config_file:
+        # Get absolute path of config file
+        abs_config_path = os.path.abspath(args.config_file)
+        # Get relative path from working directory
+        rel_config_path = os.path.relpath(abs_config_path, cwd)
+        # Add to command with container path
+        cmd.extend(['-c', f'{WORKSPACE_DIR}/{rel_config_path}'])
+        # Add config file to volumes
+        config_volumes = {
+            abs_config_path: {'bind': f'{WORKSPACE_DIR}/{rel_config_path}', 'mode': 'ro'}
+        }
+    else:
+        config_volumes = {}
 
+    # Add language if specified
+    if args.language:
+        cmd.extend(['-l', args.language])
 
-def run_uncrustify(args):
-    """Run uncrustify in Docker and properly handle output."""
-    workspace_dir = '/workspace'
-    cpp_files = filter_cpp_files(args.paths, args.exclude)
+    # Add reformat option
+    if args.reformat:
+        cmd.append('--reformat')
 
-    cwd = os.getcwd()
-    client = docker.from_env()
+    # Add linelength if specified
+    if args.linelength:
+        cmd.extend(['--linelength', str(args.linelength)])
 
-    try:
-        # Build the image
-        client.images.build(
-            path=DOCKERFILE_DIR,
-            dockerfile=DOCKERFILE_NAME,
-            tag=DOCKER_IMAGE_NAME,
-        )
-
-        # Prepare command and volumes
-        cmd = ['ament_uncrustify']
-
-        # Add config file
-        if args.config_file:
-            # Get absolute path of config file
-            abs_config_path = os.path.abspath(args.config_file)
-            # Get relative path from working directory
-            rel_config_path = os.path.relpath(abs_config_path, cwd)
-            # Add to command with container path
-            cmd.extend(['-c', f'{workspace_dir}/{rel_config_path}'])
-            # Add config file to volumes
-            config_volumes = {
-                abs_config_path: {'bind': f'{workspace_dir}/{rel_config_path}', 'mode': 'ro'}
-            }
-        else:
-            config_volumes = {}
-
-        # Add language if specified
-        if args.language:
-            cmd.extend(['-l', args.language])
-
-        # Add reformat option
-        if args.reformat:
-            cmd.append('--reformat')
-
-        # Add linelength if specified
-        if args.linelength:
-            cmd.extend(['--linelength', str(args.linelength)])
-
-        # Handle xunit file output
-        if args.xunit_file:
-            # Create absolute path and ensure directory exists
-            abs_xunit_path = os.path.abspath(args.xunit_file)
-            os.makedirs(os.path.dirname(abs_xunit_path) or '.', exist_ok=True)
-            # Use relative path inside container
-            rel_xunit_path = os.path.relpath(abs_xunit_path, cwd)
-            cmd.extend(['--xunit-file', rel_xunit_path])
-
-        cmd.extend(cpp_files)
-
-        volumes = {
-            cwd: {'bind': workspace_dir, 'mode': 'rw'},
-            **config_volumes
-        }
+    # Only the directories of the files are mounted, writable when reformatting them
+    volumes = {
+        **source_mounts(cpp_files, cwd, mode='rw' if args.reformat else 'ro'),
+        **config_volumes
+    }
+
+    # Handle xunit file output
+    if args.xunit_file:
+        # The report is written to a dedicated output mount and moved into place afterwards
+        xunit_path, output_volumes = output_mount(args.xunit_file, cwd)
+        cmd.extend(['--xunit-file', xunit_path])
+        volumes.update(output_volumes)
 
-        # Run container with output capture
-        container = client.containers.run(
-            image=DOCKER_IMAGE_NAME,
-            command=cmd,
-            volumes=volumes,
-            working_dir=workspace_dir,
-            remove=False,
-            detach=True
-        )
+    # Huge or profiled batches are passed in a list file and linted inside the container
+    cmd, file_volumes = file_arguments(cmd, cpp_files, profile=args.profile_files)
+    volumes.update(file_volumes)
 
-        # Stream and capture output
-        for line in container.logs(stream=True, follow=True):
-            line = line.decode('utf-8').strip()
+    return cmd, volumes
 
-            if workspace_dir in line:
-                # Remove the workspace_dir prefix from the path
-                line = line.replace(workspace_dir + '/', '')
 
+def _patched(path, hunks):
+    """Return the contents of a file with its diff applied, or None if that failed."""
+    if not hunks:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            text = apply_hunks(f.read().decode('utf-8'), hunks)
+    except (OSError, UnicodeDecodeError):
+        return None
+    return None if text is None else text.encode('utf-8')
+
+
+def _print_output(output):
+    """Print the captured output of a check that failed without a diff to apply."""
+    if not reporter.enabled:
+        for line in output:
             print(line)
 
-        # Get the exit code
-        container.reload()
-        exit_code = container.attrs['State']['ExitCode']
-        container.remove()
 
+def reformat(backend, args, cpp_files):
+    """Fix the code style of the files diverging from it and leave the others untouched.
+
+    The files are only checked by the linter, with read-only mounts and the result cache,
+    and the diffs it prints are applied on the host. Formatted files are thus never
+    rewritten and keep their modification time. Files whose diff cannot be applied are
+    reformatted by the linter itself.
+    """
+    check_args = argparse.Namespace(**vars(args))
+    check_args.reformat = False
+    output = []
+    exit_code = run_linter(
+        backend, 'ament_uncrustify', check_args, cpp_files, build_command,
+        output=reporter.observer('ament_uncrustify', output.append))
+    if exit_code not in (0, 1):
+        _print_output(output)
+        return exit_code
+
+    requested = {os.path.abspath(path): path for path in cpp_files}
+    reformatted = []
+    fallback = []
+    with phase('reformat.apply') as counts:
+        for path, hunks in parse_unified_diffs(output).items():
+            if path not in requested or hunks == []:
+                continue
+            data = _patched(path, hunks)
+            if data is None:
+                fallback.append(requested[path])
+                continue
+            write_atomically(path, data)
+            reformatted.append(requested[path])
+        counts['files'] = len(reformatted)
+    if exit_code and not reformatted and not fallback:
+        # The linter failed for another reason than code style divergence
+        _print_output(output)
         return exit_code
 
+    if reformatted:
+        # Record the new contents as formatted, so that the next check finds them cached
+        CachedRun.open(
+            'ament_uncrustify', check_args, reformatted, backend.toolchain_id()).record(0)
+        if not reporter.enabled:
+            for path in reformatted:
+                print(f'Reformatted {path}')
+
+    fallback_exit_code = 0
+    if fallback:
+        fallback_args = argparse.Namespace(**vars(args))
+        # The report of the check already covers these files
+        fallback_args.xunit_file = None
+        fallback_exit_code = run_linter(
+            backend, 'ament_uncrustify', fallback_args, fallback, build_command)
+    return max(1 if reformatted else 0, fallback_exit_code)
+
+
+def lint(backend, args, cpp_files):
+    """Check the files, or reformat them, with a backend."""
+    if args.reformat:
+        return reformat(backend, args, cpp_files)
+    return run_linter(backend, 'ament_uncrustify', args, cpp_files, build_command)
+
+
+def run_uncrustify(args):
+    """Run uncrustify in Docker and properly handle output."""
+    try:
+        cpp_files = collect_files(args)
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if args.plan:
+        return print_plan([plan_hook('ament_uncrustify', args, cpp_files)])
+    if not cpp_files:
+        # Nothing to check, so return before loading the docker SDK
+        return 0
+
+    backend = host_backend(args, 'ament_uncrustify')
+    if backend is not None:
+        # The linter is installed on the host, so docker is not needed
+        return lint(backend, args, cpp_files)
+
+    if not args.reformat:
+        # Results cached for the image are replayed without loading the docker SDK
+        tag = linters_image_tag('ament_uncrustify')
+        exit_code = replay_cached('ament_uncrustify', args, cpp_files, tag)
+        if exit_code is not None:
+            return exit_code
+
+    import docker
+
+    client = docker.from_env()
+
+    try:
+        # Build the image unless it is already available locally
+        image = ensure_image(client, 'ament_uncrustify')
+
+        return lint(DockerBackend(client, image), args, cpp_files)
+
     except docker.errors.BuildError as e:
         print(f'Error building Docker image: {e}', file=sys.stderr)
         return 1
@@ -142,7 +226,8 @@ def run_uncrustify(args):
         return 1
 
 
-def main(argv=sys.argv[1:]):
+def create_parser():
+    """Create the command line parser for this hook."""
     parser = argparse.ArgumentParser(
         description='Check code style using uncrustify.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -178,13 +263,19 @@ def main(argv=sys.argv[1:]):
     parser.add_argument(
         '--reformat',
         action='store_true',
-        help='Reformat the files in place')
+        help='Reformat the files diverging from the code style in place, leaving the '
+             'others untouched')
     parser.add_argument(
         '--xunit-file',
         help='Generate a xunit compliant XML file')
+    add_runner_arguments(parser)
+    return parser
+
 
-    args = parser.parse_args(argv)
-    return run_uncrustify(args)
+def main(argv=sys.argv[1:]):
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_uncrustify'), reporting(args):
+        return run_uncrustify(args)
 
 
 if __name__ == '__main__':
@@ -3,11 +3,20 @@ import argparse
 import os
 import sys
 
-import docker
-
-DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCKER_IMAGE_NAME = 'ament_xmllint_linter'
-DOCKERFILE_NAME = 'Dockerfile'
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.diagnostics import reporting
+from ament_lint_pre_commit_hooks.discovery import (GitError, file_source,
+                                                   find_files)
+from ament_lint_pre_commit_hooks.docker_image import (ensure_image,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.filelist import file_arguments
+from ament_lint_pre_commit_hooks.mounts import output_mount, source_mounts
+from ament_lint_pre_commit_hooks.planner import plan_linter, print_plan
+from ament_lint_pre_commit_hooks.profiling import profiling
+from ament_lint_pre_commit_hooks.runner import (DockerBackend,
+                                                add_runner_arguments,
+                                                replay_cached, run_linter)
+from ament_lint_pre_commit_hooks.xml_engine import XmlEngineBackend
 
 # Define default file extensions
 default_extensions = ['xml']
@@ -19,84 +28,116 @@ def is_xml_file(path, extensions):
     return any(filename.endswith(f'.{ext}') for ext in extensions)
 
 
-def filter_xml_files(paths, extensions, exclude_patterns=None):
+def filter_xml_files(paths, extensions, exclude_patterns=None, source=None):
     """Filter and return only XML files from the input paths."""
-    filtered_files = []
-    exclude_patterns = exclude_patterns or []
-
-    for path in paths:
-        if os.path.isfile(path) and is_xml_file(path, extensions):
-            if not any(exclude in os.path.basename(path) for exclude in exclude_patterns):
-                filtered_files.append(path)
-        elif os.path.isdir(path):
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if is_xml_file(file, extensions):
-                        if not any(exclude in file for exclude in exclude_patterns):
-                            filtered_files.append(os.path.join(root, file))
-    return filtered_files
+    return find_files(
+        paths, lambda path: is_xml_file(path, extensions), exclude_patterns, source)
+
+
+def collect_files(args):
+    """Return the files selected by the command line arguments."""
+    return filter_xml_files(args.paths, args.extensions, args.exclude, file_source(args))
+
+
+def build_command(args, xml_files, cwd):
+    """Return the xmllint command and volumes for the given files."""
+    # Prepare command and volumes
+    cmd = ['ament_xmllint']
+
+    # Only the directories of the files are mounted, read-only
+    volumes = source_mounts(xml_files, cwd)
+
+    if args.extensions != default_extensions:
+        # The option takes any number of values, so the files follow a separator
+        cmd.extend(['--extensions', *args.extensions, '--'])
+
+    # Handle xunit file output
+    if args.xunit_file:
+        # The report is written to a dedicated output mount and moved into place afterwards
+        xunit_path, output_volumes = output_mount(args.xunit_file, cwd)
+        cmd.extend(['--xunit-file', xunit_path])
+        volumes.update(output_volumes)
+
+    # Huge or profiled batches are passed in a list file and linted inside the container
+    cmd, file_volumes = file_arguments(cmd, xml_files, profile=args.profile_files)
+    volumes.update(file_volumes)
+
+    return cmd, volumes
+
+
+def split_files(args, xml_files):
+    """Return the backend checking files on the host, the files it checks and the others.
+
+    A host linter matching the image checks every file. Otherwise the XML engine checks the
+    files whose schemas are available locally, unless the docker backend is selected or
+    lxml is missing, leaving the files whose schemas would be downloaded to the container.
+    """
+    mode = getattr(args, 'backend', 'docker')
+    if mode != 'inprocess':
+        backend = host_backend(args, 'ament_xmllint')
+        if backend is not None:
+            return backend, xml_files, []
+    if mode not in ('auto', 'inprocess'):
+        return None, [], xml_files
+
+    backend = XmlEngineBackend(args.catalog)
+    if not backend.available():
+        if mode == 'inprocess':
+            print('lxml is not installed, running ament_xmllint in docker', file=sys.stderr)
+        return None, [], xml_files
+    local_files = []
+    remote_files = []
+    for path in xml_files:
+        (local_files if backend.engine.is_local(path) else remote_files).append(path)
+    if remote_files and args.xunit_file:
+        # The report covers every file, so they are all checked in the container
+        return None, [], xml_files
+    return backend, local_files, remote_files
 
 
 def run_xmllint(args):
     """Run xmllint in Docker and properly handle output."""
-    workspace_dir = '/workspace'
-    xml_files = filter_xml_files(args.paths, args.extensions, args.exclude)
+    try:
+        xml_files = collect_files(args)
+    except GitError as e:
+        print(f'Git error: {e}', file=sys.stderr)
+        return 1
+    if not xml_files:
+        # Nothing to check, so return before loading the docker SDK
+        return print_plan([]) if args.plan else 0
+
+    backend, host_files, xml_files = split_files(args, xml_files)
+    tag = linters_image_tag('ament_xmllint')
+    if args.plan:
+        plans = []
+        if host_files:
+            plans.append(plan_linter('ament_xmllint', args, host_files, backend))
+        if xml_files:
+            plans.append(plan_linter('ament_xmllint', args, xml_files, image=tag))
+        return print_plan(plans)
+
+    exit_code = 0
+    if host_files:
+        # The files are checked on the host, so docker is only needed for the others
+        exit_code = run_linter(backend, 'ament_xmllint', args, host_files, build_command)
+    if not xml_files:
+        return exit_code
+
+    # Results cached for the image are replayed without loading the docker SDK
+    cached_exit_code = replay_cached('ament_xmllint', args, xml_files, tag)
+    if cached_exit_code is not None:
+        return max(exit_code, cached_exit_code)
+
+    import docker
 
-    cwd = os.getcwd()
     client = docker.from_env()
 
     try:
-        # Build the image
-        client.images.build(
-            path=DOCKERFILE_DIR,
-            dockerfile=DOCKERFILE_NAME,
-            tag=DOCKER_IMAGE_NAME,
-        )
-
-        # Prepare command and volumes
-        cmd = ['ament_xmllint']
-
-        # Handle xunit file output
-        if args.xunit_file:
-            # Create absolute path and ensure directory exists
-            abs_xunit_path = os.path.abspath(args.xunit_file)
-            os.makedirs(os.path.dirname(abs_xunit_path) or '.', exist_ok=True)
-            # Use relative path inside container
-            rel_xunit_path = os.path.relpath(abs_xunit_path, cwd)
-            cmd.extend(['--xunit-file', rel_xunit_path])
-            # Need write access for xunit file
-            volumes = {cwd: {'bind': workspace_dir, 'mode': 'rw'}}
-        else:
-            volumes = {cwd: {'bind': workspace_dir, 'mode': 'ro'}}
-
-        cmd.extend(xml_files)
-
-        # Run container with output capture
-        container = client.containers.run(
-            image=DOCKER_IMAGE_NAME,
-            command=cmd,
-            volumes=volumes,
-            working_dir=workspace_dir,
-            remove=False,
-            detach=True
-        )
-
-        # Stream and capture output
-        for line in container.logs(stream=True, follow=True):
-            line = line.decode('utf-8').strip()
-
-            if workspace_dir in line:
-                # Remove the workspace_dir prefix from the path
-                line = line.replace(workspace_dir + '/', '')
-
-            print(line)
-
-        # Get the exit code
-        container.reload()
-        exit_code = container.attrs['State']['ExitCode']
-        container.remove()
+        # Build the image unless it is already available locally
+        image = ensure_image(client, 'ament_xmllint')
 
-        return exit_code
+        return max(exit_code, run_linter(
+            DockerBackend(client, image), 'ament_xmllint', args, xml_files, build_command))
 
     except docker.errors.BuildError as e:
         print(f'Error building Docker image: {e}', file=sys.stderr)
@@ -109,7 +150,8 @@ def run_xmllint(args):
         return 1
 
 
-def main(argv=sys.argv[1:]):
+def create_parser():
+    """Create the command line parser for this hook."""
     parser = argparse.ArgumentParser(
         description='Check XML markup using xmllint.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -130,12 +172,23 @@ def main(argv=sys.argv[1:]):
         nargs='*',
         default=default_extensions,
         help='The file extensions of the files to check')
+    parser.add_argument(
+        '--catalog',
+        nargs='*',
+        default=[],
+        help='XML catalogs mapping schema URLs to local files, read before those in '
+             '$XML_CATALOG_FILES or /etc/xml/catalog, for checking files on the host')
     parser.add_argument(
         '--xunit-file',
         help='Generate a xunit compliant XML file')
+    add_runner_arguments(parser)
+    return parser
+
 
-    args = parser.parse_args(argv)
-    return run_xmllint(args)
+def main(argv=sys.argv[1:]):
+    args = create_parser().parse_args(argv)
+    with profiling(args, 'ament_xmllint'), reporting(args):
+        return run_xmllint(args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,342 @@
+import contextlib
+import importlib
+import io
+import os
+import posixpath
+import shutil
+import sys
+
+from ament_lint_pre_commit_hooks.cache import cache_dir
+from ament_lint_pre_commit_hooks.docker_image import image_tag, image_target
+from ament_lint_pre_commit_hooks.filelist import read_file_list
+from ament_lint_pre_commit_hooks.mounts import WORKSPACE_DIR, collect_outputs
+from ament_lint_pre_commit_hooks.profiling import phase
+from ament_lint_pre_commit_hooks.relay import STDERR, STDOUT
+
+BACKEND_ENV = 'AMENT_LINT_BACKEND'
+BACKENDS = ('auto', 'docker', 'host', 'inprocess')
+
+# Linter -> (python distributions, command printing a version) its results depend on
+TOOLCHAINS = {
+    'ament_cpplint': (('ament_cpplint',), None),
+    # The version line of flake8 lists its plugins, such as flake8-quotes, and their versions
+    'ament_flake8': (('ament_flake8', 'flake8'), ('python3', '-m', 'flake8', '--version')),
+    'ament_lint_cmake': (('ament_lint_cmake',), None),
+    'ament_mypy': (('ament_mypy', 'mypy'), None),
+    'ament_pep257': (('ament_pep257', 'pydocstyle'), None),
+    'ament_uncrustify': (('ament_uncrustify',), ('uncrustify', '--version')),
+    'ament_xmllint': (('ament_xmllint',), ('xmllint', '--version')),
+}
+
+# Prints the versions of the toolchains given as JSON, run the same way on the host and in
+# the image so that both are reported alike
+PROBE = '''
+import json
+import subprocess
+import sys
+from importlib import metadata
+
+
+def distribution_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def command_version(cmd):
+    if cmd[0] == 'python3':
+        # Python modules are run with the interpreter probing them
+        cmd = [sys.executable, *cmd[1:]]
+    try:
+        result = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    output = result.stdout
+    lines = output.strip().splitlines()
+    return lines[0] if lines else None
+
+
+versions = {}
+for linter, (distributions, cmd) in json.loads(sys.argv[1]).items():
+    versions[linter] = {name: distribution_version(name) for name in distributions}
+    if cmd:
+        versions[linter][' '.join(cmd)] = command_version(cmd)
+print(json.dumps(versions))
+'''
+
+
+def add_backend_arguments(parser):
+    """Add the option choosing where the linters run."""
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default=os.environ.get(BACKEND_ENV) or 'auto',
+        help='Run the linters in docker, as host processes, or inside the hook process. '
+             'auto uses a linter installed on the host once it is known to have the '
+             f'versions of the linter image (can also be set with {BACKEND_ENV})')
+
+
+def _probe(python, linters):
+    """Return the toolchain versions of linters as seen by a python interpreter."""
+    import json
+    import subprocess
+
+    toolchains = {linter: TOOLCHAINS[linter] for linter in linters}
+    try:
+        result = subprocess.run(
+            [python, '-c', PROBE, json.dumps(toolchains)],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        return json.loads(result.stdout)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return {}
+
+
+def _manifest_path():
+    return os.path.join(cache_dir(), 'toolchains.json')
+
+
+def image_toolchain(linter, image=None):
+    """Return the toolchain versions of a linter in an image, if known.
+
+    The image defaults to the smallest one providing the linter, falling back to the
+    image providing every linter, which ament_lint_all may have probed instead.
+    """
+    import json
+
+    try:
+        with open(_manifest_path()) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    images = [image] if image else [image_tag(image_target([linter])), image_tag()]
+    distributions, cmd = TOOLCHAINS[linter]
+    expected = {*distributions, *([' '.join(cmd)] if cmd else [])}
+    for image in images:
+        versions = manifest.get(image, {}).get(linter)
+        # Versions probed before the toolchain of the linter changed are probed again
+        if versions is not None and set(versions) == expected:
+            return versions
+    return None
+
+
+def record_image_toolchain(client, image, linter):
+    """Probe and store the toolchain versions of the image, if a host backend could use them.
+
+    This runs a container once per image, and only on hosts that have the linter installed.
+    """
+    import json
+
+    if image_toolchain(linter, image) is not None or not (
+            InProcessBackend(linter).available() or HostBackend(linter).available()):
+        return
+    with phase('toolchain.probe', linter=linter):
+        try:
+            output = client.containers.run(
+                image, ['python3', '-c', PROBE, json.dumps(TOOLCHAINS)], remove=True)
+            versions = json.loads(output)
+        except Exception as e:
+            print(f'Could not read the linter versions of the image: {e}', file=sys.stderr)
+            return
+
+    path = _manifest_path()
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest[image] = versions
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def host_backend(args, linter):
+    """Return the host backend to run a linter with, or None to run it in docker."""
+    mode = getattr(args, 'backend', 'docker')
+    if mode == 'docker':
+        return None
+
+    expected = image_toolchain(linter)
+    if mode == 'auto':
+        if expected is None:
+            return None
+        for backend in (InProcessBackend(linter), HostBackend(linter)):
+            if backend.available() and backend.toolchain() == expected:
+                return backend
+        return None
+
+    backend = InProcessBackend(linter) if mode == 'inprocess' else HostBackend(linter)
+    if not backend.available():
+        print(f'{linter} is not installed on the host, running it in docker', file=sys.stderr)
+        return None
+    if expected is not None and backend.toolchain() != expected:
+        print(f'The {linter} versions on the host differ from the linter image, '
+              'so the results may differ as well', file=sys.stderr)
+    return backend
+
+
+def _translate(arg, binds, cwd):
+    """Return the host path of a container path, or arg itself if it is not one."""
+    for bind, host_path in binds:
+        if arg == bind or arg.startswith(bind + '/'):
+            return host_path + arg[len(bind):].replace('/', os.sep)
+    if arg == WORKSPACE_DIR or arg.startswith(WORKSPACE_DIR + '/'):
+        # Config files outside the working directory are given relative to it
+        return os.path.normpath(cwd + arg[len(WORKSPACE_DIR):].replace('/', os.sep))
+    return arg
+
+
+def _host_path(host_path, spec):
+    """Return the host directory of a mount, keeping docker volumes in the hook cache."""
+    if not spec.get('volume'):
+        return host_path
+    path = os.path.join(cache_dir(), 'volumes', host_path)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def host_command(cmd, volumes, cwd):
+    """Return a linter command built for the container with the host paths of its mounts."""
+    binds = sorted(
+        ((posixpath.normpath(spec['bind']), _host_path(host_path, spec))
+         for host_path, spec in volumes.items()),
+        key=lambda bind: len(bind[0]), reverse=True)
+    cmd = [_translate(arg, binds, cwd) for arg in cmd]
+    if cmd[0] == 'python3':
+        # The file list driver needs the interpreter this package is installed in
+        cmd[0] = sys.executable
+    return cmd
+
+
+class HostBackend:
+    """Run a linter installed on the host, such as from a sourced ROS, as a subprocess.
+
+    Commands are built for the container as with docker and their container paths mapped
+    back to the host, so config files, reports and output look the same.
+    """
+
+    name = 'host'
+    # Whether several commands can run at the same time
+    concurrent = True
+
+    def __init__(self, linter):
+        self.linter = linter
+        self._toolchain = None
+
+    def available(self):
+        return shutil.which(self.linter) is not None
+
+    def toolchain(self):
+        """Return the versions of the linter and the tools below it."""
+        if self._toolchain is None:
+            self._toolchain = _probe(self.python(), [self.linter]).get(self.linter)
+        return self._toolchain
+
+    def python(self):
+        return 'python3'
+
+    def toolchain_id(self):
+        """Return what identifies the toolchain in the result cache."""
+        import json
+
+        return f'{self.name}:{json.dumps(self.toolchain(), sort_keys=True)}'
+
+    def session(self, max_workers=None):
+        return contextlib.nullcontext()
+
+    async def run(self, session, cmd, volumes, args, relay):
+        """Run a linter command, relay its output and return its exit code."""
+        try:
+            with phase('linter', command=self.linter, backend=self.name):
+                return await self._run(host_command(cmd, volumes, os.getcwd()), relay)
+        finally:
+            relay.close()
+            collect_outputs(volumes)
+
+    async def _run(self, cmd, relay):
+        import asyncio
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            print(f'Failed to run {self.linter}: {e}', file=sys.stderr)
+            return 1
+
+        async def pump(stream, stream_id):
+            while True:
+                data = await stream.read(64 * 1024)
+                if not data:
+                    break
+                relay.feed(stream_id, data)
+
+        await asyncio.gather(pump(process.stdout, STDOUT), pump(process.stderr, STDERR))
+        return await process.wait()
+
+
+class _RelayWriter(io.TextIOBase):
+    """A text stream passing what is written to it on to an output relay."""
+
+    def __init__(self, relay, stream):
+        self.relay = relay
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.relay.feed(self.stream, text.encode('utf-8', errors='replace'))
+        return len(text)
+
+
+class InProcessBackend(HostBackend):
+    """Run a linter by calling the main function of its ament package in this process.
+
+    This saves starting an interpreter, but only works when the ament packages and the
+    tools below them can be imported by the interpreter this package is installed in.
+    """
+
+    name = 'inprocess'
+    # The output is captured by replacing sys.stdout and sys.stderr
+    concurrent = False
+
+    def available(self):
+        try:
+            importlib.import_module(f'{self.linter}.main')
+        except Exception:
+            return False
+        return True
+
+    def python(self):
+        return sys.executable
+
+    def main_function(self):
+        """Return the function called with the command line arguments of the linter."""
+        return importlib.import_module(f'{self.linter}.main').main
+
+    async def _run(self, cmd, relay):
+        if cmd[0] == sys.executable:
+            # A function call has no ARG_MAX to respect, so pass all the listed files at once
+            cmd = cmd[4:] + read_file_list(cmd[3])
+        main = self.main_function()
+
+        # The relay must not write to the replaced streams, so hold its output back
+        echo, relay.echo = relay.echo, False
+        try:
+            with contextlib.redirect_stdout(_RelayWriter(relay, STDOUT)), \
+                    contextlib.redirect_stderr(_RelayWriter(relay, STDERR)):
+                try:
+                    return main(cmd[1:]) or 0
+                except SystemExit as e:
+                    return e.code if isinstance(e.code, int) else 1
+        finally:
+            # Hold back an unfinished last line as well before writing the output in order
+            relay.close()
+            relay.echo = echo
+            if echo:
+                relay.flush()
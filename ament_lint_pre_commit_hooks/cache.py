@@ -0,0 +1,364 @@
+import contextlib
+import os
+import re
+import sys
+import time
+from typing import Dict, Tuple
+
+from ament_lint_pre_commit_hooks.diagnostics import PARSERS
+from ament_lint_pre_commit_hooks.mounts import is_within
+from ament_lint_pre_commit_hooks.profiling import phase
+
+CACHE_DIR_ENV = 'AMENT_LINT_CACHE_DIR'
+DEFAULT_CACHE_SIZE_MB = 64
+
+# Arguments that do not influence the diagnostics of a single file
+IGNORED_ARGUMENTS = {
+    'paths', 'exclude', 'excludes', 'xunit_file',
+    'persistent', 'idle_timeout', 'no_cache', 'cache_size',
+    'jobs', 'git_files', 'changed_since', 'profile', 'transport', 'format',
+    'backend', 'plan', 'profile_files',
+}
+
+# Leading path token of a diagnostic line, optionally in a unified diff header
+_PATH_RE = re.compile(r'^(?:--- |\+\+\+ )?([^\s:]+)')
+_QUOTED_PATH_RE = re.compile(r"'([^']+)'")
+
+
+def cache_dir():
+    """Return the directory holding the on-disk caches."""
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ament_lint_pre_commit_hooks')
+
+
+@contextlib.contextmanager
+def file_lock(name):
+    """Hold an exclusive lock shared by all hook processes of the user, waiting for it.
+
+    Locks are advisory flocks on files in the cache directory, released by the kernel if
+    the holding process dies. Without fcntl, as on Windows, nothing is locked.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    directory = os.path.join(cache_dir(), 'locks')
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{name}.lock'), 'a') as f:
+        with phase('lock.wait', lock=name):
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def add_cache_arguments(parser):
+    """Add the result cache options shared by every hook."""
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Lint every file even if a cached result exists for it')
+    parser.add_argument(
+        '--cache-size',
+        metavar='MB',
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f'The maximum size of the result cache (directory set by {CACHE_DIR_ENV})')
+
+
+# Path -> ((mtime, size), digest) of the files hashed by this process
+_file_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def file_digest(path):
+    """Return the sha256 hex digest of a file's contents.
+
+    Digests are kept while the file keeps its modification time and size, so planning a
+    run and running it read each file once.
+    """
+    stat_result = os.stat(path)
+    stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+    cached = _file_digests.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    _file_digests[path] = (stamp, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def arguments_digest(name, args, image_id):
+    """Return a digest of everything besides file contents that affects a linter's output."""
+    import hashlib
+
+    digest = hashlib.sha256()
+    digest.update(f'{name}\0{image_id}\0'.encode('utf-8'))
+    for key, value in sorted(vars(args).items()):
+        if key in IGNORED_ARGUMENTS:
+            continue
+        digest.update(f'{key}={value!r}\0'.encode('utf-8'))
+        # Config files are keyed by their contents rather than their path
+        if isinstance(value, str) and os.path.isfile(value):
+            digest.update(file_digest(value).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def implicit_config(name, path, directories=None):
+    """Return the files a linter reads on its own to check a file, besides its arguments.
+
+    These are the CPPLINT.cfg files in the parent directories of a file up to the working
+    directory for cpplint, and the local schemas an XML file references for xmllint.
+    directories keeps the CPPLINT.cfg files found per directory across calls.
+    """
+    if name == 'ament_xmllint':
+        from ament_lint_pre_commit_hooks.xml_engine import local_schemas
+
+        return local_schemas(path)
+    if name != 'ament_cpplint':
+        return []
+    if directories is None:
+        directories = {}
+    cwd = os.getcwd()
+    directory = os.path.dirname(os.path.abspath(path))
+    configs = []
+    while True:
+        if directory not in directories:
+            config = os.path.join(directory, 'CPPLINT.cfg')
+            directories[directory] = config if os.path.isfile(config) else None
+        if directories[directory] is not None:
+            configs.append(directories[directory])
+        parent = os.path.dirname(directory)
+        if directory == cwd or parent == directory or not is_within(parent, cwd):
+            return configs
+        directory = parent
+
+
+class LintCache:
+    """Size-bounded LRU store of per-file lint results."""
+
+    def __init__(self, path, max_size):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_size = max_size
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, passed INTEGER, output TEXT, size INTEGER, last_used REAL)')
+
+    def get(self, key):
+        """Return (passed, output lines) for a key, or None on a miss."""
+        import json
+
+        row = self.connection.execute(
+            'SELECT passed, output FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute(
+                'UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        return bool(row[0]), json.loads(row[1])
+
+    def known(self, keys):
+        """Return the keys that have a result, without counting that as a use."""
+        keys = list(keys)
+        found = set()
+        # Stay below the limit of SQLite on the number of query parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(key for key, in self.connection.execute(
+                f'SELECT key FROM results WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk))
+        return found
+
+    def put_many(self, entries):
+        """Store (key, passed, output lines) entries and evict the least recently used ones."""
+        import json
+
+        now = time.time()
+        rows = []
+        for key, passed, output in entries:
+            data = json.dumps(output)
+            rows.append((key, int(passed), data, len(key) + len(data), now))
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows)
+        self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits its size bound."""
+        total, = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM results').fetchone()
+        if total <= self.max_size:
+            return
+        with self.connection:
+            # Evict down to 90% so that the next few writes do not evict again
+            excess = total - int(self.max_size * 0.9)
+            for key, size in self.connection.execute(
+                    'SELECT key, size FROM results ORDER BY last_used').fetchall():
+                if excess <= 0:
+                    break
+                self.connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                excess -= size
+
+    def close(self):
+        self.connection.close()
+
+
+class CachedRun:
+    """Split a linter run into cached and pending files and record the new results."""
+
+    def __init__(self, cache, name, args, files, image_id):
+        self.cache = cache
+        self.pending = list(files)
+        self.keys = {}
+        self.output = {}
+        # The block of output lines being observed, and whether it holds a finding
+        self.block_path = None
+        self.block = []
+        self.block_finding = False
+        # Whether a finding was about a file that is not part of the run
+        self.unattributed = False
+        if cache is None:
+            return
+        self.parser = PARSERS[name](name)
+
+        import hashlib
+
+        args_digest = arguments_digest(name, args, image_id)
+        directories = {}
+        for path in files:
+            digest = hashlib.sha256(f'{args_digest}\0{path}\0{file_digest(path)}'.encode('utf-8'))
+            # Config files the linter finds on its own are keyed by their contents as well
+            for config in implicit_config(name, path, directories):
+                digest.update(f'\0{config}\0{file_digest(config)}'.encode('utf-8'))
+            self.keys[os.path.normpath(path)] = (path, digest.hexdigest())
+
+    @classmethod
+    def open(cls, name, args, files, image_id, enabled=True):
+        """Return a cached run, or a pass-through run if caching does not apply."""
+        if (not enabled or getattr(args, 'no_cache', False) or
+                getattr(args, 'xunit_file', None) or getattr(args, 'reformat', False) or
+                not files or not all(os.path.isfile(path) for path in files)):
+            return cls(None, name, args, files, image_id)
+        import sqlite3
+
+        max_size = getattr(args, 'cache_size', DEFAULT_CACHE_SIZE_MB) * 1024 * 1024
+        try:
+            cache = LintCache(os.path.join(cache_dir(), 'results.sqlite'), max_size)
+        except (OSError, sqlite3.Error) as e:
+            print(f'Result cache unavailable: {e}', file=sys.stderr)
+            cache = None
+        return cls(cache, name, args, files, image_id)
+
+    def replay(self, header=None, output=None):
+        """Print the cached output of unchanged files and return their combined exit code.
+
+        The lines go to output instead if given.
+        """
+        if self.cache is None:
+            return 0
+        output = output or print
+        exit_code = 0
+        self.pending = []
+        with phase('cache.replay', files=len(self.keys)) as counts:
+            for path, key in self.keys.values():
+                entry = self.cache.get(key)
+                if entry is None:
+                    self.pending.append(path)
+                    continue
+                if header is not None:
+                    print(header)
+                    header = None
+                passed, lines = entry
+                for line in lines:
+                    output(line)
+                if not passed:
+                    exit_code = 1
+            counts['hits'] = len(self.keys) - len(self.pending)
+        if not self.pending:
+            self.cache.close()
+        return exit_code
+
+    def cached_files(self):
+        """Return the files with a cached result, without replaying it."""
+        if self.cache is None:
+            return []
+        known = self.cache.known(key for _, key in self.keys.values())
+        return [path for path, key in self.keys.values() if key in known]
+
+    def close(self):
+        """Close the cache without replaying or recording anything."""
+        if self.cache is not None:
+            self.cache.close()
+
+    def observe(self, line):
+        """Attribute an output line of the linter to the file it is about.
+
+        A line naming a file starts a block, which goes on with the continuation lines
+        (indented details, diff hunks) following it. Only blocks in which the parser of the
+        linter finds a diagnostic are kept, so that informational lines such as the
+        "Done processing <file>" of cpplint are not taken for findings.
+        """
+        if self.cache is None:
+            return
+        path = self._match_path(line)
+        if (line and line[0] not in ' \t+-@') or (path is not None and path != self.block_path):
+            self._end_block()
+            self.block_path = path
+        self.block.append(line)
+        for diagnostic in self.parser.feed(line):
+            if os.path.normpath(diagnostic.path) == self.block_path:
+                self.block_finding = True
+            else:
+                self.unattributed = True
+
+    def _end_block(self):
+        if self.block_finding:
+            self.output.setdefault(self.block_path, []).extend(self.block)
+        self.block_path = None
+        self.block = []
+        self.block_finding = False
+
+    def _match_path(self, line):
+        match = _PATH_RE.match(line)
+        if match and os.path.normpath(match.group(1)) in self.keys:
+            return os.path.normpath(match.group(1))
+        for quoted in _QUOTED_PATH_RE.findall(line):
+            if os.path.normpath(quoted) in self.keys:
+                return os.path.normpath(quoted)
+        return None
+
+    def record(self, exit_code):
+        """Store the results of the pending files once the linter finished."""
+        import sqlite3
+
+        if self.cache is None:
+            return
+        self._end_block()
+        # Only trust pass/fail per file when every finding of a failure belongs to a file
+        if exit_code not in (0, 1) or (
+                exit_code == 1 and (self.unattributed or not self.output)):
+            self.cache.close()
+            return
+        entries = []
+        for path in self.pending:
+            _, key = self.keys[os.path.normpath(path)]
+            output = self.output.get(os.path.normpath(path), [])
+            entries.append((key, exit_code == 0 or not output, output))
+        try:
+            with phase('cache.record', files=len(entries)):
+                self.cache.put_many(entries)
+        except sqlite3.Error as e:
+            print(f'Failed to update the result cache: {e}', file=sys.stderr)
+        self.cache.close()
@@ -0,0 +1,303 @@
+import contextlib
+import posixpath
+import re
+import sys
+
+FORMATS = ('text', 'jsonl', 'sarif')
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+INFORMATION_URI = 'https://github.com/ament/ament_lint'
+
+
+class Diagnostic:
+    """A finding of a linter at a position in a file."""
+
+    __slots__ = ('linter', 'path', 'line', 'column', 'rule', 'severity', 'message')
+
+    def __init__(self, linter, path, line, column, rule, severity, message):
+        self.linter = linter
+        self.path = path
+        self.line = line
+        self.column = column
+        self.rule = rule
+        self.severity = severity
+        self.message = message
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _number(value):
+    """Return a line or column number, or None if the linter did not give a usable one."""
+    return int(value) if value and int(value) > 0 else None
+
+
+class RegexParser:
+    """Parse the diagnostics of a linter that prints each of them on a single line.
+
+    The pattern names the groups path, line and message, and optionally column, rule and
+    severity.
+    """
+
+    def __init__(self, linter, pattern, rule=None, severity='error'):
+        self.linter = linter
+        self.pattern = re.compile(pattern)
+        self.rule = rule
+        self.severity = severity
+
+    def feed(self, line):
+        """Return the diagnostics found on an output line."""
+        match = self.pattern.match(line)
+        if match is None:
+            return []
+        groups = match.groupdict()
+        return [Diagnostic(
+            self.linter, groups['path'], _number(groups['line']),
+            _number(groups.get('column')), groups.get('rule') or self.rule,
+            self.severity_of(groups), groups['message'].strip())]
+
+    def severity_of(self, groups):
+        return groups.get('severity') or self.severity
+
+
+class Flake8Parser(RegexParser):
+    """Parse flake8 output, where W codes are warnings."""
+
+    def __init__(self, linter):
+        super().__init__(
+            linter,
+            r'(?P<path>[^:]+):(?P<line>\d+):(?P<column>\d+): (?P<rule>[A-Z]+\d+) (?P<message>.*)')
+
+    def severity_of(self, groups):
+        return 'warning' if groups['rule'].startswith('W') else 'error'
+
+
+class Pep257Parser:
+    """Parse pydocstyle output, which puts the code and message below the location."""
+
+    _location = re.compile(r'(?P<path>[^:]+):(?P<line>\d+) .*:$')
+    _message = re.compile(r'\s+(?P<rule>D\d+): (?P<message>.*)')
+
+    def __init__(self, linter):
+        self.linter = linter
+        self.location = None
+
+    def feed(self, line):
+        """Return the diagnostics completed by an output line."""
+        match = self._location.match(line)
+        if match is not None:
+            self.location = match.group('path'), _number(match.group('line'))
+            return []
+        match = self._message.match(line)
+        if match is None or self.location is None:
+            return []
+        path, line_number = self.location
+        self.location = None
+        return [Diagnostic(
+            self.linter, path, line_number, None, match.group('rule'), 'error',
+            match.group('message').strip())]
+
+
+class UncrustifyParser:
+    """Parse the unified diffs of uncrustify, reporting every hunk as a divergence."""
+
+    _file = re.compile(r'--- (?P<path>.+?)(?:\t.*)?$')
+    _hunk = re.compile(r'@@ -(?P<line>\d+)(?:,(?P<count>\d+))? \+\d+(?:,\d+)? @@')
+
+    def __init__(self, linter):
+        self.linter = linter
+        self.path = None
+
+    def feed(self, line):
+        """Return the diagnostics found on an output line."""
+        match = self._file.match(line)
+        if match is not None:
+            self.path = match.group('path')
+            return []
+        match = self._hunk.match(line)
+        if match is None or self.path is None:
+            return []
+        count = int(match.group('count') or 1)
+        return [Diagnostic(
+            self.linter, self.path, _number(match.group('line')), None,
+            'code-style-divergence', 'error',
+            f'Code style divergence in {count} line{"s" if count != 1 else ""}')]
+
+
+# Linter -> factory of the parser of its output, taking the linter name
+PARSERS = {
+    'ament_cpplint': lambda linter: RegexParser(
+        linter,
+        r'(?P<path>[^:]+):(?P<line>\d+):\s+(?P<message>.*?)\s+'
+        r'\[(?P<rule>[^\]\s]+)\] \[\d\]$'),
+    'ament_flake8': Flake8Parser,
+    'ament_lint_cmake': lambda linter: RegexParser(
+        linter, r'(?P<path>[^:]+):(?P<line>\d+): (?P<message>.*?) \[(?P<rule>[\w/-]+)\]$'),
+    'ament_mypy': lambda linter: RegexParser(
+        linter,
+        r'(?P<path>[^:]+):(?P<line>\d+):(?:(?P<column>\d+):)? '
+        r'(?P<severity>error|warning|note): (?P<message>.*?)(?:  \[(?P<rule>[\w-]+)\])?$',
+        rule='mypy'),
+    'ament_pep257': Pep257Parser,
+    'ament_uncrustify': UncrustifyParser,
+    'ament_xmllint': lambda linter: RegexParser(
+        linter,
+        r'(?P<path>[^:]+):(?P<line>\d+): (?:.*?: )?'
+        r'(?P<rule>\w+(?: \w+)* (?:error|warning)) : (?P<message>.*)'),
+}
+
+
+class JsonLinesWriter:
+    """Write a JSON object per diagnostic, then one with the rule counts of each linter."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, diagnostic):
+        import json
+
+        self.out.write(json.dumps({'type': 'diagnostic', **diagnostic.as_dict()}) + '\n')
+
+    def close(self, counts):
+        import json
+
+        for linter, rules in counts.items():
+            self.out.write(json.dumps({
+                'type': 'summary', 'linter': linter,
+                'total': sum(rules.values()), 'rules': rules}) + '\n')
+
+
+class SarifWriter:
+    """Stream a SARIF log with a run per linter, written as its diagnostics come in.
+
+    A run is closed, with the rules it reported, when diagnostics of another linter
+    arrive, so a linter whose output is split up gets several runs. The rule counts of
+    every linter are added as properties of the log.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.linter = None
+        self.rules = None
+        self.results = 0
+        self.runs = 0
+        out.write(f'{{"version": "2.1.0", "$schema": "{SARIF_SCHEMA}", "runs": [')
+
+    def write(self, diagnostic):
+        import json
+
+        if diagnostic.linter != self.linter:
+            self._end_run()
+            self.out.write(',\n{"results": [' if self.runs else '\n{"results": [')
+            self.linter = diagnostic.linter
+            self.rules = {}
+            self.results = 0
+            self.runs += 1
+
+        location = {'artifactLocation': {'uri': posixpath.normpath(diagnostic.path)}}
+        if diagnostic.line is not None:
+            location['region'] = {'startLine': diagnostic.line}
+            if diagnostic.column is not None:
+                location['region']['startColumn'] = diagnostic.column
+        result = {
+            'ruleId': diagnostic.rule,
+            'ruleIndex': self.rules.setdefault(diagnostic.rule, len(self.rules)),
+            'level': diagnostic.severity,
+            'message': {'text': diagnostic.message},
+            'locations': [{'physicalLocation': location}],
+        }
+        self.out.write((',\n' if self.results else '\n') + json.dumps(result))
+        self.results += 1
+
+    def _end_run(self):
+        import json
+
+        if self.linter is None:
+            return
+        driver = {
+            'name': self.linter,
+            'informationUri': INFORMATION_URI,
+            'rules': [{'id': rule} for rule in self.rules],
+        }
+        self.out.write(f'\n], "tool": {{"driver": {json.dumps(driver)}}}}}')
+        self.linter = None
+
+    def close(self, counts):
+        import json
+
+        self._end_run()
+        self.out.write(f'\n], "properties": {{"ruleCounts": {json.dumps(counts)}}}}}\n')
+
+
+WRITERS = {'jsonl': JsonLinesWriter, 'sarif': SarifWriter}
+
+
+class Reporter:
+    """Turn linter output into diagnostics written out in a structured format.
+
+    Diagnostics are written as soon as they are parsed, only their number per linter and
+    rule is kept.
+    """
+
+    def __init__(self):
+        self.writer = None
+        self.counts = {}
+
+    @property
+    def enabled(self):
+        return self.writer is not None
+
+    def open(self, output_format, out):
+        self.writer = WRITERS[output_format](out)
+        self.counts = {}
+
+    def close(self):
+        self.writer.close(self.counts)
+        self.writer = None
+
+    def observer(self, linter, sink=None):
+        """Return an output line sink parsing the output of a linter, then passing it on.
+
+        Return sink unchanged if no structured output was requested.
+        """
+        if not self.enabled:
+            return sink
+        parser = PARSERS[linter](linter)
+
+        def observe(line):
+            if sink is not None:
+                sink(line)
+            for diagnostic in parser.feed(line):
+                self.write(diagnostic)
+        return observe
+
+    def write(self, diagnostic):
+        rules = self.counts.setdefault(diagnostic.linter, {})
+        rules[diagnostic.rule] = rules.get(diagnostic.rule, 0) + 1
+        self.writer.write(diagnostic)
+
+
+reporter = Reporter()
+
+
+def add_format_arguments(parser):
+    """Add the option choosing how the findings are printed."""
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='text',
+        help='Print the output of the linters as is, or their findings as JSON Lines or as '
+             'a SARIF log, followed by the number of findings per rule')
+
+
+@contextlib.contextmanager
+def reporting(args):
+    """Write the findings of the enclosed hook run in the format requested by the arguments."""
+    output_format = getattr(args, 'format', 'text')
+    if output_format == 'text':
+        yield
+        return
+    reporter.open(output_format, sys.stdout)
+    try:
+        yield
+    finally:
+        reporter.close()
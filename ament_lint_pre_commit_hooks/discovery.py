@@ -0,0 +1,303 @@
+import fnmatch
+import os
+import re
+
+from ament_lint_pre_commit_hooks.profiling import phase, profiler, total_size
+
+# Directories that never contain sources to lint
+VCS_DIRECTORIES = {'.git', '.hg', '.svn', '.bzr'}
+# Marker files colcon and ament use to skip a directory (colcon puts one in build/install/log)
+IGNORE_MARKERS = {'COLCON_IGNORE', 'AMENT_IGNORE', 'CATKIN_IGNORE'}
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+def _translate_path_glob(pattern):
+    """Translate a gitignore-style path glob into a regular expression."""
+    parts = []
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith('**/', index):
+            parts.append('(?:.*/)?')
+            index += 3
+        elif pattern.startswith('**', index):
+            parts.append('.*')
+            index += 2
+        elif pattern[index] == '*':
+            parts.append('[^/]*')
+            index += 1
+        elif pattern[index] == '?':
+            parts.append('[^/]')
+            index += 1
+        elif pattern[index] == '[':
+            end = pattern.find(']', index + 1)
+            if end == -1:
+                parts.append(re.escape('['))
+                index += 1
+            else:
+                parts.append(fnmatch.translate(pattern[index:end + 1])[4:-3])
+                index = end + 1
+        else:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+    return ''.join(parts)
+
+
+class ExcludeMatcher:
+    """Exclude patterns compiled once into two regular expressions.
+
+    A pattern without a slash is matched against every file and directory name, a pattern
+    with a slash against the normalized path. Plain patterns match as substrings, as the
+    hooks always did, while patterns with glob characters or a leading slash follow
+    gitignore rules. A trailing slash restricts a pattern to directories.
+    """
+
+    def __init__(self, patterns=None):
+        name_patterns = {False: [], True: []}
+        path_patterns = {False: [], True: []}
+        for pattern in patterns or []:
+            directory_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            if not pattern:
+                continue
+            is_glob = _GLOB_CHARS.search(pattern) is not None
+            if '/' in pattern:
+                if pattern.startswith('/'):
+                    regex = _translate_path_glob(pattern.lstrip('/'))
+                elif is_glob:
+                    # Like gitignore, but also matching below absolute or ../ path arguments
+                    regex = '(?:.*/)?' + _translate_path_glob(pattern)
+                else:
+                    regex = '.*' + re.escape(pattern) + '.*'
+                path_patterns[directory_only].append(regex)
+            elif is_glob:
+                name_patterns[directory_only].append(fnmatch.translate(pattern)[4:-3])
+            else:
+                name_patterns[directory_only].append('.*' + re.escape(pattern) + '.*')
+
+        def compile_patterns(regexes):
+            return re.compile('(?s:' + '|'.join(regexes) + r')\Z') if regexes else None
+
+        self._file_names = compile_patterns(name_patterns[False])
+        self._dir_names = compile_patterns(name_patterns[False] + name_patterns[True])
+        self._file_paths = compile_patterns(path_patterns[False])
+        self._dir_paths = compile_patterns(path_patterns[False] + path_patterns[True])
+
+    def excludes_file(self, path, name):
+        """Check whether a file is excluded."""
+        return self._matches(self._file_names, self._file_paths, path, name)
+
+    def excludes_directory(self, path, name):
+        """Check whether a directory, and so everything below it, is excluded."""
+        return self._matches(self._dir_names, self._dir_paths, path, name)
+
+    @staticmethod
+    def _matches(names, paths, path, name):
+        if names is not None and names.match(name):
+            return True
+        return paths is not None and paths.match(os.path.normpath(path).replace(os.sep, '/'))
+
+
+class GitError(Exception):
+    """Raised when files cannot be listed with git."""
+
+
+def add_discovery_arguments(parser):
+    """Add the options selecting where candidate files come from."""
+    parser.add_argument(
+        '--git-files',
+        action='store_true',
+        help='Take the candidate files from the git index instead of walking the given '
+             'directories, so that untracked files and build artifacts are never scanned')
+    parser.add_argument(
+        '--changed-since',
+        metavar='REF',
+        help='Only check files changed since the merge base of REF and HEAD, including '
+             'uncommitted and untracked files not ignored by git')
+
+
+def file_source(args):
+    """Return the git file source selected by the command line arguments, if any."""
+    changed_since = getattr(args, 'changed_since', None)
+    if changed_since or getattr(args, 'git_files', False):
+        return GitFileSource(changed_since)
+    return None
+
+
+def _git(*args):
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            ['git', '--literal-pathspecs', *args], stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, check=True)
+    except FileNotFoundError:
+        raise GitError('git is not installed')
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.decode(errors='replace').strip() or str(e))
+    return result.stdout
+
+
+def _git_paths(command, *args):
+    return [os.fsdecode(path) for path in _git(command, '-z', *args).split(b'\0') if path]
+
+
+class GitFileSource:
+    """List candidate files with git, without a stat call per file."""
+
+    def __init__(self, changed_since=None):
+        self.changed_since = changed_since
+
+    def list_files(self, paths):
+        """Return the tracked, or changed, files below the given paths relative to cwd."""
+        pathspecs = ['--', *paths]
+        if not self.changed_since:
+            deleted = set(_git_paths('ls-files', '--deleted', *pathspecs))
+            return [path for path in _git_paths('ls-files', '--cached', *pathspecs)
+                    if path not in deleted]
+
+        merge_base = _git('merge-base', self.changed_since, 'HEAD').decode().strip()
+        # git diff prints paths relative to the top level, ls-files relative to cwd
+        toplevel = os.fsdecode(_git('rev-parse', '--show-toplevel').rstrip(b'\n'))
+        cwd = os.getcwd()
+        changed = [
+            os.path.relpath(os.path.join(toplevel, path), cwd) for path in _git_paths(
+                'diff', '--name-only', '--diff-filter=d', merge_base, *pathspecs)]
+        untracked = _git_paths('ls-files', '--others', '--exclude-standard', *pathspecs)
+        seen = set(changed)
+        return changed + [path for path in untracked if path not in seen]
+
+    def find_files(self, paths, predicate, matcher):
+        """Return the listed files accepted by a predicate and not excluded."""
+        files = self.list_files(paths)
+
+        ignored_directories = {
+            os.path.dirname(path) for path in files
+            if os.path.basename(path) in IGNORE_MARKERS}
+        excluded_directories = {}
+
+        def is_excluded_directory(directory):
+            if directory in ('', os.curdir, os.pardir) or \
+                    os.path.basename(directory) == os.pardir:
+                return False
+            if directory not in excluded_directories:
+                excluded_directories[directory] = \
+                    directory in ignored_directories or \
+                    matcher.excludes_directory(directory, os.path.basename(directory)) or \
+                    is_excluded_directory(os.path.dirname(directory))
+            return excluded_directories[directory]
+
+        return [
+            path for path in files
+            if predicate(path) and
+            not matcher.excludes_file(path, os.path.basename(path)) and
+            not is_excluded_directory(os.path.dirname(path))]
+
+
+def _directory_key(stat_result):
+    return stat_result.st_dev, stat_result.st_ino
+
+
+def find_files(paths, predicate, exclude_patterns=None, source=None):
+    """Return the files below the given paths accepted by a predicate and not excluded.
+
+    Directories are walked with os.scandir and excluded, VCS and colcon-ignored directories
+    are pruned before descending. Files reachable through several of the given paths, or
+    through symlinks, are returned only once. A git file source replaces the walk.
+    """
+    with phase('discovery', source='walk' if source is None else 'git') as counts:
+        files = _find_files(paths, predicate, exclude_patterns, source)
+        counts['files'] = len(files)
+        if profiler.enabled:
+            counts['bytes'] = total_size(files)
+    return files
+
+
+def _in_excluded_directory(matcher, path):
+    """Check whether one of the directories in a path given on the command line is excluded."""
+    directory = os.path.dirname(os.path.normpath(path))
+    while directory and os.path.basename(directory) not in ('', os.curdir, os.pardir):
+        if matcher.excludes_directory(directory, os.path.basename(directory)):
+            return True
+        directory = os.path.dirname(directory)
+    return False
+
+
+def _find_files(paths, predicate, exclude_patterns, source):
+    matcher = exclude_patterns if isinstance(exclude_patterns, ExcludeMatcher) \
+        else ExcludeMatcher(exclude_patterns)
+    if source is not None:
+        return source.find_files(paths, predicate, matcher)
+
+    found = []
+    seen_files = set()
+    seen_directories = set()
+
+    def add_file(path, name, directory_key):
+        if not predicate(path) or matcher.excludes_file(path, name):
+            return
+        key = (directory_key, name)
+        if key not in seen_files:
+            seen_files.add(key)
+            found.append(path)
+
+    def add_symlinked_file(path, name):
+        real_path = os.path.realpath(path)
+        try:
+            directory_key = _directory_key(os.stat(os.path.dirname(real_path)))
+        except OSError:
+            return
+        if not predicate(path) or matcher.excludes_file(path, name):
+            return
+        key = (directory_key, os.path.basename(real_path))
+        if key not in seen_files:
+            seen_files.add(key)
+            found.append(path)
+
+    def walk(root, root_key):
+        stack = [(root, root_key)]
+        while stack:
+            directory, directory_key = stack.pop()
+            try:
+                with os.scandir(directory) as scanner:
+                    entries = list(scanner)
+            except OSError:
+                continue
+            if any(entry.name in IGNORE_MARKERS for entry in entries):
+                continue
+            subdirectories = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in VCS_DIRECTORIES or \
+                            matcher.excludes_directory(entry.path, entry.name):
+                        continue
+                    key = _directory_key(entry.stat(follow_symlinks=False))
+                    if key not in seen_directories:
+                        seen_directories.add(key)
+                        subdirectories.append((entry.path, key))
+                elif entry.is_symlink():
+                    if entry.is_file():
+                        add_symlinked_file(entry.path, entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    add_file(entry.path, entry.name, directory_key)
+            # Visit subdirectories in listing order
+            stack.extend(reversed(subdirectories))
+
+    for path in paths:
+        if _in_excluded_directory(matcher, path):
+            # Explicit paths below an excluded directory are skipped like those walked
+            continue
+        if os.path.isdir(path):
+            if matcher.excludes_directory(path, os.path.basename(os.path.normpath(path))):
+                continue
+            key = _directory_key(os.stat(path))
+            if key not in seen_directories:
+                seen_directories.add(key)
+                walk(path, key)
+        elif os.path.isfile(path):
+            name = os.path.basename(path)
+            if os.path.islink(path):
+                add_symlinked_file(path, name)
+            else:
+                add_file(path, name, _directory_key(os.stat(os.path.dirname(path) or os.curdir)))
+    return found
@@ -0,0 +1,148 @@
+import functools
+import os
+from typing import Dict
+
+from ament_lint_pre_commit_hooks.cache import cache_dir, file_lock
+from ament_lint_pre_commit_hooks.profiling import phase
+
+DOCKERFILE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOCKERFILE_NAME = 'Dockerfile'
+DOCKER_IMAGE_REPOSITORY = 'ament_lint_pre_commit_hooks'
+
+PACKAGE_NAME = 'ament_lint_pre_commit_hooks'
+
+# Linter -> Dockerfile target holding only its linter family and their runtime
+LINTER_TARGETS = {
+    'ament_cpplint': 'cpp',
+    'ament_flake8': 'python',
+    'ament_lint_cmake': 'cmake',
+    'ament_mypy': 'python',
+    'ament_pep257': 'python',
+    'ament_uncrustify': 'cpp',
+    'ament_xmllint': 'xml',
+}
+# The target holding every linter
+FULL_TARGET = 'all'
+TARGETS = ('cpp', 'python', 'cmake', 'xml', FULL_TARGET)
+
+
+def package_version():
+    """Return the installed version of this package."""
+    from importlib import metadata
+
+    try:
+        return metadata.version(PACKAGE_NAME)
+    except metadata.PackageNotFoundError:
+        return '0+unknown'
+
+
+def image_target(linters=()):
+    """Return the smallest Dockerfile target providing all the given linters."""
+    targets = {LINTER_TARGETS[linter] for linter in linters}
+    return targets.pop() if len(targets) == 1 else FULL_TARGET
+
+
+@functools.lru_cache(maxsize=None)
+def _dockerfile_digest():
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(os.path.join(DOCKERFILE_DIR, DOCKERFILE_NAME), 'rb') as f:
+        digest.update(f.read())
+    digest.update(b'\0')
+    digest.update(package_version().encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def image_tag(target=FULL_TARGET):
+    """Return the tag of a target image, derived from the Dockerfile and package version."""
+    return f'{DOCKER_IMAGE_REPOSITORY}:{target}-{_dockerfile_digest()}'
+
+
+def linters_image_tag(*linters):
+    """Return the tag of the smallest image providing the linters."""
+    return image_tag(image_target(linters))
+
+
+def tag_target(tag):
+    """Return the Dockerfile target of an image tag."""
+    return tag.rpartition(':')[2].split('-', 1)[0]
+
+
+# Image tag -> image id, filled in while checking for the image
+_image_ids: Dict[str, str] = {}
+
+
+def _image_manifest_path():
+    return os.path.join(cache_dir(), 'images.json')
+
+
+def known_image_id(tag):
+    """Return the id the image had when a hook last used it, without asking docker."""
+    import json
+
+    try:
+        with open(_image_manifest_path()) as f:
+            return json.load(f).get(tag)
+    except (OSError, ValueError):
+        return None
+
+
+def _remember_image_id(tag, image_id):
+    import json
+
+    path = _image_manifest_path()
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get(tag) == image_id:
+        return
+    manifest[tag] = image_id
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Hook processes running in parallel each write a complete file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def ensure_image(client, *linters):
+    """Return the tag of the smallest image providing the linters, building it if missing.
+
+    Without linters, the image providing every linter is returned. Hook processes started
+    in parallel by pre-commit build a missing image only once: one of them builds it while
+    the others wait for the build lock, then find the image.
+    """
+    import docker
+
+    target = image_target(linters)
+    tag = image_tag(target)
+    try:
+        with phase('image.get'):
+            image = client.images.get(tag)
+    except docker.errors.ImageNotFound:
+        with file_lock(f'image-{tag.replace(":", "-")}'):
+            try:
+                with phase('image.get'):
+                    image = client.images.get(tag)
+            except docker.errors.ImageNotFound:
+                with phase('image.build', target=target):
+                    image, _ = client.images.build(
+                        path=DOCKERFILE_DIR,
+                        dockerfile=DOCKERFILE_NAME,
+                        target=target,
+                        tag=tag,
+                    )
+    _image_ids[tag] = image.id
+    # Planning later runs looks up cached results with the id without calling docker
+    _remember_image_id(tag, image.id)
+    return tag
+
+
+def image_id(client, tag):
+    """Return the id of a local image, which changes whenever the image is rebuilt."""
+    if tag not in _image_ids:
+        _image_ids[tag] = client.images.get(tag).id
+    return _image_ids[tag]
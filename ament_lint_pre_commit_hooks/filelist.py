@@ -0,0 +1,175 @@
+import os
+import posixpath
+import sys
+import tempfile
+import time
+
+# This module also runs inside the containers, so it only imports the standard library
+# and, when merging reports, the xunit module mounted next to it
+
+PACKAGE_NAME = 'ament_lint_pre_commit_hooks'
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# File lists and the modules reading them are mounted below this path
+FILE_LIST_DIR = '/ament_lint_file_list'
+# Beyond this many bytes of paths, the files are passed in a list file instead of as arguments
+INLINE_FILES_LIMIT = 64 * 1024
+# Budget of the linter command lines when the container does not report its ARG_MAX
+DEFAULT_ARG_MAX = 128 * 1024
+# Modules of this package the container needs to run a linter on a file list
+CONTAINER_MODULES = ('__init__.py', 'filelist.py', 'xunit.py')
+
+# Prefix of the lines reporting the cost of linting a file, removed from the output
+FILE_COST_PREFIX = '#ament_lint_file_cost '
+
+_BOOTSTRAP = (
+    'import sys; '
+    f'sys.path.insert(0, {FILE_LIST_DIR!r}); '
+    f'from {PACKAGE_NAME}.filelist import main; '
+    'sys.exit(main())'
+)
+_PROFILE_BOOTSTRAP = _BOOTSTRAP.replace('main()', 'main(profile=True)')
+
+
+def _arguments_size(args):
+    """Return the space arguments take in the argument area, with their argv pointers."""
+    return sum(len(os.fsencode(arg)) + 1 + 8 for arg in args)
+
+
+def needs_file_list(files):
+    """Check whether the files are too many to be appended to a linter command."""
+    return _arguments_size(files) > INLINE_FILES_LIMIT
+
+
+def file_arguments(cmd, files, profile=False):
+    """Return the command running cmd on the files, and the mounts it needs.
+
+    A few files are appended to the command. Larger batches are written to a list file
+    mounted into the container, where they are passed to the linter in chunks that fit
+    on its command line, so a single container handles any number of files. To profile
+    the files, they are always listed and linted one at a time.
+    """
+    if not profile and not needs_file_list(files):
+        return [*cmd, *files], {}
+
+    fd, list_path = tempfile.mkstemp(prefix='ament_lint_files_')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b''.join(os.fsencode(path) + b'\0' for path in files))
+    bind = posixpath.join(FILE_LIST_DIR, os.path.basename(list_path))
+
+    # collect_outputs removes the list file once the container is done
+    volumes = {list_path: {'bind': bind, 'mode': 'ro', 'file_list': True}}
+    for name in CONTAINER_MODULES:
+        volumes[os.path.join(PACKAGE_DIR, name)] = {
+            'bind': posixpath.join(FILE_LIST_DIR, PACKAGE_NAME, name),
+            'mode': 'ro',
+        }
+    return ['python3', '-c', _PROFILE_BOOTSTRAP if profile else _BOOTSTRAP, bind, *cmd], volumes
+
+
+def read_file_list(path):
+    """Return the paths of a list file written by file_arguments."""
+    with open(path, 'rb') as f:
+        return [os.fsdecode(entry) for entry in f.read().split(b'\0') if entry]
+
+
+def chunk_files(files, budget):
+    """Split files into consecutive chunks whose arguments fit in budget bytes."""
+    chunk = []
+    size = 0
+    for path in files:
+        path_size = _arguments_size([path])
+        if chunk and size + path_size > budget:
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(path)
+        size += path_size
+    if chunk:
+        yield chunk
+
+
+def _argument_budget(cmd):
+    """Return how many bytes of file arguments fit on the command line next to cmd."""
+    try:
+        arg_max = os.sysconf('SC_ARG_MAX')
+    except (AttributeError, ValueError, OSError):
+        arg_max = -1
+    if arg_max <= 0:
+        arg_max = DEFAULT_ARG_MAX
+    environment = [f'{key}={value}' for key, value in os.environ.items()]
+    # Keep half of the limit as headroom for whatever the linter itself executes
+    return max(4096, arg_max // 2 - _arguments_size(cmd) - _arguments_size(environment))
+
+
+def _run_profiled(cmd, path):
+    """Run cmd on a file and report its wall time and peak memory after its output.
+
+    The peak memory includes the processes the linter ran and waited for.
+    """
+    import json
+    import subprocess
+
+    start = time.monotonic()
+    process = subprocess.Popen(cmd + [path])
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.monotonic() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    record = {
+        'linter': os.path.basename(cmd[0]),
+        'file': path,
+        'seconds': round(seconds, 6),
+        'max_rss_kb': max_rss_kb,
+        'exit_code': process.returncode,
+    }
+    sys.stdout.flush()
+    print(FILE_COST_PREFIX + json.dumps(record), file=sys.stderr, flush=True)
+    return process.returncode
+
+
+def main(argv=sys.argv[1:], profile=False):
+    """Run a linter command on the files of a list file and return the worst exit code.
+
+    Expects the container path of the list file followed by the linter command. When
+    profiling, the linter runs once per file and reports what each file cost.
+    """
+    import subprocess
+
+    list_path, cmd = argv[0], argv[1:]
+    files = read_file_list(list_path)
+    if profile:
+        chunks = [[path] for path in files]
+    else:
+        chunks = list(chunk_files(files, _argument_budget(cmd)))
+
+    xunit_index = cmd.index('--xunit-file') + 1 if '--xunit-file' in cmd else None
+    reports = []
+    exit_code = 0
+    for index, chunk in enumerate(chunks):
+        chunk_cmd = list(cmd)
+        if xunit_index is not None and len(chunks) > 1:
+            # Every chunk writes its own report, merged into the requested one afterwards
+            root, ext = os.path.splitext(cmd[xunit_index])
+            chunk_cmd[xunit_index] = f'{root}.chunk{index}{ext}'
+            reports.append(chunk_cmd[xunit_index])
+        if profile:
+            returncode = _run_profiled(chunk_cmd, chunk[0])
+        else:
+            returncode = subprocess.call(chunk_cmd + chunk)
+        # A linter killed by a signal reports it like a shell would
+        exit_code = max(exit_code, returncode if returncode >= 0 else 128 - returncode)
+
+    if reports:
+        from ament_lint_pre_commit_hooks.xunit import merge_xunit_files
+
+        reports = [path for path in reports if os.path.isfile(path)]
+        merge_xunit_files(reports, cmd[xunit_index])
+        for path in reports:
+            os.remove(path)
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
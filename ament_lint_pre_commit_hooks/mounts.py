@@ -0,0 +1,182 @@
+import os
+import posixpath
+import shutil
+import tempfile
+
+WORKSPACE_DIR = '/workspace'
+# Output files are written to a staging directory mounted below this path
+OUTPUT_DIR = '/ament_lint_output'
+# Beyond this many directories, the deepest ones are replaced by their parents
+MAX_SOURCE_MOUNTS = 32
+# Files looked up by cpplint in the parent directories of the checked files
+CPPLINT_CONTEXT = ('CPPLINT.cfg', '.git', '.hg', '.svn')
+# Docker volume where linters keep their own caches across containers, and its mount point
+CACHE_VOLUME = 'ament_lint_cache'
+CACHE_VOLUME_DIR = '/ament_lint_cache'
+
+
+def container_path(host_path, cwd):
+    """Return where a host path shows up inside the container."""
+    rel_path = os.path.relpath(os.path.abspath(host_path), cwd)
+    return posixpath.normpath(posixpath.join(WORKSPACE_DIR, rel_path))
+
+
+def is_within(path, directory):
+    """Check whether path is directory or below it."""
+    path = os.path.abspath(path)
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def _outermost(directories):
+    """Return the directories that are not below another one of them."""
+    outermost = []
+    for directory in sorted(set(directories), key=lambda path: path.split(os.sep)):
+        if not outermost or not is_within(directory, outermost[-1]):
+            outermost.append(directory)
+    return outermost
+
+
+def _collapse(directories, cwd, limit=MAX_SOURCE_MOUNTS):
+    """Return at most limit directories containing the given ones, moving up to cwd."""
+    directories = _outermost(directories)
+    while len(directories) > limit:
+        movable = [
+            directory for directory in directories
+            if directory != cwd and os.path.dirname(directory) != directory]
+        if not movable:
+            break
+        depth = max(directory.count(os.sep) for directory in movable)
+        directories = _outermost(
+            os.path.dirname(directory)
+            if directory in movable and directory.count(os.sep) == depth else directory
+            for directory in directories)
+    return directories
+
+
+def source_mounts(files, cwd, mode='ro', context=()):
+    """Return mounts of the directories containing the files instead of the whole workspace.
+
+    Every directory is bound where the workspace mount would have put it, so the paths
+    passed to the linter do not change. context names files that the linter looks up in
+    the parent directories of the checked files, which are mounted on their own when they
+    exist up to cwd.
+    """
+    directories = set()
+    for path in files:
+        path = os.path.abspath(path)
+        directories.add(path if os.path.isdir(path) else os.path.dirname(path))
+
+    mounted = _collapse(directories, cwd)
+    volumes = {
+        directory: {'bind': container_path(directory, cwd), 'mode': mode}
+        for directory in mounted}
+
+    visited = set()
+    for directory in directories:
+        while is_within(directory, cwd) and directory not in visited:
+            visited.add(directory)
+            for name in context:
+                path = os.path.join(directory, name)
+                if os.path.lexists(path) and not any(
+                        is_within(path, mount) for mount in mounted):
+                    volumes[path] = {'bind': container_path(path, cwd), 'mode': 'ro'}
+            directory = os.path.dirname(directory)
+    return volumes
+
+
+def workspace_mount(cwd, mode='ro', tree=None):
+    """Return the mount of the whole workspace, for linters that need the package tree.
+
+    tree gives the endings of the names of the files below the workspace that the linter
+    reads besides the ones it checks, which the archive transport copies in as well.
+    """
+    spec = {'bind': WORKSPACE_DIR, 'mode': mode}
+    if tree:
+        spec['tree'] = tuple(tree)
+    return {cwd: spec}
+
+
+def cache_volume_mount():
+    """Return the mount of the docker volume holding the caches of the linters.
+
+    The volume lives on the docker daemon, so it outlasts the containers and is available
+    with any transport. Host backends use a directory in the hook cache instead.
+    """
+    return {CACHE_VOLUME: {'bind': CACHE_VOLUME_DIR, 'mode': 'rw', 'volume': True}}
+
+
+def output_mount(path, cwd):
+    """Return the container path a linter should write an output file to, and its mount.
+
+    Only an empty staging directory is mounted read-write. collect_outputs moves the file
+    to path once the container is done.
+    """
+    abs_path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(abs_path) or '.', exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='ament_lint_output_')
+    bind = posixpath.join(OUTPUT_DIR, os.path.basename(staging_dir))
+    volumes = {staging_dir: {'bind': bind, 'mode': 'rw', 'output': abs_path}}
+    return posixpath.join(bind, os.path.basename(abs_path)), volumes
+
+
+def collect_outputs(volumes):
+    """Move the files written to output mounts into place and remove the staging dirs.
+
+    File lists mounted for the run are removed as well.
+    """
+    for host_path, spec in volumes.items():
+        if spec.get('file_list'):
+            try:
+                os.remove(host_path)
+            except FileNotFoundError:
+                pass
+            continue
+        output = spec.get('output')
+        if output is None:
+            continue
+        staged = os.path.join(host_path, os.path.basename(output))
+        if os.path.isfile(staged):
+            shutil.move(staged, output)
+        shutil.rmtree(host_path, ignore_errors=True)
+
+
+def docker_volumes(volumes):
+    """Return the mounts as the docker SDK expects them."""
+    return {
+        host_path: {'bind': spec['bind'], 'mode': spec['mode']}
+        for host_path, spec in volumes.items()}
+
+
+def _covers(host_path, spec, other_path, other_spec):
+    """Check that a mount already shows other_path where and how other_spec wants it."""
+    if other_path == host_path or spec.get('volume') or other_spec.get('volume'):
+        # Docker volumes are not part of the host file system
+        return False
+    if not is_within(other_path, host_path):
+        return False
+    if spec['mode'] != 'rw' and other_spec['mode'] == 'rw':
+        return False
+    rel_path = os.path.relpath(other_path, host_path).replace(os.sep, '/')
+    return posixpath.join(spec['bind'], rel_path) == posixpath.normpath(other_spec['bind'])
+
+
+def merge_volumes(*volume_sets):
+    """Merge volume specifications, granting write access if any of them needs it.
+
+    Mounts already visible through a mount of one of their parents are dropped.
+    """
+    merged = {}
+    for volumes in volume_sets:
+        for host_path, spec in volumes.items():
+            previous = merged.get(host_path)
+            if previous is None or previous['mode'] != 'rw':
+                merged[host_path] = dict(spec)
+            if previous is not None and (previous.get('tree') or spec.get('tree')):
+                # The files the linters read from the tree of the mount are all needed
+                merged[host_path]['tree'] = tuple(sorted(
+                    {*previous.get('tree', ()), *spec.get('tree', ())}))
+    return {
+        other_path: other_spec for other_path, other_spec in merged.items()
+        if not any(
+            _covers(host_path, spec, other_path, other_spec)
+            for host_path, spec in merged.items())}
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import os
+import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from ament_lint_pre_commit_hooks.profiling import phase
+
+# Docker multiplexes stdout and stderr of non-tty containers into frames with this header
+_FRAME_HEADER = struct.Struct('>BxxxL')
+_RECV_SIZE = 64 * 1024
+
+
+def _raw_socket(sock):
+    """Return the plain socket behind a docker SDK attach socket, if there is one.
+
+    The event loop cannot read TLS sockets, or other subclasses, so they are not plain.
+    """
+    for candidate in (sock, getattr(sock, '_sock', None)):
+        if type(candidate) is socket.socket:
+            return candidate
+    return None
+
+
+class Orchestrator:
+    """Drive the blocking docker SDK from asyncio without a thread per container.
+
+    Short control calls (image checks, create, start, wait, remove) run on a small executor
+    shared by every container, while container output is read from the attach sockets by
+    the event loop itself.
+    """
+
+    def __init__(self, client, max_workers=None):
+        self.client = client
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(8, (os.cpu_count() or 1) + 2),
+            thread_name_prefix='ament_lint_docker')
+        # Name -> asyncio lock held by one coroutine of the run at a time
+        self.locks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def call(self, function, *args, **kwargs):
+        """Run a blocking docker SDK call on the shared executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(function, *args, **kwargs))
+
+    async def run_container(self, image, cmd, on_output, prepare=None, collect=None,
+                            **create_kwargs):
+        """Run a command in a new container, stream its output and return its exit code.
+
+        prepare and collect are called with the container before it starts and after it
+        exited, e.g. to copy files in and out.
+        """
+        with phase('container.create'):
+            container = await self.call(
+                self.client.containers.create, image=image, command=cmd, **create_kwargs)
+        try:
+            if prepare is not None:
+                await self.call(prepare, container)
+            # Attach before starting so that no output is missed
+            with phase('container.attach'):
+                sock = await self.call(
+                    self.client.api.attach_socket, container.id,
+                    params={'stdout': 1, 'stderr': 1, 'stream': 1, 'logs': 1})
+            with phase('container.start'):
+                await self.call(container.start)
+            await self.stream(sock, on_output, 'container.output')
+            with phase('container.wait'):
+                result = await self.call(container.wait)
+            if collect is not None:
+                await self.call(collect, container)
+            return result['StatusCode']
+        finally:
+            with phase('container.remove'):
+                await self.call(container.remove, force=True)
+
+    async def exec(self, container, cmd, on_output, **exec_kwargs):
+        """Run a command in a running container, stream its output and return its exit code."""
+        with phase('exec.create'):
+            exec_id = (await self.call(
+                self.client.api.exec_create, container.id, cmd, **exec_kwargs))['Id']
+        with phase('exec.start'):
+            sock = await self.call(self.client.api.exec_start, exec_id, socket=True)
+        await self.stream(sock, on_output, 'exec.output')
+        with phase('exec.wait'):
+            while True:
+                info = await self.call(self.client.api.exec_inspect, exec_id)
+                if not info.get('Running'):
+                    return info['ExitCode']
+                await asyncio.sleep(0.01)
+
+    async def stream(self, sock, on_output, phase_name='output'):
+        """Demultiplex an attach socket, passing (stream, data) to on_output until EOF."""
+        with phase(phase_name, bytes=0) as counts:
+            await self._stream(sock, on_output, counts)
+
+    async def _stream(self, sock, on_output, counts):
+        raw = _raw_socket(sock)
+        if raw is not None:
+            raw.setblocking(False)
+            loop = asyncio.get_running_loop()
+
+            async def receive():
+                return await loop.sock_recv(raw, _RECV_SIZE)
+        else:
+            # Transports without a plain socket (TLS, ssh, named pipes) are read on the
+            # executor
+            read = getattr(sock, 'recv', None) or sock.read
+
+            async def receive():
+                return await self.call(read, _RECV_SIZE)
+
+        buffer = bytearray()
+        try:
+            while True:
+                data = await receive()
+                if not data:
+                    break
+                counts['bytes'] += len(data)
+                buffer += data
+                while len(buffer) >= _FRAME_HEADER.size:
+                    stream, size = _FRAME_HEADER.unpack_from(buffer)
+                    end = _FRAME_HEADER.size + size
+                    if len(buffer) < end:
+                        break
+                    on_output(stream, bytes(buffer[_FRAME_HEADER.size:end]))
+                    del buffer[:end]
+        finally:
+            sock.close()
@@ -0,0 +1,95 @@
+import os
+import re
+import shutil
+import tempfile
+
+_FILE_RE = re.compile(r'--- (?P<path>.+?)(?:\t.*)?$')
+_HUNK_RE = re.compile(r'@@ -(?P<start>\d+)(?:,(?P<old>\d+))? \+\d+(?:,(?P<new>\d+))? @@')
+
+
+def parse_unified_diffs(lines):
+    """Return the hunks of the unified diffs in output lines per file.
+
+    A hunk is a (start line, old lines, new lines) tuple. Files whose diff could not be
+    parsed completely, such as when a missing final newline joined two diff lines, map to
+    None.
+    """
+    diffs = {}
+    path = None
+    hunk = None
+    old_left = new_left = 0
+    for line in lines:
+        if old_left or new_left:
+            if line.startswith('-') and old_left:
+                hunk[1].append(line[1:])
+                old_left -= 1
+                continue
+            if line.startswith('+') and new_left:
+                hunk[2].append(line[1:])
+                new_left -= 1
+                continue
+            if line.startswith(' ') and old_left and new_left:
+                hunk[1].append(line[1:])
+                hunk[2].append(line[1:])
+                old_left -= 1
+                new_left -= 1
+                continue
+            diffs[path] = None
+            old_left = new_left = 0
+
+        match = _FILE_RE.match(line)
+        if match is not None:
+            path = os.path.abspath(match.group('path'))
+            diffs.setdefault(path, [])
+            continue
+        match = _HUNK_RE.match(line)
+        if match is None or path is None:
+            continue
+        old_left = int(match.group('old') or 1)
+        new_left = int(match.group('new') or 1)
+        hunk = (int(match.group('start')), [], [])
+        if diffs[path] is not None:
+            diffs[path].append(hunk)
+
+    if old_left or new_left:
+        diffs[path] = None
+    return diffs
+
+
+def apply_hunks(text, hunks):
+    """Return text with the hunks of its diff applied, or None if they do not match it.
+
+    Diffs are made of lines without their endings, so lines are matched without a carriage
+    return. Unchanged lines keep their endings, and the lines of the hunks get CRLF endings
+    if the file has those.
+    """
+    lines = text.split('\n')
+    stripped = [line[:-1] if line.endswith('\r') else line for line in lines]
+    cr = '\r' if '\r\n' in text else ''
+    result = []
+    position = 0
+    for start, old, new in hunks:
+        # A hunk removing no lines starts after its line rather than at it
+        index = start - 1 if old else start
+        if index < position or stripped[index:index + len(old)] != old:
+            return None
+        result.extend(lines[position:index])
+        result.extend(line + cr for line in new)
+        position = index + len(old)
+    result.extend(lines[position:])
+    return '\n'.join(result)
+
+
+def write_atomically(path, data):
+    """Replace the contents of a file by renaming a complete copy of the new ones over it."""
+    path = os.path.realpath(path)
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f'.{os.path.basename(path)}.', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,77 @@
+import os
+import sys
+
+from ament_lint_pre_commit_hooks.backends import host_backend
+from ament_lint_pre_commit_hooks.cache import CachedRun
+from ament_lint_pre_commit_hooks.docker_image import (known_image_id,
+                                                      linters_image_tag)
+from ament_lint_pre_commit_hooks.filelist import needs_file_list
+from ament_lint_pre_commit_hooks.runner import shard_files
+
+
+def plan_linter(name, args, files, backend=None, image=None, cacheable=True):
+    """Return what running a linter on files would do, without calling docker.
+
+    backend is the host backend running the linter, or None for a container of image.
+    Cache hits of a container are looked up with the id the image had when a hook last
+    used it, so none are expected for an image no hook used yet.
+    """
+    if backend is not None:
+        image = None
+        toolchain_id = backend.toolchain_id()
+    else:
+        toolchain_id = known_image_id(image)
+
+    hits = []
+    if toolchain_id is not None and files:
+        cached_run = CachedRun.open(name, args, files, toolchain_id, enabled=cacheable)
+        hits = cached_run.cached_files()
+        cached_run.close()
+    cached = set(hits)
+    pending = [path for path in files if path not in cached]
+
+    jobs = getattr(args, 'jobs', 1) or os.cpu_count() or 1
+    if jobs > 1 and len(pending) > 1:
+        shards = shard_files(pending, jobs)
+    else:
+        shards = [pending] if pending else []
+    # Profiled files are always listed, to be linted one at a time
+    profile_files = getattr(args, 'profile_files', False)
+    return {
+        'linter': name,
+        'backend': 'docker' if backend is None else backend.name,
+        'image': image,
+        'files': len(files),
+        'cache_hits': len(hits),
+        'pending': pending,
+        'batches': [
+            {'files': len(shard), 'file_list': profile_files or needs_file_list(shard)}
+            for shard in shards],
+    }
+
+
+def plan_hook(name, args, files, cacheable=True):
+    """Return the plan of a hook running a single linter on files."""
+    backend = host_backend(args, name) if files else None
+    return plan_linter(name, args, files, backend, linters_image_tag(name), cacheable=cacheable)
+
+
+def print_plan(plans):
+    """Print the plans of the linters of a run and the images they need as JSON.
+
+    Linters without files are left out. Only containers with pending files need their
+    image, and an image that no hook used yet may need to be built.
+    """
+    import json
+
+    plans = [plan for plan in plans if plan['files']]
+    images = {}
+    for plan in plans:
+        if plan['image'] is not None and plan['pending']:
+            images.setdefault(plan['image'], known_image_id(plan['image']) is not None)
+    json.dump({
+        'linters': plans,
+        'images': [{'tag': tag, 'seen': seen} for tag, seen in images.items()],
+    }, sys.stdout, indent=2)
+    print()
+    return 0
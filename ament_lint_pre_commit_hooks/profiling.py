@@ -0,0 +1,207 @@
+import contextlib
+import os
+import sys
+import threading
+import time
+
+from ament_lint_pre_commit_hooks.filelist import FILE_COST_PREFIX
+
+PROFILE_ENV = 'AMENT_LINT_PROFILE'
+# Number of files listed in the report of the slowest files
+SLOWEST_FILES = 20
+
+_FILE_COST_PREFIX = FILE_COST_PREFIX.encode('utf-8')
+
+
+class Profiler:
+    """Record the wall time of the phases of a hook run, with file and byte counts.
+
+    Phases are recorded per lane, a thread or an asyncio task, so that concurrent
+    containers show up side by side in a trace viewer.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        # Wall time and peak memory of each file linted one at a time, by linter
+        self.file_costs = []
+        self.origin = time.perf_counter()
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def _lane(self):
+        task = None
+        asyncio = sys.modules.get('asyncio')
+        if asyncio is not None:
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                pass
+        key = ('task', id(task)) if task is not None else ('thread', threading.get_ident())
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    @contextlib.contextmanager
+    def phase(self, name, **counts):
+        """Time the enclosed block, yielding a dict to which counts can be added."""
+        if not self.enabled:
+            yield counts
+            return
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            end = time.perf_counter()
+            record = {
+                'name': name,
+                'start': start - self.origin,
+                'duration': end - start,
+                'lane': self._lane(),
+            }
+            record.update(counts)
+            with self._lock:
+                self.records.append(record)
+
+    def totals(self):
+        """Return the number of occurrences, time, files and bytes of each phase."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(
+                record['name'], {'count': 0, 'duration': 0.0, 'files': 0, 'bytes': 0})
+            total['count'] += 1
+            total['duration'] += record['duration']
+            total['files'] += record.get('files') or 0
+            total['bytes'] += record.get('bytes') or 0
+        return totals
+
+    def take_file_costs(self, block):
+        """Record the file costs reported in a block of output and return the other lines."""
+        import json
+
+        lines = block.split(b'\n')
+        kept = []
+        for line in lines:
+            if not line.startswith(_FILE_COST_PREFIX):
+                kept.append(line)
+                continue
+            try:
+                record = json.loads(line[len(_FILE_COST_PREFIX):])
+            except ValueError:
+                continue
+            if os.path.isabs(record['file']):
+                # Host linters report the files with their absolute host paths
+                record['file'] = os.path.relpath(record['file'])
+            with self._lock:
+                self.file_costs.append(record)
+        return b'\n'.join(kept)
+
+    def slowest_files(self):
+        """Return the file costs, the most expensive first."""
+        return sorted(self.file_costs, key=lambda record: record['seconds'], reverse=True)
+
+    def export(self, path):
+        """Write the phases as JSON to path and as Chrome trace events next to it."""
+        import json
+
+        records = sorted(self.records, key=lambda record: record['start'])
+        profile = {'phases': records, 'totals': self.totals()}
+        if self.file_costs:
+            profile['files'] = self.slowest_files()
+        with open(path, 'w') as f:
+            json.dump(profile, f, indent=2)
+
+        pid = os.getpid()
+        events = [
+            {
+                'name': record['name'],
+                'cat': record['name'].split('.')[0],
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['duration'] * 1e6,
+                'pid': pid,
+                'tid': record['lane'],
+                'args': {
+                    key: value for key, value in record.items()
+                    if key not in ('name', 'start', 'duration', 'lane')},
+            }
+            for record in records]
+        with open(trace_path(path), 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+profiler = Profiler()
+
+
+def phase(name, **counts):
+    """Time a phase of the current run, if profiling is enabled."""
+    return profiler.phase(name, **counts)
+
+
+def total_size(paths):
+    """Return the total size of files, for byte counts of profiled phases."""
+    size = 0
+    for path in paths:
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            pass
+    return size
+
+
+def print_slowest_files(file_costs, count=SLOWEST_FILES):
+    """Print a table of the files that took longest to lint, with their peak memory."""
+    print(f'==> slowest files ({min(count, len(file_costs))} of {len(file_costs)}) <==',
+          file=sys.stderr)
+    print(f'{"seconds":>9} {"peak MB":>9}  {"linter":<18} file', file=sys.stderr)
+    for record in file_costs[:count]:
+        print(f'{record["seconds"]:>9.3f} {record["max_rss_kb"] / 1024:>9.1f}  '
+              f'{record["linter"]:<18} {record["file"]}', file=sys.stderr)
+    total = sum(record['seconds'] for record in file_costs)
+    print(f'{total:>9.3f} {"":>9}  {"total":<18}', file=sys.stderr)
+
+
+def trace_path(path):
+    """Return where the Chrome trace of a profile written to path goes."""
+    root, ext = os.path.splitext(path)
+    return f'{root}.trace{ext or ".json"}'
+
+
+def add_profile_arguments(parser):
+    """Add the option enabling profiling."""
+    parser.add_argument(
+        '--profile',
+        metavar='PATH',
+        default=os.environ.get(PROFILE_ENV) or None,
+        help='Write the time spent in each phase as JSON to PATH and as a Chrome trace, '
+             f'viewable in about:tracing, next to it (can also be set with {PROFILE_ENV})')
+
+
+def add_file_profile_arguments(parser):
+    """Add the option profiling the linting of each file."""
+    parser.add_argument(
+        '--profile-files',
+        action='store_true',
+        help='Lint the files one at a time in the container, recording the wall time and '
+             'peak memory of each, and print the slowest files at the end (also written '
+             'to the --profile file)')
+
+
+@contextlib.contextmanager
+def profiling(args, name):
+    """Profile the enclosed hook run if requested by the command line arguments."""
+    path = getattr(args, 'profile', None)
+    profile_files = getattr(args, 'profile_files', False)
+    if not path and not profile_files:
+        yield
+        return
+    profiler.enabled = bool(path)
+    try:
+        with phase(name):
+            yield
+    finally:
+        profiler.enabled = False
+        if profile_files and profiler.file_costs:
+            print_slowest_files(profiler.slowest_files())
+        if path:
+            profiler.export(path)
+            print(f'Profile written to {path} and {trace_path(path)}', file=sys.stderr)
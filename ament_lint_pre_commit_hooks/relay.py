@@ -0,0 +1,115 @@
+import sys
+import time
+
+from ament_lint_pre_commit_hooks.diagnostics import reporter
+from ament_lint_pre_commit_hooks.filelist import FILE_COST_PREFIX
+from ament_lint_pre_commit_hooks.mounts import WORKSPACE_DIR
+from ament_lint_pre_commit_hooks.profiling import profiler
+
+# Docker multiplexes stdout and stderr of non-tty containers into frames tagged with these
+STDOUT = 1
+STDERR = 2
+
+# Pending output is written once it reaches this size or waited this long
+FLUSH_SIZE = 64 * 1024
+FLUSH_INTERVAL = 0.1
+
+_WORKSPACE_PREFIX = (WORKSPACE_DIR + '/').encode('utf-8')
+_FILE_COST_PREFIX = FILE_COST_PREFIX.encode('utf-8')
+
+
+def _write(stream, data):
+    """Write bytes to sys.stdout or sys.stderr, after the text already printed to it."""
+    out = sys.stderr if stream == STDERR else sys.stdout
+    out.flush()
+    buffer = getattr(out, 'buffer', None)
+    if buffer is None:
+        # Replaced streams such as io.StringIO only take text
+        out.write(data.decode('utf-8', errors='replace'))
+    else:
+        buffer.write(data)
+    out.flush()
+
+
+class OutputRelay:
+    """Relay container output with the workspace prefix removed from paths.
+
+    Output is handled in blocks of complete lines per stream: the prefix is removed with
+    a single bytes replace per block and the blocks are written in batches to the binary
+    buffers of sys.stdout and sys.stderr. Lines are only decoded for the sink. When the
+    findings are reported in a structured format, the sink is all the output goes to.
+    """
+
+    def __init__(self, sink=None, echo=True, raw=None):
+        self.sink = sink
+        self.echo = echo
+        # Whether to write the output at all, by default unless a structured format is used
+        self.raw = not reporter.enabled if raw is None else raw
+        self._partial = {STDOUT: b'', STDERR: b''}
+        self._pending = {STDOUT: bytearray(), STDERR: bytearray()}
+        self._held = []
+        self._last_write = time.monotonic()
+
+    def feed(self, stream, data):
+        """Process a chunk of output, keeping an unfinished last line for the next chunk."""
+        stream = STDERR if stream == STDERR else STDOUT
+        data = self._partial[stream] + data
+        end = data.rfind(b'\n') + 1
+        self._partial[stream] = data[end:]
+        if end:
+            self._relay(stream, data[:end])
+
+    def close(self):
+        """Process the last lines if the output did not end with a newline."""
+        for stream, partial in self._partial.items():
+            if partial:
+                self._partial[stream] = b''
+                self._relay(stream, partial + b'\n')
+        self._write_pending()
+
+    def flush(self):
+        """Write and forget the output held back while echo was disabled."""
+        for stream, block in self._held:
+            self._observe(block)
+            if self.raw:
+                self._pending[stream] += block
+        self._held = []
+        self._write_pending()
+
+    def start_echo(self):
+        """Write the output held back so far, then echo the rest as it comes in."""
+        self.flush()
+        self.echo = True
+
+    def _relay(self, stream, block):
+        block = block.replace(_WORKSPACE_PREFIX, b'')
+        if _FILE_COST_PREFIX in block:
+            # Files profiled in the container report their cost next to their output
+            block = profiler.take_file_costs(block)
+            if not block:
+                return
+        if not self.echo:
+            self._held.append((stream, block))
+            return
+        self._observe(block)
+        if not self.raw:
+            return
+        self._pending[stream] += block
+        if (len(self._pending[stream]) >= FLUSH_SIZE or
+                time.monotonic() - self._last_write >= FLUSH_INTERVAL):
+            self._write_pending()
+
+    def _observe(self, block):
+        if self.sink is None:
+            return
+        # Lines are passed on as is, as diffs of files with trailing whitespace or CRLF
+        # line endings are only exact with them
+        for line in block.decode('utf-8', errors='replace').split('\n')[:-1]:
+            self.sink(line)
+
+    def _write_pending(self):
+        for stream, pending in self._pending.items():
+            if pending:
+                _write(stream, pending)
+                pending.clear()
+        self._last_write = time.monotonic()
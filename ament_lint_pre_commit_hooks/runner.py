@@ -0,0 +1,528 @@
+import argparse
+import contextlib
+import heapq
+import os
+import posixpath
+
+from ament_lint_pre_commit_hooks.backends import (add_backend_arguments,
+                                                  record_image_toolchain)
+from ament_lint_pre_commit_hooks.cache import (CachedRun, add_cache_arguments,
+                                               file_lock)
+from ament_lint_pre_commit_hooks.diagnostics import (add_format_arguments,
+                                                     reporter)
+from ament_lint_pre_commit_hooks.discovery import add_discovery_arguments
+from ament_lint_pre_commit_hooks.docker_image import (DOCKERFILE_DIR, image_id,
+                                                      known_image_id,
+                                                      tag_target)
+from ament_lint_pre_commit_hooks.mounts import (CACHE_VOLUME, WORKSPACE_DIR,
+                                                cache_volume_mount,
+                                                collect_outputs,
+                                                container_path, docker_volumes,
+                                                is_within)
+from ament_lint_pre_commit_hooks.profiling import (add_file_profile_arguments,
+                                                   add_profile_arguments,
+                                                   phase, profiler, total_size)
+from ament_lint_pre_commit_hooks.relay import OutputRelay
+from ament_lint_pre_commit_hooks.transport import (Archive,
+                                                   add_transport_arguments,
+                                                   uses_archive)
+
+# docker, asyncio and the orchestrator are imported by the functions that start containers,
+# so that parsing arguments and finding no files to check stays fast
+
+CONFIG_DIR = os.path.join(DOCKERFILE_DIR, 'config')
+
+# Persistent container settings
+PERSISTENT_ENV = 'AMENT_LINT_PERSISTENT'
+IDLE_TIMEOUT_ENV = 'AMENT_LINT_IDLE_TIMEOUT'
+DEFAULT_IDLE_TIMEOUT = 600
+HEARTBEAT_FILE = '/tmp/ament_lint_heartbeat'
+LABEL_PREFIX = 'ament_lint_pre_commit_hooks'
+
+# The container stops by itself once no command touched the heartbeat for the idle timeout
+WATCHDOG_SCRIPT = (
+    'touch {heartbeat}; '
+    'while [ $(( $(date +%s) - $(stat -c %Y {heartbeat}) )) -lt {timeout} ]; '
+    'do sleep 1; done'
+)
+# Runs an exec command while touching the heartbeat every second, so that a lint running
+# longer than the idle timeout keeps the container. The toucher stops with the command, or
+# with this shell if the exec is killed.
+EXEC_SCRIPT = (
+    'touch {heartbeat}; '
+    '(while kill -0 $$ 2>/dev/null; do touch {heartbeat}; sleep 1; done) >/dev/null 2>&1 & '
+    'toucher=$!; "$@"; status=$?; kill $toucher 2>/dev/null; exit $status'
+)
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def add_runner_arguments(parser):
+    """Add the container execution options shared by every hook."""
+    parser.add_argument(
+        '--persistent',
+        action='store_true',
+        default=_env_flag(PERSISTENT_ENV),
+        help='Keep a warm linter container per workspace and run commands in it '
+             f'(can also be enabled with {PERSISTENT_ENV}=1)')
+    parser.add_argument(
+        '--idle-timeout',
+        metavar='SECONDS',
+        type=int,
+        default=int(os.environ.get(IDLE_TIMEOUT_ENV, DEFAULT_IDLE_TIMEOUT)),
+        help='Stop the persistent container after this many idle seconds')
+    parser.add_argument(
+        '--jobs', '-j',
+        metavar='N',
+        type=int,
+        default=1,
+        help='Split the files into N size-balanced shards linted in concurrent containers '
+             '(0 uses one shard per CPU)')
+    parser.add_argument(
+        '--plan',
+        action='store_true',
+        help='Print what the run would do as JSON, with the files, cache hits and batches '
+             'of every linter and the images needed, without running anything')
+    add_cache_arguments(parser)
+    add_discovery_arguments(parser)
+    add_transport_arguments(parser)
+    add_backend_arguments(parser)
+    add_format_arguments(parser)
+    add_profile_arguments(parser)
+    add_file_profile_arguments(parser)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def shard_files(files, jobs):
+    """Split files into at most `jobs` shards with similar total sizes, keeping their order."""
+    shards = [[] for _ in range(max(1, min(jobs, len(files))))]
+    # Assign the largest files first, each to the currently smallest shard
+    heap = [(0, index) for index in range(len(shards))]
+    by_size = sorted(enumerate(files), key=lambda item: _file_size(item[1]), reverse=True)
+    for position, path in by_size:
+        total, index = heapq.heappop(heap)
+        shards[index].append((position, path))
+        heapq.heappush(heap, (total + _file_size(path), index))
+    return [[path for _, path in sorted(shard)] for shard in shards if shard]
+
+
+class DockerBackend:
+    """Run linter commands in containers of the linter image."""
+
+    name = 'docker'
+    # Whether several commands can run at the same time
+    concurrent = True
+
+    def __init__(self, client, image):
+        self.client = client
+        self.image = image
+
+    def toolchain_id(self):
+        """Return what identifies the toolchain in the result cache."""
+        return image_id(self.client, self.image)
+
+    def session(self, max_workers=None):
+        from ament_lint_pre_commit_hooks.orchestrator import Orchestrator
+
+        return Orchestrator(self.client, max_workers=max_workers)
+
+    async def run(self, orchestrator, cmd, volumes, args, relay):
+        """Run a linter command, relay its output and return its exit code."""
+        return await run_in_container_async(orchestrator, self.image, cmd, volumes, args, relay)
+
+
+def run_linter(backend, name, args, files, build_command, cacheable=True, output=None):
+    """Run a linter on files, replaying cached results for files that did not change.
+
+    The output lines, replayed or not, go to output instead of being printed if given.
+    """
+    if backend.name == 'docker' and getattr(args, 'backend', 'docker') == 'auto':
+        # Learn the versions in the image, so that matching host linters can be used next time
+        record_image_toolchain(backend.client, backend.image, name)
+
+    cached_run = CachedRun.open(name, args, files, backend.toolchain_id(), enabled=cacheable)
+    exit_code = cached_run.replay(output=output or reporter.observer(name))
+    if files and not cached_run.pending:
+        return exit_code
+
+    if output is None:
+        # The cache and the structured output both follow the output of the linter
+        sink = reporter.observer(name, cached_run.observe)
+    else:
+        def sink(line):
+            cached_run.observe(line)
+            output(line)
+
+    raw = False if output is not None else None
+    jobs = getattr(args, 'jobs', 1) or os.cpu_count() or 1
+    with phase('lint', linter=name, files=len(cached_run.pending)) as counts:
+        if profiler.enabled:
+            counts['bytes'] = total_size(cached_run.pending)
+        if jobs > 1 and len(cached_run.pending) > 1:
+            run_exit_code = run_sharded(
+                backend, args, cached_run.pending, build_command, jobs, sink, raw=raw)
+        else:
+            cmd, volumes = build_command(args, cached_run.pending, os.getcwd())
+            run_exit_code = run_command(backend, cmd, volumes, args, sink=sink, raw=raw)
+    cached_run.record(run_exit_code)
+    return max(exit_code, run_exit_code)
+
+
+def replay_cached(name, args, files, image, cacheable=True, header=None):
+    """Replay the results of the files if all are cached for the image, without docker.
+
+    The results are looked up with the id the image had when a hook last used it. Return
+    the exit code, or None if the linter has to run.
+    """
+    toolchain_id = known_image_id(image)
+    if toolchain_id is None or not files:
+        return None
+    cached_run = CachedRun.open(name, args, files, toolchain_id, enabled=cacheable)
+    if len(cached_run.cached_files()) < len(files):
+        cached_run.close()
+        return None
+    return cached_run.replay(header=header, output=reporter.observer(name))
+
+
+def run_command(backend, cmd, volumes, args=None, sink=None, raw=None):
+    """Run a linter command with a backend and return its exit code."""
+    import asyncio
+
+    with backend.session() as session:
+        return asyncio.run(
+            backend.run(session, cmd, volumes, args, OutputRelay(sink, raw=raw)))
+
+
+def run_sharded(backend, args, files, build_command, jobs, sink=None, raw=None):
+    """Lint size-balanced shards of the files, concurrently if the backend allows it."""
+    import asyncio
+
+    from ament_lint_pre_commit_hooks.xunit import merge_xunit_files
+
+    cwd = os.getcwd()
+    xunit_file = getattr(args, 'xunit_file', None)
+
+    shard_commands = []
+    shard_xunit_files = []
+    for index, shard in enumerate(shard_files(files, jobs)):
+        shard_args = argparse.Namespace(**vars(args))
+        if xunit_file:
+            # Every shard writes its own report, merged into the requested one afterwards
+            root, ext = os.path.splitext(xunit_file)
+            shard_args.xunit_file = f'{root}.shard{index}{ext}'
+            shard_xunit_files.append(shard_args.xunit_file)
+        shard_commands.append(build_command(shard_args, shard, cwd))
+
+    async def run_shards(session):
+        relays = [OutputRelay(sink, echo=False, raw=raw) for _ in shard_commands]
+        runs = [
+            backend.run(session, cmd, volumes, args, relay)
+            for (cmd, volumes), relay in zip(shard_commands, relays)]
+        if backend.concurrent:
+            runs = [asyncio.create_task(run) for run in runs]
+        # Relay the output shard by shard so it does not depend on scheduling: the shard in
+        # front streams its output, the others hold theirs back until their turn
+        exit_code = 0
+        for run, relay in zip(runs, relays):
+            relay.start_echo()
+            exit_code = max(exit_code, await run)
+            relay.flush()
+        return exit_code
+
+    with backend.session(max_workers=min(32, 2 * len(shard_commands))) as session:
+        exit_code = asyncio.run(run_shards(session))
+
+    if xunit_file:
+        reports = [path for path in shard_xunit_files if os.path.isfile(path)]
+        with phase('xunit.merge', files=len(reports)):
+            merge_xunit_files(reports, xunit_file)
+        for path in reports:
+            os.remove(path)
+
+    return exit_code
+
+
+async def run_in_container_async(orchestrator, image, cmd, volumes, args, relay):
+    """Run a linter command in a persistent or one-off container and return its exit code."""
+    cwd = os.getcwd()
+    archive = Archive([cmd], volumes, cwd) if uses_archive(args) else None
+    try:
+        if getattr(args, 'persistent', False) and (
+                archive is not None or _persistent_covers(volumes, cwd)):
+            idle_timeout = getattr(args, 'idle_timeout', DEFAULT_IDLE_TIMEOUT)
+            return await _run_persistent(
+                orchestrator, image, cmd, cwd, idle_timeout, relay, archive)
+
+        with phase('linter', command=cmd[0]):
+            if archive is not None:
+                return await orchestrator.run_container(
+                    image, cmd, relay.feed, prepare=archive.upload, collect=archive.download,
+                    volumes=docker_volumes(archive.docker_volumes), working_dir=WORKSPACE_DIR)
+            return await orchestrator.run_container(
+                image, cmd, relay.feed, volumes=docker_volumes(volumes),
+                working_dir=WORKSPACE_DIR)
+    finally:
+        relay.close()
+        collect_outputs(volumes)
+
+
+def _persistent_mounts(cwd, transport='bind'):
+    # The caches of the linters are kept in a docker volume, which any transport can mount
+    volumes = cache_volume_mount()
+    if transport != 'bind':
+        return volumes
+    # Writes go to one-off containers with their own mounts, see _persistent_covers
+    volumes[cwd] = {'bind': WORKSPACE_DIR, 'mode': 'ro'}
+    if not is_within(CONFIG_DIR, cwd):
+        # Default config files live in the installed package, outside the workspace
+        volumes[CONFIG_DIR] = {'bind': container_path(CONFIG_DIR, cwd), 'mode': 'ro'}
+    return volumes
+
+
+def _persistent_covers(volumes, cwd):
+    """Check that every requested mount is already provided by the persistent container.
+
+    The persistent container mounts the workspace read-only, so runs that write files, such
+    as reports and reformatted sources, are never covered.
+    """
+    for host_path, spec in volumes.items():
+        if spec.get('volume'):
+            if cache_volume_mount().get(host_path) != spec:
+                return False
+            continue
+        if spec['mode'] != 'ro' or 'output' in spec:
+            return False
+        if not (is_within(host_path, cwd) or is_within(host_path, CONFIG_DIR)):
+            return False
+        if posixpath.normpath(spec['bind']) != container_path(host_path, cwd):
+            return False
+    return True
+
+
+def _persistent_labels(client, image, cwd, idle_timeout, transport):
+    return {
+        f'{LABEL_PREFIX}.workspace': cwd,
+        f'{LABEL_PREFIX}.image': image_id(client, image),
+        f'{LABEL_PREFIX}.idle_timeout': str(idle_timeout),
+        f'{LABEL_PREFIX}.transport': transport,
+        f'{LABEL_PREFIX}.cache_volume': CACHE_VOLUME,
+        # Containers from before the workspace was mounted read-only are replaced
+        f'{LABEL_PREFIX}.workspace_mode': 'ro',
+    }
+
+
+def _is_healthy(container, labels):
+    """Check that a persistent container is running, healthy and built from the current image."""
+    if container.status != 'running':
+        return False
+    health = container.attrs['State'].get('Health', {}).get('Status')
+    if health == 'unhealthy':
+        return False
+    return all(container.labels.get(key) == value for key, value in labels.items())
+
+
+def get_persistent_container(
+        client, image, cwd, idle_timeout=DEFAULT_IDLE_TIMEOUT, transport='bind'):
+    """Return the warm container for this workspace, (re)starting it when needed.
+
+    With the archive transport the container only mounts the cache volume, files are copied
+    into it.
+    """
+    import hashlib
+
+    import docker
+
+    name = 'ament_lint_' + hashlib.sha256(cwd.encode('utf-8')).hexdigest()[:12]
+    # Hooks using different target images each get their own container
+    name += f'_{tag_target(image)}'
+    if transport != 'bind':
+        name += f'_{transport}'
+    labels = _persistent_labels(client, image, cwd, idle_timeout, transport)
+
+    try:
+        container = client.containers.get(name)
+    except docker.errors.NotFound:
+        container = None
+
+    if container is not None:
+        if _is_healthy(container, labels):
+            return container
+        # Restart when the image changed or the container stopped responding
+        try:
+            container.remove(force=True)
+        except docker.errors.NotFound:
+            pass
+
+    watchdog = WATCHDOG_SCRIPT.format(heartbeat=HEARTBEAT_FILE, timeout=idle_timeout)
+    try:
+        return client.containers.run(
+            image=image,
+            command=['sh', '-c', watchdog],
+            name=name,
+            labels=labels,
+            volumes=docker_volumes(_persistent_mounts(cwd, transport)),
+            working_dir=WORKSPACE_DIR,
+            healthcheck={
+                'test': ['CMD-SHELL', f'test -d {WORKSPACE_DIR} && test -x /ros_entrypoint.sh'],
+                'interval': 30 * 10**9,
+                'timeout': 5 * 10**9,
+                'retries': 3,
+            },
+            auto_remove=True,
+            detach=True
+        )
+    except docker.errors.APIError as e:
+        if e.status_code != 409:
+            raise
+        # Another hook process created the container at the same time
+        return client.containers.get(name)
+
+
+async def exec_in_container(orchestrator, container, cmd, relay):
+    """Run a command in a running container, relay its output and return its exit code."""
+    # Exec does not go through the image entrypoint, so source ROS explicitly
+    exec_cmd = [
+        '/ros_entrypoint.sh',
+        'sh', '-c', EXEC_SCRIPT.format(heartbeat=HEARTBEAT_FILE), 'sh',
+        *cmd,
+    ]
+    with phase('linter', command=cmd[0]):
+        return await orchestrator.exec(container, exec_cmd, relay.feed, workdir=WORKSPACE_DIR)
+
+
+@contextlib.asynccontextmanager
+async def _archive_session(orchestrator, container, archive):
+    """Copy the files of a run into a persistent container, and the outputs back after.
+
+    The files of the previous run are removed first. Runs of every hook process using the
+    container therefore take turns, waiting for the run before to be done.
+    """
+    import asyncio
+
+    name = f'archive_{container.id}'
+    async with orchestrator.locks.setdefault(name, asyncio.Lock()):
+        lock = file_lock(name)
+        # The lock is waited for on the executor so that the event loop keeps running
+        await orchestrator.call(lock.__enter__)
+        try:
+            with phase('archive.clear'):
+                await orchestrator.exec(
+                    container, ['rm', '-rf', *archive.stale_paths()], lambda *output: None)
+            await orchestrator.call(archive.upload, container)
+            yield
+            await orchestrator.call(archive.download, container)
+        finally:
+            await orchestrator.call(lock.__exit__, None, None, None)
+
+
+async def _exec_with_archive(orchestrator, container, cmd, relay, archive):
+    """Exec a command, copying the files of the run in before and out after if needed."""
+    if archive is None:
+        return await exec_in_container(orchestrator, container, cmd, relay)
+    async with _archive_session(orchestrator, container, archive):
+        return await exec_in_container(orchestrator, container, cmd, relay)
+
+
+def run_commands_in_container(client, image, commands, volumes, args=None):
+    """Run several (name, command, output sink) entries concurrently in one container.
+
+    Return the exit code of each command by name.
+    """
+    import asyncio
+
+    from ament_lint_pre_commit_hooks.orchestrator import Orchestrator
+
+    with Orchestrator(client) as orchestrator:
+        return asyncio.run(
+            _run_commands_async(orchestrator, image, commands, volumes, args))
+
+
+async def _run_commands_async(orchestrator, image, commands, volumes, args):
+    import asyncio
+
+    cwd = os.getcwd()
+    client = orchestrator.client
+
+    archive = None
+    if uses_archive(args):
+        archive = Archive([cmd for _, cmd, _ in commands], volumes, cwd)
+
+    persistent = getattr(args, 'persistent', False) and (
+        archive is not None or _persistent_covers(volumes, cwd))
+    if persistent:
+        idle_timeout = getattr(args, 'idle_timeout', DEFAULT_IDLE_TIMEOUT)
+        with phase('container.persistent'):
+            container = await orchestrator.call(
+                get_persistent_container, client, image, cwd, idle_timeout,
+                'bind' if archive is None else 'archive')
+    else:
+        # Keep a container idle for the duration of the pass and exec each linter in it
+        with phase('container.run'):
+            container = await orchestrator.call(
+                client.containers.run,
+                image=image,
+                command=['sleep', 'infinity'],
+                volumes=docker_volumes(
+                    volumes if archive is None else archive.docker_volumes),
+                working_dir=WORKSPACE_DIR,
+                detach=True
+            )
+
+    try:
+        if archive is not None and persistent:
+            session = _archive_session(orchestrator, container, archive)
+        else:
+            session = contextlib.nullcontext()
+            if archive is not None:
+                await orchestrator.call(archive.upload, container)
+        async with session:
+            relays = [OutputRelay(sink, echo=False) for _, _, sink in commands]
+            tasks = [
+                asyncio.create_task(exec_in_container(orchestrator, container, cmd, relay))
+                for (_, cmd, _), relay in zip(commands, relays)]
+            # Print each linter's output as a block, in the order the linters were given: the
+            # linter in front streams its output, the others hold theirs back until their turn
+            exit_codes = {}
+            for (name, _, _), task, relay in zip(commands, tasks, relays):
+                if not reporter.enabled:
+                    print(f'==> {name} <==', flush=True)
+                relay.start_echo()
+                exit_codes[name] = await task
+                relay.close()
+                relay.flush()
+        if archive is not None and not persistent:
+            await orchestrator.call(archive.download, container)
+        return exit_codes
+    finally:
+        if not persistent:
+            with phase('container.remove'):
+                await orchestrator.call(container.remove, force=True)
+        collect_outputs(volumes)
+
+
+async def _run_persistent(orchestrator, image, cmd, cwd, idle_timeout, relay, archive=None):
+    import docker
+
+    client = orchestrator.client
+    transport = 'bind' if archive is None else 'archive'
+    with phase('container.persistent'):
+        container = await orchestrator.call(
+            get_persistent_container, client, image, cwd, idle_timeout, transport)
+    try:
+        return await _exec_with_archive(orchestrator, container, cmd, relay, archive)
+    except docker.errors.APIError as e:
+        if e.status_code not in (404, 409):
+            raise
+        # The container went idle and stopped between the lookup and the exec
+        with phase('container.persistent'):
+            container = await orchestrator.call(
+                get_persistent_container, client, image, cwd, idle_timeout, transport)
+        return await _exec_with_archive(orchestrator, container, cmd, relay, archive)
@@ -0,0 +1,179 @@
+import io
+import os
+import posixpath
+
+from ament_lint_pre_commit_hooks.discovery import find_files
+from ament_lint_pre_commit_hooks.filelist import read_file_list
+from ament_lint_pre_commit_hooks.mounts import (WORKSPACE_DIR, container_path,
+                                                is_within)
+from ament_lint_pre_commit_hooks.profiling import phase
+
+TRANSPORT_ENV = 'AMENT_LINT_TRANSPORT'
+TRANSPORTS = ('bind', 'archive')
+
+
+def add_transport_arguments(parser):
+    """Add the option choosing how files get into the containers."""
+    parser.add_argument(
+        '--transport',
+        choices=TRANSPORTS,
+        default=os.environ.get(TRANSPORT_ENV) or 'bind',
+        help='Bind mount the checked files into the containers, or copy them in and the '
+             'reports and reformatted files out as tar archives, for daemons where bind '
+             f'mounts are slow or unavailable (can also be set with {TRANSPORT_ENV})')
+
+
+def uses_archive(args):
+    """Check whether the files of a run are to be copied rather than mounted."""
+    return getattr(args, 'transport', 'bind') == 'archive'
+
+
+def _member_name(path):
+    return posixpath.normpath(path).lstrip('/')
+
+
+class Archive:
+    """Copy the files of a run into a container, and its outputs back, instead of mounting them.
+
+    Only the files on the linter command lines or in their file lists are sent, along with
+    the files mounted on their own such as config files, and the files below a mount whose
+    names have one of the endings in its tree, such as the modules mypy follows imports to.
+    Mounted directories are created otherwise empty, and output mounts as writable
+    directories. After the run, reports written to
+    output mounts and files changed below read-write mounts are copied back to the host.
+    Docker volumes live on the daemon, so they are still mounted.
+    """
+
+    def __init__(self, commands, volumes, cwd):
+        self.volumes = volumes
+        self.docker_volumes = {}
+        self.directories = {}
+        self.files = {}
+        self.writable = {}
+
+        directory_mounts = []
+        for host_path, spec in volumes.items():
+            bind = posixpath.normpath(spec['bind'])
+            if spec.get('volume'):
+                self.docker_volumes[host_path] = spec
+            elif 'output' in spec:
+                self.directories[bind] = 0o777
+            elif os.path.isdir(host_path):
+                self.directories[bind] = 0o755
+                directory_mounts.append((host_path, spec))
+                if spec.get('tree'):
+                    tree = spec['tree']
+                    for path in find_files([host_path], lambda path: path.endswith(tree)):
+                        rel_path = os.path.relpath(path, host_path).replace(os.sep, '/')
+                        self.files[posixpath.join(bind, rel_path)] = path
+            else:
+                self.files[bind] = host_path
+
+        args = [arg for cmd in commands for arg in cmd[1:]]
+        for host_path, spec in volumes.items():
+            if spec.get('file_list'):
+                args.extend(read_file_list(host_path))
+
+        for arg in args:
+            if arg.startswith('-'):
+                continue
+            path = os.path.abspath(arg)
+            for host_path, spec in directory_mounts:
+                if is_within(path, host_path) and os.path.isfile(path):
+                    target = container_path(path, cwd)
+                    self.files[target] = path
+                    if spec['mode'] == 'rw':
+                        self.writable[target] = path
+                    break
+
+    def stale_paths(self):
+        """Return the container paths to clear before the files are copied into a container
+        that earlier runs copied files into.
+
+        Files deleted or renamed on the host since would otherwise still be seen by the
+        linters, so the whole workspace is cleared, along with the mounts outside it.
+        """
+        paths = set()
+        for spec in self.volumes.values():
+            if spec.get('volume'):
+                continue
+            bind = posixpath.normpath(spec['bind'])
+            paths.add(WORKSPACE_DIR if is_within(bind, WORKSPACE_DIR) else bind)
+        return sorted(paths)
+
+    def pack(self):
+        """Return the directories and files to send as an uncompressed tar archive."""
+        import tarfile
+
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w', dereference=True) as tar:
+            for path, mode in sorted(self.directories.items()):
+                info = tarfile.TarInfo(_member_name(path))
+                info.type = tarfile.DIRTYPE
+                info.mode = mode
+                tar.addfile(info)
+            for target, host_path in sorted(self.files.items()):
+                tar.add(host_path, arcname=_member_name(target), recursive=False)
+        return data.getvalue()
+
+    def upload(self, container):
+        """Copy the files into a created or running container."""
+        with phase('archive.upload', files=len(self.files)) as counts:
+            data = self.pack()
+            counts['bytes'] = len(data)
+            container.put_archive('/', data)
+
+    def download(self, container):
+        """Copy the reports and changed files of a run back to the host."""
+        import docker
+
+        with phase('archive.download', files=0, bytes=0) as counts:
+            for host_path, spec in self.volumes.items():
+                if spec.get('volume'):
+                    continue
+                bind = posixpath.normpath(spec['bind'])
+                if 'output' in spec:
+                    name = os.path.basename(spec['output'])
+                    path = posixpath.join(bind, name)
+                    wanted = {path: os.path.join(host_path, name)}
+                elif spec['mode'] == 'rw' and bind in self.directories:
+                    path = bind
+                    wanted = {
+                        target: host_file for target, host_file in self.writable.items()
+                        if is_within(host_file, host_path)}
+                else:
+                    continue
+                if not wanted:
+                    continue
+                try:
+                    files = _fetch(container, path)
+                except docker.errors.NotFound:
+                    # The linter did not write the report
+                    continue
+                for target, content in files:
+                    if target not in wanted or _read(wanted[target]) == content:
+                        continue
+                    with open(wanted[target], 'wb') as f:
+                        f.write(content)
+                    counts['files'] += 1
+                    counts['bytes'] += len(content)
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _fetch(container, path):
+    """Return the (container path, content) of the regular files at or below path."""
+    import tarfile
+
+    chunks, _ = container.get_archive(path)
+    root = posixpath.dirname(path)
+    with tarfile.open(fileobj=io.BytesIO(b''.join(chunks))) as tar:
+        return [
+            (posixpath.join(root, member.name), tar.extractfile(member).read())
+            for member in tar.getmembers() if member.isfile()]
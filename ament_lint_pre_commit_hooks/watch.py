@@ -0,0 +1,210 @@
+import os
+import select
+import struct
+import time
+
+from ament_lint_pre_commit_hooks.discovery import (IGNORE_MARKERS,
+                                                   VCS_DIRECTORIES, find_files)
+
+DEFAULT_DEBOUNCE = 0.1
+# A burst of changes is linted after this long even if files keep changing
+MAX_BATCH_DELAY = 1.0
+# Interval between two scans when inotify is not available
+POLL_INTERVAL = 0.5
+
+# inotify event masks, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+_EVENT = struct.Struct('iIII')
+
+
+def add_watch_arguments(parser):
+    """Add the options enabling watch mode."""
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running after the first check and check the files again whenever they '
+             'are saved, in a persistent container')
+    parser.add_argument(
+        '--debounce',
+        metavar='SECONDS',
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help='In watch mode, wait until files stopped changing for this long before '
+             'checking them, so that a burst of saves is checked at once')
+
+
+def _watched_directories(root):
+    """Return the directories below root that discovery would walk."""
+    directories = []
+    for directory, subdirectories, names in os.walk(root):
+        if IGNORE_MARKERS.intersection(names):
+            subdirectories[:] = []
+            continue
+        subdirectories[:] = [name for name in subdirectories if name not in VCS_DIRECTORIES]
+        directories.append(directory)
+    return directories
+
+
+def open_watcher(paths, debounce=DEFAULT_DEBOUNCE):
+    """Return an inotify watcher of the paths, or a polling one where inotify is missing."""
+    try:
+        return InotifyWatcher(paths, debounce)
+    except (AttributeError, OSError, TypeError):
+        return PollingWatcher(paths, debounce)
+
+
+class InotifyWatcher:
+    """Report the files saved below the given paths, using inotify.
+
+    Directories are watched as discovery walks them, so VCS and colcon-ignored directories
+    never wake the watcher up. Directories created later are watched as they appear, and
+    their files reported as changed.
+    """
+
+    def __init__(self, paths, debounce=DEFAULT_DEBOUNCE):
+        import ctypes
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.debounce = debounce
+        self.paths = paths
+        # Watch descriptor -> (directory, whether its subdirectories are watched)
+        self._directories = {}
+        # Files given on their own, whose siblings are not reported
+        self._files = set()
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    for directory in _watched_directories(path):
+                        self._add(directory, recursive=True)
+                elif os.path.isfile(path):
+                    self._files.add(os.path.normpath(path))
+                    self._add(os.path.dirname(path) or os.curdir, recursive=False)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, directory, recursive):
+        import ctypes
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'cannot watch {directory}: {os.strerror(errno)}')
+        previous = self._directories.get(wd)
+        self._directories[wd] = (directory, recursive or (previous is not None and previous[1]))
+
+    def _read(self):
+        """Return the files changed according to the queued events."""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length]
+                               .rstrip(b'\0'))
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, so every file is considered changed
+                changed.update(find_files(self.paths, lambda path: True))
+                continue
+            if mask & IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            if wd not in self._directories:
+                continue
+            directory, recursive = self._directories[wd]
+            path = os.path.normpath(os.path.join(directory, name))
+            if mask & IN_ISDIR:
+                if recursive and name not in VCS_DIRECTORIES:
+                    for subdirectory in _watched_directories(path):
+                        self._add(subdirectory, recursive=True)
+                    # Files may have been written before the directory was watched
+                    changed.update(find_files([path], lambda path: True))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                if recursive or path in self._files:
+                    changed.add(path)
+        return changed
+
+    def wait(self):
+        """Block until files are saved and return them once the burst of saves is over."""
+        changed = set()
+        first_change = None
+        while True:
+            timeout = None
+            if changed:
+                timeout = min(
+                    self.debounce, first_change + MAX_BATCH_DELAY - time.monotonic())
+                if timeout <= 0:
+                    return sorted(changed)
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return sorted(changed)
+            changed.update(self._read())
+            if changed and first_change is None:
+                first_change = time.monotonic()
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PollingWatcher:
+    """Report the files saved below the given paths by scanning them periodically."""
+
+    def __init__(self, paths, debounce=DEFAULT_DEBOUNCE):
+        self.paths = paths
+        self.debounce = debounce
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for path in find_files(self.paths, lambda path: True):
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            snapshot[os.path.normpath(path)] = (stat_result.st_mtime_ns, stat_result.st_size)
+        return snapshot
+
+    def _changes(self):
+        snapshot = self._scan()
+        changed = {
+            path for path, state in snapshot.items() if self._snapshot.get(path) != state}
+        self._snapshot = snapshot
+        return changed
+
+    def wait(self):
+        """Block until files are saved and return them once the burst of saves is over."""
+        changed = set()
+        while not changed:
+            time.sleep(POLL_INTERVAL)
+            changed = self._changes()
+        time.sleep(self.debounce)
+        return sorted(changed | self._changes())
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,488 @@
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Tuple
+
+from ament_lint_pre_commit_hooks.backends import InProcessBackend
+from ament_lint_pre_commit_hooks.discovery import find_files
+
+# lxml is optional and only imported once the engine is used, which requires it
+
+CATALOG_ENV = 'XML_CATALOG_FILES'
+DEFAULT_CATALOG = '/etc/xml/catalog'
+_CATALOG_NS = '{urn:oasis:names:tc:entity:xmlns:xml:catalog}'
+_XSI_NO_NAMESPACE = '{http://www.w3.org/2001/XMLSchema-instance}noNamespaceSchemaLocation'
+
+# xml-model schematypens -> kind of schema, as named by the xmllint option validating it
+SCHEMA_TYPES = {
+    'http://www.w3.org/2001/XMLSchema': 'schema',
+    'http://relaxng.org/ns/structure/1.0': 'relaxng',
+    'http://purl.oclc.org/dsdl/schematron': 'schematron',
+}
+# How xmllint names the kinds of schema and the libxml2 error domains in its messages
+_SCHEMA_NAMES = {
+    'schema': 'WXS schema',
+    'relaxng': 'Relax-NG schema',
+    'schematron': 'Schematron schema',
+}
+_DOMAINS = {
+    'PARSER': 'parser',
+    'NAMESPACE': 'namespace',
+    'IO': 'I/O',
+    'VALID': 'validity',
+    'SCHEMASP': 'Schemas parser',
+    'SCHEMASV': 'Schemas validity',
+    'RELAXNGP': 'Relax-NG parser',
+    'RELAXNGV': 'Relax-NG validity',
+    'SCHEMATRONV': 'Schematron validity',
+    'XINCLUDE': 'XInclude',
+}
+
+
+def catalog_paths(paths=()):
+    """Return the given catalogs followed by those libxml2 reads by default."""
+    defaults = os.environ.get(CATALOG_ENV)
+    if defaults is not None:
+        defaults = defaults.split()
+    else:
+        defaults = [DEFAULT_CATALOG] if os.path.isfile(DEFAULT_CATALOG) else []
+    return [*paths, *defaults]
+
+
+def _file_path(location, base=None):
+    """Return the local path of a file URL or path, relative to a base file, or None."""
+    from urllib.parse import unquote, urlsplit
+
+    parts = urlsplit(location)
+    if parts.scheme == 'file':
+        path = unquote(parts.path)
+    elif len(parts.scheme) > 1:
+        # A remote URL, while a single letter is a Windows drive
+        return None
+    else:
+        path = location
+    if base is not None and not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(base), path)
+    return os.path.normpath(path)
+
+
+class Catalog:
+    """Schema locations mapped to local files by OASIS XML catalogs.
+
+    The uri, system, rewriteURI, rewriteSystem and nextCatalog entries are supported.
+    Remote locations that no entry maps are not resolved, and so never fetched.
+    """
+
+    def __init__(self, paths):
+        self.files = []
+        self._locations = {}
+        self._rewrites = []
+        for path in paths:
+            self._load(os.path.abspath(path))
+        # The longest matching prefix wins
+        self._rewrites.sort(key=lambda rewrite: len(rewrite[0]), reverse=True)
+
+    def _load(self, path):
+        import xml.etree.ElementTree as ET
+
+        if path in self.files:
+            return
+        try:
+            root = ET.parse(path).getroot()
+        except (OSError, ET.ParseError):
+            return
+        self.files.append(path)
+
+        next_catalogs = []
+        for element in root.iter():
+            tag = element.tag.replace(_CATALOG_NS, '')
+            if tag in ('uri', 'system'):
+                location = element.get('name' if tag == 'uri' else 'systemId')
+                target = _file_path(element.get('uri', ''), path)
+                if location and target:
+                    self._locations.setdefault(location, target)
+            elif tag in ('rewriteURI', 'rewriteSystem'):
+                start = element.get(
+                    'uriStartString' if tag == 'rewriteURI' else 'systemIdStartString')
+                prefix = _file_path(element.get('rewritePrefix', ''), path)
+                if start and prefix:
+                    self._rewrites.append((start, prefix))
+            elif tag == 'nextCatalog':
+                next_catalog = _file_path(element.get('catalog', ''), path)
+                if next_catalog:
+                    next_catalogs.append(next_catalog)
+        # Entries of a catalog take precedence over those of the catalogs it delegates to
+        for next_catalog in next_catalogs:
+            self._load(next_catalog)
+
+    def resolve(self, location, base=None):
+        """Return the local file of a schema location, or None if it is not available."""
+        path = _file_path(location, base)
+        if path is None:
+            path = self._locations.get(location)
+        if path is None:
+            from urllib.parse import unquote
+
+            for start, prefix in self._rewrites:
+                if location.startswith(start):
+                    path = os.path.join(prefix, unquote(location[len(start):]))
+                    break
+        return path if path is not None and os.path.isfile(path) else None
+
+    def digest(self):
+        """Return a digest of the catalog files."""
+        import hashlib
+
+        digest = hashlib.sha256()
+        for path in self.files:
+            digest.update(f'{path}\0'.encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+
+def _schema_references(pis, attrib):
+    """Return the (kind, location) of the schemas a document asks to be validated against.
+
+    Like ament_xmllint, the xml-model processing instructions are used, or the
+    xsi:noNamespaceSchemaLocation attribute of the root element if there is none.
+    """
+    references = []
+    for pi in pis:
+        if pi.target != 'xml-model':
+            continue
+        kind = SCHEMA_TYPES.get(pi.get('schematypens'))
+        if kind is not None and pi.get('href'):
+            references.append((kind, pi.get('href')))
+    if not references and attrib.get(_XSI_NO_NAMESPACE):
+        references.append(('schema', attrib[_XSI_NO_NAMESPACE]))
+    return references
+
+
+class _ProcessingInstruction:
+    """A processing instruction read by ElementTree, with the pseudo-attributes of lxml."""
+
+    _attribute = re.compile(r"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+    def __init__(self, text):
+        self.target, _, data = (text or '').partition(' ')
+        self.attrib = {
+            name: double or single for name, double, single in self._attribute.findall(data)}
+
+    def get(self, name):
+        return self.attrib.get(name)
+
+
+def local_schemas(path):
+    """Return the local files of the schemas an XML file asks to be validated against.
+
+    Only the start of the file up to the root element is read, with the standard library,
+    so this works without lxml.
+    """
+    import xml.etree.ElementTree as ET
+
+    pis = []
+    attrib = {}
+    try:
+        with open(path, 'rb') as f:
+            for event, element in ET.iterparse(f, events=('pi', 'start')):
+                if event == 'pi':
+                    pis.append(_ProcessingInstruction(element.text))
+                else:
+                    attrib = dict(element.attrib)
+                    break
+    except (OSError, ET.ParseError):
+        return []
+    schemas = []
+    for _, location in _schema_references(pis, attrib):
+        schema = _file_path(location, path)
+        if schema is not None and os.path.isfile(schema):
+            schemas.append(schema)
+    return schemas
+
+
+def _format_entry(entry):
+    """Format a libxml2 error the way xmllint prints it."""
+    location = ''
+    if entry.filename and entry.filename != '<string>':
+        location = f'{entry.filename}:{entry.line}: '
+    element = ''
+    if entry.domain_name in ('SCHEMASV', 'RELAXNGV', 'SCHEMATRONV') and entry.path:
+        name = entry.path.rsplit('/', 1)[-1].split('[', 1)[0].rsplit(':', 1)[-1]
+        element = f'element {name}: '
+    domain = _DOMAINS.get(entry.domain_name)
+    domain = f'{domain} ' if domain else ''
+    level = 'warning' if entry.level_name == 'WARNING' else 'error'
+    return f'{location}{element}{domain}{level} : {entry.message}'
+
+
+def _context_lines(path, entry):
+    """Return the source line of a parser error and a caret below the error position."""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for number, line in enumerate(f, 1):
+                if number == entry.line:
+                    line = line.rstrip('\r\n')
+                    return [line, ' ' * max(0, min(entry.column, len(line)) - 1) + '^']
+    except OSError:
+        pass
+    return []
+
+
+class XmlEngine:
+    """Check XML files like ament_xmllint, with the libxml2 of lxml instead of xmllint.
+
+    Each file is parsed once and validated against the schemas it references. Schemas are
+    loaded from local paths and the catalog only, and compiled once per thread and schema
+    content, so the files referencing the same schema share it. The files are checked by
+    threads kept for the lifetime of the engine, so their schemas are reused by later runs.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._local = threading.local()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self):
+        """Return the threads checking files, started on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1, thread_name_prefix='xml_engine')
+            return self._executor
+
+    def _parser(self):
+        """Return the parser of this thread, which resolves resources with the catalog."""
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            from lxml import etree
+
+            catalog = self.catalog
+
+            class CatalogResolver(etree.Resolver):
+
+                def resolve(self, url, public_id, context):
+                    path = catalog.resolve(url)
+                    return None if path is None else self.resolve_filename(path, context)
+
+            parser = etree.XMLParser(no_network=True, load_dtd=False)
+            parser.resolvers.add(CatalogResolver())
+            self._local.parser = parser
+            self._local.schemas = {}
+            self._local.digests = {}
+        return parser
+
+    def is_local(self, path):
+        """Check whether the schemas of a file are available without the network.
+
+        Only the start of the file up to the root element is parsed.
+        """
+        from lxml import etree
+
+        pis = []
+        attrib = {}
+        try:
+            for event, element in etree.iterparse(
+                    path, events=('pi', 'start'), no_network=True, load_dtd=False):
+                if event == 'pi':
+                    pis.append(element)
+                else:
+                    attrib = dict(element.attrib)
+                    break
+        except (OSError, etree.XMLSyntaxError):
+            # The engine reports the file as malformed just like xmllint
+            return True
+        return all(
+            self.catalog.resolve(location, path) is not None
+            for _, location in _schema_references(pis, attrib))
+
+    def _schema_digest(self, path):
+        """Return the digest of a schema file, reading it again only once it changed."""
+        import hashlib
+
+        stat_result = os.stat(path)
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._local.digests.get(path)
+        if cached is None or cached[0] != stamp:
+            with open(path, 'rb') as f:
+                cached = (stamp, hashlib.sha256(f.read()).hexdigest())
+            self._local.digests[path] = cached
+        return cached[1]
+
+    def _validator(self, kind, location, base):
+        """Return the compiled schema of a location, or None and the errors compiling it."""
+        from lxml import etree
+
+        path = self.catalog.resolve(location, base)
+        if path is None:
+            return None, [
+                f"Schemas parser error : Failed to locate the main schema resource at "
+                f"'{location}'.",
+                f'{_SCHEMA_NAMES[kind]} {location} failed to compile']
+
+        key = (kind, self._schema_digest(path))
+        if key not in self._local.schemas:
+            classes = {
+                'schema': etree.XMLSchema,
+                'relaxng': etree.RelaxNG,
+                'schematron': etree.Schematron,
+            }
+            try:
+                validator = classes[kind](etree.parse(path, self._parser()))
+                self._local.schemas[key] = (validator, [])
+            except (etree.XMLSyntaxError, etree.SchemaParseError) as e:
+                self._local.schemas[key] = (None, [
+                    *(_format_entry(entry) for entry in e.error_log),
+                    f'{_SCHEMA_NAMES[kind]} {location} failed to compile'])
+        return self._local.schemas[key]
+
+    def check(self, path):
+        """Check a file and return whether it is valid, and the xmllint output about it."""
+        from lxml import etree
+
+        parser = self._parser()
+        try:
+            tree = etree.parse(path, parser)
+        except etree.XMLSyntaxError as e:
+            lines = []
+            for entry in e.error_log:
+                lines.append(_format_entry(entry))
+                if entry.domain_name == 'PARSER':
+                    lines.extend(_context_lines(path, entry))
+            return False, lines or [f'{path}:1: parser error : {e}']
+        except OSError as e:
+            return False, [f'warning: failed to load external entity "{path}"', str(e)]
+
+        root = tree.getroot()
+        pis = reversed(list(root.itersiblings(preceding=True)))
+        references = _schema_references(
+            [pi for pi in pis if isinstance(pi, etree._ProcessingInstruction)], root.attrib)
+
+        valid = True
+        lines = []
+        for kind, location in references:
+            validator, errors = self._validator(kind, location, path)
+            lines.extend(errors)
+            if validator is None:
+                valid = False
+                continue
+            if validator.validate(tree):
+                lines.append(f'{path} validates')
+            else:
+                valid = False
+                lines.extend(_format_entry(entry) for entry in validator.error_log)
+                lines.append(f'{path} fails to validate')
+        return valid, lines
+
+    def main(self, argv):
+        """Check the files given like to the ament_xmllint command and return its exit code."""
+        parser = argparse.ArgumentParser(prog='ament_xmllint')
+        parser.add_argument('paths', nargs='*', default=[os.curdir])
+        parser.add_argument('--exclude', nargs='*', default=[])
+        parser.add_argument('--extensions', nargs='*', default=['xml'])
+        parser.add_argument('--xunit-file')
+        args = parser.parse_args(argv)
+
+        start_time = time.time()
+        # Like ament_xmllint, files named explicitly are checked whatever their extension
+        named = {path for path in args.paths if os.path.isfile(path)}
+        files = find_files(
+            args.paths,
+            lambda path: path in named or any(
+                os.path.basename(path).endswith(f'.{ext}') for ext in args.extensions),
+            args.exclude)
+        if not files:
+            print('No files found', file=sys.stderr)
+            return 1
+
+        # lxml releases the GIL while parsing and validating, so the files are checked in
+        # parallel, and their output printed in order afterwards
+        results = list(self._pool().map(self.check, files))
+
+        invalid = 0
+        for valid, lines in results:
+            if not valid:
+                invalid += 1
+                for line in lines:
+                    print(line)
+        if invalid:
+            print(f'{invalid} files are invalid', file=sys.stderr)
+        else:
+            print('No problems found')
+
+        if args.xunit_file:
+            write_xunit_file(args.xunit_file, files, results, time.time() - start_time)
+        return 1 if invalid else 0
+
+
+def write_xunit_file(path, files, results, elapsed):
+    """Write an xunit report with a testcase per file, like ament_xmllint."""
+    import xml.etree.ElementTree as ET
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    suite = ET.Element('testsuite', {
+        'name': name,
+        'tests': str(len(files)),
+        'errors': '0',
+        'failures': str(sum(1 for valid, _ in results if not valid)),
+        'time': f'{elapsed:.3f}',
+    })
+    for file_path, (valid, lines) in zip(files, results):
+        testcase = ET.SubElement(
+            suite, 'testcase', {'name': file_path, 'classname': f'{name}.xmllint'})
+        if not valid:
+            ET.SubElement(testcase, 'failure', {'message': '\n'.join(lines)})
+    ET.SubElement(suite, 'system-out').text = \
+        'Checked files:\n' + ''.join(f'* {file_path}\n' for file_path in files)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ET.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
+
+
+# Catalog paths -> engine, kept for the whole process so that watch mode reuses the schemas
+_engines: Dict[Tuple[str, ...], XmlEngine] = {}
+
+
+class XmlEngineBackend(InProcessBackend):
+    """Check XML files with the engine of this package in the hook process.
+
+    This needs neither docker nor the ament packages, only lxml.
+    """
+
+    name = 'engine'
+
+    def __init__(self, catalogs=()):
+        super().__init__('ament_xmllint')
+        self.catalogs = tuple(catalog_paths(catalogs))
+
+    def available(self):
+        try:
+            import lxml.etree  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @property
+    def engine(self):
+        if self.catalogs not in _engines:
+            _engines[self.catalogs] = XmlEngine(Catalog(self.catalogs))
+        return _engines[self.catalogs]
+
+    def toolchain(self):
+        """Return the versions of lxml and libxml2, and the digest of the catalogs."""
+        from lxml import etree
+
+        return {
+            'lxml': etree.__version__,
+            'libxml2': '.'.join(str(part) for part in etree.LIBXML_VERSION),
+            'catalog': self.engine.catalog.digest(),
+        }
+
+    def main_function(self):
+        return self.engine.main
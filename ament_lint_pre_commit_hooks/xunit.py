@@ -0,0 +1,43 @@
+import os
+import xml.etree.ElementTree as ET
+
+# Numeric testsuite attributes that add up across merged reports
+_COUNT_ATTRIBUTES = ('tests', 'failures', 'errors', 'skipped', 'skip')
+
+
+def _testsuites(root):
+    if root.tag == 'testsuite':
+        return [root]
+    return root.findall('testsuite')
+
+
+def merge_xunit_files(paths, output_path):
+    """Merge several xunit reports of the same linter into a single testsuite."""
+    merged = None
+    system_out = []
+    for path in paths:
+        for suite in _testsuites(ET.parse(path).getroot()):
+            if merged is None:
+                merged = ET.Element('testsuite', dict(suite.attrib))
+                for name in _COUNT_ATTRIBUTES + ('time',):
+                    if name in merged.attrib:
+                        merged.set(name, '0')
+            for name in _COUNT_ATTRIBUTES:
+                if name in suite.attrib:
+                    merged.set(name, str(int(merged.get(name, '0')) + int(suite.get(name))))
+            if 'time' in suite.attrib:
+                total_time = float(merged.get('time', '0')) + float(suite.get('time'))
+                merged.set('time', f'{total_time:.3f}')
+            for child in suite:
+                if child.tag == 'system-out':
+                    system_out.append(child.text or '')
+                else:
+                    merged.append(child)
+
+    if merged is None:
+        merged = ET.Element('testsuite', {'name': 'ament_lint', 'tests': '0', 'failures': '0'})
+    if system_out:
+        ET.SubElement(merged, 'system-out').text = ''.join(system_out)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    ET.ElementTree(merged).write(output_path, encoding='utf-8', xml_declaration=True)
@@ -0,0 +1,348 @@
+"""A stand-in for the docker SDK that simulates daemon latency without running anything.
+
+Containers "lint" the files on their command line by sleeping for a per-file cost and
+streaming a configurable share of findings over real sockets, so that the hooks exercise
+the same attach, exec and demultiplexing code paths as with a real daemon.
+"""
+import io
+import itertools
+import posixpath
+import socket
+import struct
+import sys
+import tarfile
+import threading
+import time
+import types
+import zlib
+
+# Simulated latency of daemon operations, in seconds
+DEFAULT_LATENCY = {
+    'build': 20.0,
+    'image_get': 0.005,
+    'create': 0.04,
+    'start': 0.25,
+    'exec': 0.03,
+    'remove': 0.05,
+    'archive': 0.01,
+    'archive_per_mb': 0.02,
+    'per_file': 0.004,
+    'per_line': 0.0001,
+}
+
+_FRAME_HEADER = struct.Struct('>BxxxL')
+_STDOUT = 1
+
+# Where the hooks mount the list files of large batches
+FILE_LIST_DIR = '/ament_lint_file_list'
+
+
+class DockerException(Exception):
+    pass
+
+
+class APIError(DockerException):
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NotFound(APIError):
+
+    def __init__(self, message):
+        super().__init__(message, 404)
+
+
+class ImageNotFound(NotFound):
+    pass
+
+
+class BuildError(DockerException):
+    pass
+
+
+errors = types.SimpleNamespace(
+    DockerException=DockerException, APIError=APIError, NotFound=NotFound,
+    ImageNotFound=ImageNotFound, BuildError=BuildError)
+
+
+def linted_files(cmd, read=None):
+    """Return the files on a linter command line, which the hooks always pass last.
+
+    Large batches are passed in a list file given right before the linter, which is
+    looked up with read.
+    """
+    names = [
+        index for index, arg in enumerate(cmd) if arg.startswith('ament_') or arg == 'dmypy']
+    if not names:
+        return []
+    if names[-1] > 0 and cmd[names[-1] - 1].startswith(FILE_LIST_DIR + '/'):
+        content = read(cmd[names[-1] - 1]) if read is not None else None
+        return [entry.decode() for entry in (content or b'').split(b'\0') if entry]
+    args = cmd[names[-1] + 1:]
+    start = len(args)
+    while start > 0 and not args[start - 1].startswith('-'):
+        start -= 1
+    # The first trailing argument may be the value of the option before it
+    if 0 < start < len(args) and args[start - 1].startswith('--'):
+        start += 1
+    return args[start:]
+
+
+def write_report(cmd, files, workdir='/workspace'):
+    """Store the xunit report a command asks for in the files of a container."""
+    if '--xunit-file' not in cmd:
+        return
+    path = posixpath.join(workdir, cmd[cmd.index('--xunit-file') + 1])
+    files[posixpath.normpath(path)] = b'<testsuite name="fake" tests="0"/>\n'
+
+
+class Daemon:
+    """Simulated daemon state shared by every client of one process."""
+
+    def __init__(self, latency=None, finding_rate=0.05, image_cached=True):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.finding_rate = finding_rate
+        self.image_cached = image_cached
+        self.intervals = []
+        self.lock = threading.Lock()
+
+    def sleep(self, kind, seconds=None):
+        """Simulate an operation, recording when it kept the daemon busy."""
+        seconds = self.latency[kind] if seconds is None else seconds
+        start = time.perf_counter()
+        time.sleep(seconds)
+        with self.lock:
+            self.intervals.append((kind, start, time.perf_counter()))
+
+    def busy_seconds(self, *kinds):
+        """Return how long at least one operation of the given kinds was running."""
+        intervals = sorted(
+            (start, end) for kind, start, end in self.intervals if not kinds or kind in kinds)
+        busy = 0.0
+        current_start = current_end = None
+        for start, end in intervals:
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    busy += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            busy += current_end - current_start
+        return busy
+
+    def lint(self, cmd, sock, read=None):
+        """Lint the files of a command, stream the findings and return the exit code."""
+        files = linted_files(cmd, read)
+        lines = [
+            f'{path}:1:1: [fake/finding] simulated finding\n' for path in files
+            if zlib.crc32(path.encode()) % 10000 < self.finding_rate * 10000]
+        self.sleep('lint', self.latency['per_file'] * len(files))
+        try:
+            if lines:
+                self.sleep('log', self.latency['per_line'] * len(lines))
+                data = ''.join(lines).encode()
+                sock.sendall(_FRAME_HEADER.pack(_STDOUT, len(data)) + data)
+        finally:
+            sock.close()
+        return 1 if lines else 0
+
+
+class Image:
+
+    def __init__(self, tag):
+        self.id = 'sha256:' + format(zlib.crc32(tag.encode()), '064x')
+        self.tags = [tag]
+
+
+class Images:
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.store = {}
+
+    def get(self, tag):
+        self.daemon.sleep('image_get')
+        if tag not in self.store:
+            if not self.daemon.image_cached:
+                raise ImageNotFound(f'No such image: {tag}')
+            self.store[tag] = Image(tag)
+        return self.store[tag]
+
+    def build(self, tag, **kwargs):
+        self.daemon.sleep('build')
+        self.store[tag] = Image(tag)
+        return self.store[tag], iter([])
+
+
+class Container:
+
+    _ids = itertools.count()
+
+    def __init__(self, daemon, kwargs):
+        self.daemon = daemon
+        self.id = f'fake{next(self._ids):012d}'
+        self.name = kwargs.get('name')
+        self.command = kwargs.get('command') or []
+        self.labels = kwargs.get('labels') or {}
+        self.volumes = kwargs.get('volumes') or {}
+        self.status = 'created'
+        self.attrs = {'State': {'Status': 'created'}}
+        self.sock = None
+        self.thread = None
+        self.exit_code = None
+        self.files = {}
+
+    def start(self):
+        self.daemon.sleep('start')
+        self.status = self.attrs['State']['Status'] = 'running'
+        if self.sock is not None:
+            self.thread = threading.Thread(target=self._run)
+            self.thread.start()
+
+    def _run(self):
+        self.exit_code = self.daemon.lint(self.command, self.sock, self.read)
+        write_report(self.command, self.files)
+
+    def wait(self, **kwargs):
+        if self.thread is not None:
+            self.thread.join()
+        return {'StatusCode': self.exit_code or 0}
+
+    def remove(self, force=False):
+        self.daemon.sleep('remove')
+        self.status = self.attrs['State']['Status'] = 'removed'
+
+    def read(self, path):
+        """Return the content of a file copied into or mounted in the container, or None."""
+        path = posixpath.normpath(path)
+        if path in self.files:
+            return self.files[path]
+        for host_path, spec in self.volumes.items():
+            if posixpath.normpath(spec['bind']) == path:
+                with open(host_path, 'rb') as f:
+                    return f.read()
+        return None
+
+    def put_archive(self, path, data):
+        self.daemon.sleep(
+            'archive', self.daemon.latency['archive'] +
+            self.daemon.latency['archive_per_mb'] * len(data) / 2**20)
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    name = posixpath.join(path, member.name)
+                    self.files[posixpath.normpath(name)] = tar.extractfile(member).read()
+        return True
+
+    def get_archive(self, path, chunk_size=None):
+        path = posixpath.normpath(path)
+        prefix = path.rstrip('/') + '/'
+        members = {
+            name: content for name, content in self.files.items()
+            if name == path or name.startswith(prefix)}
+        if not members:
+            raise NotFound(f'Could not find the file {path} in container {self.id}')
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w') as tar:
+            for name, content in members.items():
+                info = tarfile.TarInfo(posixpath.relpath(name, posixpath.dirname(path)))
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        self.daemon.sleep(
+            'archive', self.daemon.latency['archive'] +
+            self.daemon.latency['archive_per_mb'] * data.tell() / 2**20)
+        return iter([data.getvalue()]), {'name': posixpath.basename(path)}
+
+
+class Containers:
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.store = {}
+
+    def create(self, **kwargs):
+        self.daemon.sleep('create')
+        container = Container(self.daemon, kwargs)
+        self.store[container.id] = container
+        if container.name:
+            self.store[container.name] = container
+        return container
+
+    def run(self, detach=False, **kwargs):
+        # Only long-running helper containers are started with run
+        container = self.create(**kwargs)
+        container.start()
+        return container
+
+    def get(self, name):
+        container = self.store.get(name)
+        if container is None or container.status == 'removed':
+            raise NotFound(f'No such container: {name}')
+        return container
+
+
+class API:
+
+    def __init__(self, daemon, containers):
+        self.daemon = daemon
+        self.containers = containers
+        self.execs = {}
+        self._ids = itertools.count()
+
+    def attach_socket(self, container_id, params=None):
+        ours, theirs = socket.socketpair()
+        self.containers.store[container_id].sock = theirs
+        return ours
+
+    def exec_create(self, container_id, cmd, **kwargs):
+        self.daemon.sleep('exec')
+        exec_id = f'exec{next(self._ids)}'
+        self.execs[exec_id] = {
+            'cmd': cmd, 'container': container_id, 'thread': None, 'exit_code': None}
+        return {'Id': exec_id}
+
+    def exec_start(self, exec_id, socket=False, **kwargs):
+        # The socket argument mirrors the docker SDK and hides the module of the same name
+        ours, theirs = _socketpair()
+        execution = self.execs[exec_id]
+
+        def run():
+            container = self.containers.store[execution['container']]
+            execution['exit_code'] = self.daemon.lint(execution['cmd'], theirs, container.read)
+            write_report(execution['cmd'], container.files)
+
+        execution['thread'] = threading.Thread(target=run)
+        execution['thread'].start()
+        return ours
+
+    def exec_inspect(self, exec_id):
+        execution = self.execs[exec_id]
+        running = execution['thread'].is_alive()
+        return {'Running': running, 'ExitCode': None if running else execution['exit_code']}
+
+
+def _socketpair():
+    return socket.socketpair()
+
+
+class DockerClient:
+
+    def __init__(self, daemon):
+        self.images = Images(daemon)
+        self.containers = Containers(daemon)
+        self.api = API(daemon, self.containers)
+
+
+def install(latency=None, finding_rate=0.05, image_cached=True):
+    """Make `import docker` return the fake and return its simulated daemon."""
+    daemon = Daemon(latency, finding_rate, image_cached)
+    client = DockerClient(daemon)
+    module = types.ModuleType('docker')
+    module.errors = errors
+    module.from_env = lambda **kwargs: client
+    module.DockerClient = DockerClient
+    sys.modules['docker'] = module
+    return daemon
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Benchmark every hook on a synthetic workspace against a fake or a real docker daemon.
+
+Each hook runs in its own process so that the peak RSS is its own. The orchestration
+overhead is the wall time that is neither file discovery nor simulated linting, i.e. the
+cost of the image check, container lifecycle and output relaying. It is only known with
+the fake daemon.
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+HOOKS = ['cpplint', 'flake8', 'lint_cmake', 'mypy', 'pep257', 'uncrustify', 'xmllint', 'lint_all']
+
+# Metric -> (whether a larger value is better, change below which it is only noise)
+METRICS = {
+    'discovery_s': (False, 0.005),
+    'overhead_s': (False, 0.02),
+    'files_per_s': (True, 0.0),
+    'peak_rss_mb': (False, 2.0),
+}
+
+
+def _discover(module, argv):
+    """Return the files a hook would check, as its own discovery finds them."""
+    if module.__name__.endswith('ament_lint_all'):
+        own_argv, _ = module.split_linter_arguments(argv)
+        args = module.create_parser().parse_args(own_argv)
+        return module.expand_paths(args.paths, module.file_source(args))
+    return module.collect_files(module.create_parser().parse_args(argv))
+
+
+def run_worker(hook, argv, fake, latency, finding_rate):
+    """Run one hook in this process and return its measurements."""
+    if fake:
+        import fake_docker
+        daemon = fake_docker.install(latency, finding_rate)
+    module = importlib.import_module(f'ament_lint_pre_commit_hooks.ament_{hook}')
+
+    start = time.perf_counter()
+    files = _discover(module, argv)
+    discovery_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        exit_code = module.main(argv)
+    wall_s = time.perf_counter() - start
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss_mb = rss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+    result = {
+        'files': len(files),
+        'exit_code': exit_code,
+        'discovery_s': discovery_s,
+        'wall_s': wall_s,
+        'files_per_s': len(files) / wall_s if wall_s else 0.0,
+        'peak_rss_mb': peak_rss_mb,
+    }
+    if fake:
+        result['lint_s'] = daemon.busy_seconds('lint', 'log')
+        # main discovers the files again, so that is not orchestration either
+        result['overhead_s'] = max(0.0, wall_s - discovery_s - result['lint_s'])
+    return result
+
+
+def run_hook(hook, workspace, args):
+    """Run a hook in a new process a number of times and return the median measurements."""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker', hook,
+        '--latency-scale', str(args.latency_scale),
+        '--finding-rate', str(args.finding_rate),
+    ]
+    if args.docker == 'real':
+        command.append('--real-docker')
+    hook_argv = ['src'] + ([] if args.cache else ['--no-cache']) + args.hook_args
+    if args.jobs != 1 and hook != 'lint_all':
+        hook_argv += ['--jobs', str(args.jobs)]
+    if args.persistent:
+        hook_argv.append('--persistent')
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [REPOSITORY_DIR, BENCHMARKS_DIR, os.environ.get('PYTHONPATH')])))
+    env.setdefault('AMENT_LINT_CACHE_DIR', os.path.join(workspace, '.cache'))
+
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            command + ['--'] + hook_argv, cwd=workspace, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f'benchmark of {hook} failed:\n{result.stderr}')
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    return {
+        key: statistics.median(run[key] for run in runs) if key != 'exit_code'
+        else max(run[key] for run in runs)
+        for key in runs[0]}
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of the results against a baseline."""
+    regressions = []
+    for hook, result in results.items():
+        previous = baseline.get(hook, {})
+        for metric, (larger_is_better, noise) in METRICS.items():
+            if metric not in result or not previous.get(metric):
+                continue
+            if abs(result[metric] - previous[metric]) <= noise:
+                continue
+            ratio = result[metric] / previous[metric]
+            if (ratio < 1 / (1 + tolerance)) if larger_is_better else (ratio > 1 + tolerance):
+                regressions.append(
+                    f'{hook} {metric}: {result[metric]:.3f} against {previous[metric]:.3f} '
+                    f'in the baseline')
+    return regressions
+
+
+def print_results(results):
+    print(f'{"hook":<12} {"files":>6} {"discovery":>10} {"overhead":>10} {"wall":>8} '
+          f'{"files/s":>9} {"rss MB":>8}')
+    for hook, result in results.items():
+        overhead = f'{result["overhead_s"]:.3f}' if 'overhead_s' in result else '-'
+        print(f'{hook:<12} {result["files"]:>6.0f} {result["discovery_s"]:>10.4f} '
+              f'{overhead:>10} {result["wall_s"]:>8.3f} {result["files_per_s"]:>9.1f} '
+              f'{result["peak_rss_mb"]:>8.1f}')
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description='Benchmark every hook on a synthetic colcon workspace.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '--hooks', default=','.join(HOOKS), help='A comma separated list of hooks to run')
+    parser.add_argument('--packages', type=int, default=50, help='The number of packages')
+    parser.add_argument(
+        '--workspace', metavar='DIR',
+        help='Use or generate the workspace in this directory instead of a temporary one')
+    parser.add_argument('--runs', type=int, default=3, help='The number of runs per hook')
+    parser.add_argument(
+        '--docker', choices=['fake', 'real'], default='fake',
+        help='Run against the simulated daemon or the local docker daemon')
+    parser.add_argument(
+        '--latency-scale', type=float, default=1.0,
+        help='Scale every simulated daemon latency by this factor')
+    parser.add_argument(
+        '--finding-rate', type=float, default=0.05,
+        help='The share of files the simulated linters report a finding for')
+    parser.add_argument('--jobs', type=int, default=1, help='Passed as --jobs to the hooks')
+    parser.add_argument(
+        '--persistent', action='store_true', help='Pass --persistent to the hooks')
+    parser.add_argument(
+        '--cache', action='store_true', help='Keep the result cache enabled between runs')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as a baseline')
+    parser.add_argument(
+        '--baseline', metavar='FILE', help='Compare against results saved with --save')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='The allowed change relative to the baseline, as a fraction')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--real-docker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument(
+        'hook_args', nargs='*', metavar='HOOK_ARG',
+        help='Extra arguments passed to every hook, after --')
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        from fake_docker import DEFAULT_LATENCY
+        latency = {key: value * args.latency_scale for key, value in DEFAULT_LATENCY.items()}
+        result = run_worker(
+            args.worker, args.hook_args, not args.real_docker, latency, args.finding_rate)
+        print(json.dumps(result))
+        return 0
+
+    with contextlib.ExitStack() as stack:
+        workspace = args.workspace or stack.enter_context(tempfile.TemporaryDirectory())
+        if not os.path.isdir(os.path.join(workspace, 'src')):
+            from workspace import generate_workspace
+            generate_workspace(workspace, args.packages)
+
+        results = {}
+        for hook in args.hooks.split(','):
+            results[hook] = run_hook(hook, workspace, args)
+
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f'regression: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
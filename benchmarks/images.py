@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Measure the size, build time and container cold start of every linter image target.
+
+This needs the local docker daemon. The build time is only measured with --build, which
+removes the images of this checkout first and builds them without the layer cache.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIR)
+
+from ament_lint_pre_commit_hooks.docker_image import \
+    DOCKERFILE_DIR  # noqa: E402
+from ament_lint_pre_commit_hooks.docker_image import \
+    DOCKERFILE_NAME  # noqa: E402
+from ament_lint_pre_commit_hooks.docker_image import \
+    LINTER_TARGETS  # noqa: E402
+from ament_lint_pre_commit_hooks.docker_image import TARGETS  # noqa: E402
+from ament_lint_pre_commit_hooks.docker_image import image_tag  # noqa: E402
+
+# Metric -> (whether a larger value is better, change below which it is only noise)
+METRICS = {
+    'size_mb': (False, 1.0),
+    'build_s': (False, 5.0),
+    'cold_start_s': (False, 0.05),
+}
+
+
+def build(client, target, no_cache):
+    """Build a target image and return the time it took."""
+    import docker
+
+    if no_cache:
+        try:
+            client.images.remove(image_tag(target), force=True)
+        except docker.errors.ImageNotFound:
+            pass
+    start = time.perf_counter()
+    client.images.build(
+        path=DOCKERFILE_DIR, dockerfile=DOCKERFILE_NAME, target=target, tag=image_tag(target),
+        nocache=no_cache, rm=True)
+    return time.perf_counter() - start
+
+
+def cold_start(client, tag, runs):
+    """Return the best time to create, start, wait for and remove a container doing nothing.
+
+    The entrypoint sources ROS as it does for the linters.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        container = client.containers.create(image=tag, command=['true'])
+        try:
+            container.start()
+            container.wait()
+        finally:
+            container.remove(force=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(targets, runs, build_images):
+    import docker
+
+    client = docker.from_env()
+    results = {}
+    for target in targets:
+        result = {}
+        if build_images:
+            result['build_s'] = round(build(client, target, no_cache=True), 1)
+        else:
+            try:
+                client.images.get(image_tag(target))
+            except docker.errors.ImageNotFound:
+                build(client, target, no_cache=False)
+        image = client.images.get(image_tag(target))
+        result['size_mb'] = round(image.attrs['Size'] / 1e6, 1)
+        result['cold_start_s'] = round(cold_start(client, image_tag(target), runs), 3)
+        result['linters'] = sorted(
+            linter for linter, linter_target in LINTER_TARGETS.items()
+            if target in (linter_target, 'all'))
+        results[target] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of the results against a baseline."""
+    regressions = []
+    for target, result in results.items():
+        previous = baseline.get(target, {})
+        for metric, (larger_is_better, noise) in METRICS.items():
+            if metric not in result or not previous.get(metric):
+                continue
+            if abs(result[metric] - previous[metric]) <= noise:
+                continue
+            ratio = result[metric] / previous[metric]
+            if (ratio < 1 / (1 + tolerance)) if larger_is_better else (ratio > 1 + tolerance):
+                regressions.append(
+                    f'{target} {metric}: {result[metric]} against {previous[metric]} '
+                    f'in the baseline')
+    return regressions
+
+
+def print_results(results):
+    print(f'{"target":<8} {"size MB":>9} {"build s":>9} {"start s":>9}  linters')
+    for target, result in results.items():
+        build_s = f'{result["build_s"]:.1f}' if 'build_s' in result else '-'
+        print(f'{target:<8} {result["size_mb"]:>9.1f} {build_s:>9} '
+              f'{result["cold_start_s"]:>9.3f}  {", ".join(result["linters"])}')
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description='Measure the size and cold start time of every linter image target.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '--targets', default=','.join(TARGETS),
+        help='A comma separated list of the Dockerfile targets to measure')
+    parser.add_argument(
+        '--runs', type=int, default=5, help='The number of cold starts per target')
+    parser.add_argument(
+        '--build', action='store_true',
+        help='Remove and rebuild every image without the layer cache, timing the builds')
+    parser.add_argument(
+        '--baseline', metavar='FILE', help='Compare against results saved with --save')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='The allowed growth relative to the baseline, as a fraction')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as a baseline')
+    args = parser.parse_args(argv)
+
+    results = measure(args.targets.split(','), args.runs, args.build)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'regression: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Measure the startup time of every console script and catch startup regressions."""
+import argparse
+import configparser
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a hook must not import before it knows that there is something to check
+HEAVY_MODULES = ['asyncio', 'docker', 'pydocstyle', 'requests', 'urllib3']
+
+# Runs a console script in a fresh interpreter and reports how long importing and running
+# it took, and what it imported
+SNIPPET = '''
+import time
+start = time.perf_counter()
+import sys
+from {module} import {function}
+try:
+    exit_code = {function}(sys.argv[1:])
+except SystemExit as e:
+    exit_code = e.code
+elapsed_ms = (time.perf_counter() - start) * 1000
+import json
+print()
+print(json.dumps({{
+    'exit_code': exit_code,
+    'elapsed_ms': elapsed_ms,
+    'heavy_imports': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+# Slowdown against the baseline that is never reported as a regression
+NOISE_MS = 5
+
+# Scenario name -> arguments passed to the console script
+SCENARIOS = {
+    'help': ['--help'],
+    # Every hook finds no tracked file in an empty repository, including ament_lint_cmake
+    'no-files': ['--git-files'],
+}
+
+
+def console_scripts():
+    """Return the (name, module, function) of every console script in setup.cfg."""
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPOSITORY_DIR, 'setup.cfg'))
+    scripts = []
+    for line in config['options.entry_points']['console_scripts'].strip().splitlines():
+        name, target = (part.strip() for part in line.split('='))
+        module, function = target.split(':')
+        scripts.append((name, module, function))
+    return scripts
+
+
+def run_python(args, cwd):
+    """Run a fresh interpreter and return its wall time in ms and its output."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [REPOSITORY_DIR, os.environ.get('PYTHONPATH')])))
+    # Installed hooks have their bytecode, so it is written by the first run and reused
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f'{" ".join(args)} failed:\n{result.stderr}')
+    return elapsed_ms, result.stdout
+
+
+def measure(runs):
+    """Return the best startup time of every console script in every scenario.
+
+    The best of several runs is the least affected by other load on the machine. The
+    overhead is the time the script takes to import and run inside the interpreter, which
+    leaves out starting the interpreter and the process, as that varies a lot between
+    machines and Python installations and with the load of the machine.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        subprocess.run(['git', 'init', '-q', workspace], check=True)
+        for name, module, function in console_scripts():
+            snippet = SNIPPET.format(module=module, function=function, heavy=HEAVY_MODULES)
+            for scenario, argv in SCENARIOS.items():
+                timings = []
+                overheads = []
+                for _ in range(runs):
+                    elapsed_ms, output = run_python(['-c', snippet, *argv], workspace)
+                    report = json.loads(output.strip().splitlines()[-1])
+                    timings.append(elapsed_ms)
+                    overheads.append(report['elapsed_ms'])
+                results[f'{name} {scenario}'] = {
+                    'best_ms': round(min(timings), 1),
+                    'overhead_ms': round(min(overheads), 1),
+                    'exit_code': report['exit_code'],
+                    'heavy_imports': report['heavy_imports'],
+                }
+    return results
+
+
+def check(results, baseline, max_ms, tolerance):
+    """Return the regressions of the results against the limits and the baseline."""
+    regressions = []
+    for key, result in results.items():
+        if result['heavy_imports']:
+            regressions.append(f'{key}: imports {", ".join(result["heavy_imports"])}')
+        if result['exit_code'] not in (0, None):
+            regressions.append(f'{key}: exit code {result["exit_code"]}')
+        if result['overhead_ms'] > max_ms:
+            regressions.append(
+                f'{key}: {result["overhead_ms"]} ms overhead is above {max_ms} ms')
+        previous = baseline.get(key)
+        # A few ms of slack, since process startup is noisy at this scale
+        if previous and \
+                result['overhead_ms'] > previous['overhead_ms'] * (1 + tolerance) + NOISE_MS:
+            regressions.append(
+                f'{key}: {result["overhead_ms"]} ms overhead is more than {tolerance:.0%} '
+                f'above the baseline {previous["overhead_ms"]} ms')
+    return regressions
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description='Measure the startup time of every console script.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '--runs', type=int, default=5, help='The number of runs per script and scenario')
+    parser.add_argument(
+        '--max-ms', type=float, default=50,
+        help='The maximum time to import and run a script inside the interpreter')
+    parser.add_argument(
+        '--baseline', metavar='FILE', help='Compare against results saved with --save')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='The allowed slowdown relative to the baseline, as a fraction')
+    parser.add_argument('--save', metavar='FILE', help='Save the results as a baseline')
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs)
+    for key, result in results.items():
+        print(f'{key:<28} {result["best_ms"]:>8.1f} ms {result["overhead_ms"]:>+8.1f} ms')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = check(results, baseline, args.max_ms, args.tolerance)
+    for regression in regressions:
+        print(f'regression: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Generate a synthetic colcon workspace to benchmark the hooks on."""
+import argparse
+import os
+import random
+import sys
+
+# Files per package, roughly as in the packages of a typical ROS 2 distribution
+CPP_PACKAGE_FILES = {'header': (2, 6), 'source': (2, 8), 'test': (1, 3), 'launch': (0, 2)}
+PYTHON_PACKAGE_FILES = {'module': (2, 8), 'test': (1, 4), 'launch': (0, 2)}
+# Share of C++ packages, the rest being Python packages
+CPP_PACKAGE_SHARE = 0.6
+
+PACKAGE_XML = '''<?xml version="1.0"?>
+<?xml-model href="http://download.ros.org/schema/package_format3.xsd" \
+schematypens="http://www.w3.org/2001/XMLSchema"?>
+<package format="3">
+  <name>{name}</name>
+  <version>0.0.0</version>
+  <description>Synthetic benchmark package</description>
+  <maintainer email="maintainer@example.com">Maintainer</maintainer>
+  <license>MIT</license>
+
+  <buildtool_depend>{buildtool}</buildtool_depend>
+{depends}
+  <test_depend>ament_lint_auto</test_depend>
+
+  <export>
+    <build_type>{build_type}</build_type>
+  </export>
+</package>
+'''
+
+CMAKE_LISTS = '''cmake_minimum_required(VERSION 3.8)
+project({name})
+
+find_package(ament_cmake REQUIRED)
+find_package(rclcpp REQUIRED)
+
+add_library(${{PROJECT_NAME}}
+{sources})
+target_include_directories(${{PROJECT_NAME}} PUBLIC
+  $<BUILD_INTERFACE:${{CMAKE_CURRENT_SOURCE_DIR}}/include>
+  $<INSTALL_INTERFACE:include>)
+ament_target_dependencies(${{PROJECT_NAME}} rclcpp)
+
+install(TARGETS ${{PROJECT_NAME}} EXPORT export_${{PROJECT_NAME}})
+
+if(BUILD_TESTING)
+  find_package(ament_lint_auto REQUIRED)
+  ament_lint_auto_find_test_dependencies()
+endif()
+
+ament_package()
+'''
+
+HEADER = '''// Copyright 2024 Example
+#ifndef {guard}
+#define {guard}
+
+namespace {name}
+{{
+
+{declarations}
+}}  // namespace {name}
+
+#endif  // {guard}
+'''
+
+SOURCE = '''// Copyright 2024 Example
+#include "{name}/{header}.hpp"
+
+namespace {name}
+{{
+
+{definitions}
+}}  // namespace {name}
+'''
+
+FUNCTION = '''int {function}(int value)
+{{
+  int result = value;
+  for (int i = 0; i < {count}; ++i) {{
+    result = (result * 31 + i) % 1000003;
+  }}
+  return result;
+}}
+'''
+
+PYTHON_MODULE = '''# Copyright 2024 Example
+"""Synthetic module {module} of {name}."""
+
+
+{functions}'''
+
+PYTHON_FUNCTION = '''def {function}(value):
+    """Return a value derived from the input."""
+    result = value
+    for i in range({count}):
+        result = (result * 31 + i) % 1000003
+    return result
+
+
+'''
+
+LAUNCH_XML = '''<launch>
+  <node pkg="{name}" exec="{name}_node" name="{name}" output="screen"/>
+</launch>
+'''
+
+
+def _functions(rng, template, prefix):
+    return ''.join(
+        template.format(function=f'{prefix}_{index}', count=rng.randint(2, 50))
+        for index in range(rng.randint(3, 30)))
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _cpp_package(rng, root, name):
+    headers = [f'{name}_{index}' for index in range(rng.randint(*CPP_PACKAGE_FILES['header']))]
+    sources = []
+    for index in range(rng.randint(*CPP_PACKAGE_FILES['source'])):
+        header = rng.choice(headers)
+        sources.append(f'src/{header}_{index}.cpp')
+        definitions = _functions(rng, FUNCTION, f'compute_{index}')
+        _write(os.path.join(root, sources[-1]), SOURCE.format(
+            name=name, header=header, definitions=definitions))
+    for header in headers:
+        declarations = ''.join(
+            f'int compute_{index}_{function}(int value);\n'
+            for index in range(3) for function in range(rng.randint(1, 10)))
+        _write(os.path.join(root, 'include', name, f'{header}.hpp'), HEADER.format(
+            guard=f'{name}__{header}_HPP_'.upper(), name=name, declarations=declarations))
+    for index in range(rng.randint(*CPP_PACKAGE_FILES['test'])):
+        _write(os.path.join(root, 'test', f'test_{name}_{index}.cpp'), SOURCE.format(
+            name=name, header=headers[0], definitions=_functions(rng, FUNCTION, 'test')))
+    for index in range(rng.randint(*CPP_PACKAGE_FILES['launch'])):
+        _write(os.path.join(root, 'launch', f'{name}_{index}.launch.xml'),
+               LAUNCH_XML.format(name=name))
+    _write(os.path.join(root, 'CMakeLists.txt'), CMAKE_LISTS.format(
+        name=name, sources=''.join(f'  {source}\n' for source in sources)))
+    if rng.random() < 0.2:
+        _write(os.path.join(root, 'cmake', f'{name}-extras.cmake'),
+               f'set({name}_FOUND_EXTRAS TRUE)\n')
+    _write(os.path.join(root, 'package.xml'), PACKAGE_XML.format(
+        name=name, buildtool='ament_cmake', build_type='ament_cmake',
+        depends='  <depend>rclcpp</depend>\n'))
+
+
+def _python_package(rng, root, name):
+    _write(os.path.join(root, name, '__init__.py'), '')
+    for index in range(rng.randint(*PYTHON_PACKAGE_FILES['module'])):
+        module = f'{name}_{index}'
+        _write(os.path.join(root, name, f'{module}.py'), PYTHON_MODULE.format(
+            module=module, name=name,
+            functions=_functions(rng, PYTHON_FUNCTION, 'compute').rstrip('\n') + '\n'))
+    for index in range(rng.randint(*PYTHON_PACKAGE_FILES['test'])):
+        _write(os.path.join(root, 'test', f'test_{name}_{index}.py'), PYTHON_MODULE.format(
+            module=f'test_{index}', name=name,
+            functions=_functions(rng, PYTHON_FUNCTION, 'test').rstrip('\n') + '\n'))
+    for index in range(rng.randint(*PYTHON_PACKAGE_FILES['launch'])):
+        _write(os.path.join(root, 'launch', f'{name}_{index}.launch.xml'),
+               LAUNCH_XML.format(name=name))
+    _write(os.path.join(root, 'setup.py'), (
+        'from setuptools import setup\n\n'
+        f"setup(name='{name}', version='0.0.0', packages=['{name}'])\n"))
+    _write(os.path.join(root, 'resource', name), '')
+    _write(os.path.join(root, 'package.xml'), PACKAGE_XML.format(
+        name=name, buildtool='ament_python', build_type='ament_python',
+        depends='  <exec_depend>rclpy</exec_depend>\n'))
+
+
+def generate_workspace(root, packages=20, seed=0, build_artifacts=True):
+    """Generate a colcon workspace with the given number of packages below root/src.
+
+    With build artifacts, colcon's build, install and log directories are filled with
+    files as after a build, which discovery has to skip.
+    """
+    rng = random.Random(seed)
+    for index in range(packages):
+        name = f'package_{index:04d}'
+        package_root = os.path.join(root, 'src', name)
+        if rng.random() < CPP_PACKAGE_SHARE:
+            _cpp_package(rng, package_root, name)
+        else:
+            _python_package(rng, package_root, name)
+
+    if build_artifacts:
+        for directory in ('build', 'install', 'log'):
+            _write(os.path.join(root, directory, 'COLCON_IGNORE'), '')
+        for index in range(packages):
+            name = f'package_{index:04d}'
+            _write(os.path.join(root, 'build', name, 'ament_cmake_core', 'stamps',
+                                'package.xml.stamp'), '')
+            _write(os.path.join(root, 'install', name, 'share', name, 'package.xml'), '')
+            _write(os.path.join(root, 'build', name, 'CMakeFiles', f'{name}.dir',
+                                'generated.cpp'), '// generated\n')
+    return root
+
+
+def count_files(root):
+    """Return the number of files below root/src by extension."""
+    counts = {}
+    for _, _, files in os.walk(os.path.join(root, 'src')):
+        for file in files:
+            extension = os.path.splitext(file)[1] or '(none)'
+            counts[extension] = counts.get(extension, 0) + 1
+    return counts
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic colcon workspace.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('root', help='The directory to generate the workspace in')
+    parser.add_argument('--packages', type=int, default=20, help='The number of packages')
+    parser.add_argument('--seed', type=int, default=0, help='The random seed')
+    parser.add_argument(
+        '--no-build-artifacts', action='store_true',
+        help='Do not generate colcon build, install and log directories')
+    args = parser.parse_args(argv)
+
+    generate_workspace(args.root, args.packages, args.seed, not args.no_build_artifacts)
+    for extension, count in sorted(count_files(args.root).items()):
+        print(f'{extension:<16} {count:>6}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import argparse
+
+from ament_lint_pre_commit_hooks.cache import CachedRun, LintCache
+
+
+def _run(tmp_path, monkeypatch, name, output, exit_code, files=('a.cpp', 'b.cpp')):
+    monkeypatch.chdir(tmp_path)
+    for path in files:
+        (tmp_path / path).write_text('\n')
+    cache = LintCache(str(tmp_path / 'cache' / 'results.sqlite'), 1 << 20)
+    args = argparse.Namespace()
+    cached_run = CachedRun(cache, name, args, files, 'image')
+    for line in output:
+        cached_run.observe(line)
+    cached_run.record(exit_code)
+
+    cache = LintCache(str(tmp_path / 'cache' / 'results.sqlite'), 1 << 20)
+    return {path: cache.get(key) for path, key in CachedRun(
+        cache, name, args, files, 'image').keys.values()}
+
+
+def test_informational_lines_are_not_findings(tmp_path, monkeypatch):
+    results = _run(tmp_path, monkeypatch, 'ament_xmllint', [
+        'a.xml:1: parser error : Document is empty',
+        'b.xml validates',
+    ], 1, files=('a.xml', 'b.xml'))
+
+    assert results == {
+        'a.xml': (False, ['a.xml:1: parser error : Document is empty']),
+        'b.xml': (True, []),
+    }
+
+
+def test_diff_blocks_are_findings(tmp_path, monkeypatch):
+    diff = [
+        "Code style divergence in file 'b.cpp':",
+        '',
+        '--- b.cpp',
+        '+++ b.cpp.uncrustify',
+        '@@ -1 +1 @@',
+        '-int main() {}',
+        '+int main() { }',
+    ]
+    results = _run(tmp_path, monkeypatch, 'ament_uncrustify', [*diff, '1 files with errors'], 1)
+
+    assert results == {'a.cpp': (True, []), 'b.cpp': (False, diff)}
+
+
+def test_unattributed_failure_is_not_cached(tmp_path, monkeypatch):
+    results = _run(tmp_path, monkeypatch, 'ament_cpplint', [
+        'a.cpp:1:  Missing copyright  [legal/copyright] [5]',
+        'include/c.h:1:  Missing copyright  [legal/copyright] [5]',
+    ], 1)
+    assert results == {'a.cpp': None, 'b.cpp': None}
+
+    results = _run(tmp_path, monkeypatch, 'ament_cpplint', [
+        'Done processing a.cpp',
+        'Done processing b.cpp',
+    ], 1)
+    assert results == {'a.cpp': None, 'b.cpp': None}
+
+
+def _keys(name, files):
+    return {path: key for path, key in CachedRun(
+        object(), name, argparse.Namespace(), files, 'image').keys.values()}
+
+
+def test_cpplint_config_files_are_keyed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'a.cpp').write_text('\n')
+    keys = _keys('ament_cpplint', ['src/a.cpp'])
+
+    (tmp_path / 'src' / 'CPPLINT.cfg').write_text('linelength=120\n')
+    added = _keys('ament_cpplint', ['src/a.cpp'])
+    (tmp_path / 'CPPLINT.cfg').write_text('filter=-build/include_order\n')
+    parent_added = _keys('ament_cpplint', ['src/a.cpp'])
+    (tmp_path / 'src' / 'CPPLINT.cfg').write_text('linelength=100\n')
+    edited = _keys('ament_cpplint', ['src/a.cpp'])
+
+    assert len({keys['src/a.cpp'], added['src/a.cpp'], parent_added['src/a.cpp'],
+                edited['src/a.cpp']}) == 4
+
+
+def test_local_schemas_are_keyed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'a.xml').write_text(
+        '<?xml version="1.0"?>\n'
+        '<?xml-model href="schema.xsd" schematypens="http://www.w3.org/2001/XMLSchema"?>\n'
+        '<a/>\n')
+    (tmp_path / 'schema.xsd').write_text('<schema/>\n')
+    keys = _keys('ament_xmllint', ['a.xml'])
+
+    (tmp_path / 'schema.xsd').write_text('<schema></schema>\n')
+    assert _keys('ament_xmllint', ['a.xml']) != keys
@@ -0,0 +1,32 @@
+import os
+
+from ament_lint_pre_commit_hooks.discovery import find_files
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w'):
+        pass
+
+
+def test_explicit_file_below_excluded_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _touch(os.path.join('third_party', 'lib', 'a.cpp'))
+    _touch(os.path.join('src', 'b.cpp'))
+    paths = [os.path.join('third_party', 'lib', 'a.cpp'), os.path.join('src', 'b.cpp')]
+
+    assert find_files(paths, lambda path: True, ['third_party']) == [paths[1]]
+    assert find_files(paths, lambda path: True, ['third_party/']) == [paths[1]]
+    assert find_files(paths, lambda path: True, ['third_party/lib']) == [paths[1]]
+    assert find_files(paths, lambda path: True, ['/src']) == [paths[0]]
+    assert find_files(paths, lambda path: True, ['other']) == paths
+
+
+def test_walked_file_below_excluded_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _touch(os.path.join('third_party', 'a.cpp'))
+    _touch(os.path.join('src', 'b.cpp'))
+
+    assert find_files(['.'], lambda path: True, ['third_party']) == [
+        os.path.join('.', 'src', 'b.cpp')]
+    assert find_files(['third_party'], lambda path: True, ['third_party']) == []
@@ -0,0 +1,19 @@
+from ament_lint_pre_commit_hooks.ament_lint_all import split_linter_arguments
+
+
+def test_short_options_end_linter_options():
+    own_argv, linter_argv = split_linter_arguments(
+        ['--cpplint-filters', '-whitespace/braces', '-j', '4', '--uncrustify-reformat', 'src'])
+
+    assert own_argv == ['-j', '4', 'src']
+    assert linter_argv['cpplint'] == ['--filters', '-whitespace/braces']
+    assert linter_argv['uncrustify'] == ['--reformat']
+
+
+def test_variable_length_linter_options():
+    own_argv, linter_argv = split_linter_arguments(
+        ['--xmllint-extensions', 'xml', 'launch', '-j', '2', '--cpplint-filters=-legal', 'src'])
+
+    assert own_argv == ['-j', '2', 'src']
+    assert linter_argv['xmllint'] == ['--extensions', 'xml', 'launch']
+    assert linter_argv['cpplint'] == ['--filters=-legal']
@@ -0,0 +1,48 @@
+import asyncio
+import socket
+import ssl
+import struct
+
+from ament_lint_pre_commit_hooks.orchestrator import Orchestrator, _raw_socket
+
+
+def _frame(stream, data):
+    return struct.pack('>BxxxL', stream, len(data)) + data
+
+
+class _BlockingSocket:
+    """A socket the event loop cannot read, like the TLS sockets of remote daemons."""
+
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+
+    def recv(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_tls_socket_is_not_raw():
+    plain, other = socket.socketpair()
+    tls = ssl.create_default_context().wrap_socket(
+        other, server_hostname='docker', do_handshake_on_connect=False)
+    try:
+        assert _raw_socket(plain) is plain
+        assert _raw_socket(tls) is None
+        assert _raw_socket(_BlockingSocket(b'')) is None
+    finally:
+        plain.close()
+        tls.close()
+
+
+def test_stream_non_raw_socket():
+    sock = _BlockingSocket(_frame(1, b'a.py:1:1: E1 x\n') + _frame(2, b'warning\n'))
+    output = []
+    with Orchestrator(None) as orchestrator:
+        asyncio.run(orchestrator.stream(sock, lambda *item: output.append(item)))
+
+    assert output == [(1, b'a.py:1:1: E1 x\n'), (2, b'warning\n')]
+    assert sock.closed
@@ -0,0 +1,63 @@
+import difflib
+import os
+
+from ament_lint_pre_commit_hooks.patches import (apply_hunks,
+                                                 parse_unified_diffs)
+
+
+def _diff(path, old, new):
+    return list(difflib.unified_diff(
+        old.splitlines(), new.splitlines(), path, f'{path}.uncrustify', lineterm=''))
+
+
+def _hunks(old, new):
+    return parse_unified_diffs(_diff('a.cpp', old, new))[os.path.abspath('a.cpp')]
+
+
+def test_parse_unified_diffs():
+    lines = [
+        "Code style divergence in file 'a.cpp':",
+        '',
+        *_diff('a.cpp', 'a\nb  \nc\n', 'a\nb\nc\n'),
+        *_diff('b.cpp', 'x\n', 'x\ny\n'),
+        '2 files with code style divergence',
+    ]
+    assert parse_unified_diffs(lines) == {
+        os.path.abspath('a.cpp'): [(1, ['a', 'b  ', 'c'], ['a', 'b', 'c'])],
+        os.path.abspath('b.cpp'): [(1, ['x'], ['x', 'y'])],
+    }
+
+
+def test_parse_incomplete_diff():
+    lines = _diff('a.cpp', 'a\nb  \n', 'a\nb\n')
+    assert parse_unified_diffs(lines[:-1]) == {os.path.abspath('a.cpp'): None}
+
+
+def test_apply_insertion_at_start():
+    old = 'int a;\n'
+    new = '// Copyright\nint a;\n'
+    hunks = [(0, [], ['// Copyright'])]
+    assert apply_hunks(old, hunks) == new
+    assert apply_hunks(old, _hunks(old, new)) == new
+
+
+def test_apply_several_hunks():
+    old = ''.join(f'line {i}\n' for i in range(20)).replace('line 2\n', 'line  2\n')
+    old = old.replace('line 17\n', 'line  17\n')
+    new = ''.join(f'line {i}\n' for i in range(20))
+    hunks = _hunks(old, new)
+    assert len(hunks) == 2
+    assert apply_hunks(old, hunks) == new
+
+
+def test_apply_crlf():
+    old = 'a\r\nb  \r\nc\r\n'
+    new = 'a\r\nb\r\nc\r\n'
+    assert apply_hunks(old, _hunks('a\nb  \nc\n', 'a\nb\nc\n')) == new
+    assert apply_hunks(old, _hunks(old, new)) == new
+
+
+def test_apply_mismatch():
+    hunks = _hunks('a\nb  \n', 'a\nb\n')
+    assert apply_hunks('a\nc  \n', hunks) is None
+    assert apply_hunks('', hunks) is None
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ament_lint_pre_commit_hooks import relay
+from ament_lint_pre_commit_hooks.runner import (EXEC_SCRIPT, WATCHDOG_SCRIPT,
+                                                run_sharded)
+
+
+@pytest.mark.skipif(
+    sys.platform != 'linux' or shutil.which('sh') is None, reason='needs a Linux shell')
+def test_long_exec_keeps_the_container(tmp_path):
+    heartbeat = str(tmp_path / 'heartbeat')
+    watchdog = subprocess.Popen(
+        ['sh', '-c', WATCHDOG_SCRIPT.format(heartbeat=heartbeat, timeout=2)])
+    try:
+        start = time.monotonic()
+        result = subprocess.run(
+            ['sh', '-c', EXEC_SCRIPT.format(heartbeat=heartbeat), 'sh',
+             'sh', '-c', 'sleep 4; echo done; exit 3'],
+            stdout=subprocess.PIPE, text=True, timeout=10)
+
+        assert result.returncode == 3
+        assert result.stdout == 'done\n'
+        assert time.monotonic() - start < 6
+        # The linter ran longer than the idle timeout, which only starts once it is done
+        assert watchdog.poll() is None
+        assert watchdog.wait(timeout=10) == 0
+    finally:
+        watchdog.kill()
+
+
+class _ShardBackend:
+    """Runs shards concurrently, the last one finishing first."""
+
+    name = 'host'
+    concurrent = True
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.seen = []
+
+    @contextlib.contextmanager
+    def session(self, max_workers=None):
+        yield None
+
+    async def run(self, session, cmd, volumes, args, output):
+        shard = cmd[-1]
+        output.feed(1, f'{shard}: started\n'.encode())
+        await asyncio.sleep(0.05 if shard == 'a.py' else 0.01)
+        # The output of the shard in front is written before it finishes
+        self.seen.append((shard, self.stdout.getvalue()))
+        output.feed(1, f'{shard}: done\n'.encode())
+        output.close()
+        return 1 if shard == 'b.py' else 0
+
+
+def test_sharded_output_is_streamed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ('a.py', 'b.py'):
+        (tmp_path / name).write_text('\n')
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    # Write every block at once rather than in batches
+    monkeypatch.setattr(relay, 'FLUSH_INTERVAL', 0)
+    backend = _ShardBackend(stdout)
+
+    exit_code = run_sharded(
+        backend, argparse.Namespace(), ['a.py', 'b.py'],
+        lambda args, files, cwd: ([*files], {}), 2, raw=True)
+
+    assert exit_code == 1
+    assert backend.seen == [('b.py', 'a.py: started\n'), ('a.py', 'a.py: started\n')]
+    assert stdout.getvalue() == 'a.py: started\na.py: done\nb.py: started\nb.py: done\n'
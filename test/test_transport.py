@@ -0,0 +1,34 @@
+import os
+
+from ament_lint_pre_commit_hooks.mounts import workspace_mount
+from ament_lint_pre_commit_hooks.transport import Archive
+
+
+def test_archive_sends_the_tree_of_a_mount(tmp_path):
+    cwd = str(tmp_path)
+    for path in ['src/a.py', 'pkg/__init__.py', 'pkg/b.pyi', 'pkg/py.typed', 'pkg/README.md',
+                 'build/COLCON_IGNORE', 'build/c.py']:
+        os.makedirs(os.path.dirname(os.path.join(cwd, path)), exist_ok=True)
+        open(os.path.join(cwd, path), 'w').close()
+
+    archive = Archive(
+        [['mypy', os.path.join(cwd, 'src', 'a.py')]],
+        workspace_mount(cwd, tree=('.py', '.pyi', 'py.typed')), cwd)
+
+    assert sorted(archive.files) == [
+        '/workspace/pkg/__init__.py', '/workspace/pkg/b.pyi', '/workspace/pkg/py.typed',
+        '/workspace/src/a.py']
+    assert sorted(Archive(
+        [['mypy', os.path.join(cwd, 'src', 'a.py')]], workspace_mount(cwd), cwd).files) == [
+        '/workspace/src/a.py']
+
+
+def test_archive_clears_the_workspace(tmp_path):
+    cwd = str(tmp_path)
+    config = tmp_path.parent / 'config.cfg'
+    volumes = {
+        os.path.join(cwd, 'src'): {'bind': '/workspace/src', 'mode': 'ro'},
+        str(config): {'bind': str(config), 'mode': 'ro'},
+        'ament_lint_cache': {'bind': '/ament_lint_cache', 'mode': 'rw', 'volume': True},
+    }
+    assert Archive([], volumes, cwd).stale_paths() == sorted(['/workspace', str(config)])
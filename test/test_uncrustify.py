@@ -0,0 +1,54 @@
+import difflib
+
+from ament_lint_pre_commit_hooks import ament_uncrustify
+
+
+class _Backend:
+    name = 'host'
+
+    def toolchain_id(self):
+        return 'test'
+
+
+def _diff(path, old, new):
+    return [
+        f"Code style divergence in file '{path}':",
+        '',
+        *difflib.unified_diff(
+            old.splitlines(), new.splitlines(), path, f'{path}.uncrustify', lineterm='')]
+
+
+def test_reformat(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    contents = {
+        'a.cpp': b'int a;\r\nint  b;\r\n',
+        'b.cpp': b'int c;\n',
+        # The diff printed for this file does not match it
+        'c.cpp': b'int  d;',
+    }
+    for path, data in contents.items():
+        (tmp_path / path).write_bytes(data)
+
+    runs = []
+
+    def run_linter(backend, name, args, files, build_command, output=None):
+        runs.append((args.reformat, files))
+        if len(runs) > 1:
+            return 0
+        for line in [*_diff('a.cpp', 'int a;\nint  b;\n', 'int a;\nint b;\n'),
+                     *_diff('c.cpp', 'int  e;\n', 'int e;\n'),
+                     '2 files with code style divergence']:
+            output(line)
+        return 1
+
+    monkeypatch.setattr(ament_uncrustify, 'run_linter', run_linter)
+    args = ament_uncrustify.create_parser().parse_args(['--reformat', *contents])
+
+    assert ament_uncrustify.reformat(_Backend(), args, list(contents)) == 1
+    # The diff is applied on the host, only the others are reformatted by uncrustify
+    assert runs == [(False, ['a.cpp', 'b.cpp', 'c.cpp']), (True, ['c.cpp'])]
+    assert (tmp_path / 'a.cpp').read_bytes() == b'int a;\r\nint b;\r\n'
+    assert (tmp_path / 'b.cpp').read_bytes() == contents['b.cpp']
+    assert (tmp_path / 'c.cpp').read_bytes() == contents['c.cpp']
+    assert 'Reformatted a.cpp' in capsys.readouterr().out
@@ -0,0 +1,27 @@
+import pytest
+
+from ament_lint_pre_commit_hooks import ament_xmllint
+
+pytest.importorskip('lxml')
+
+
+def test_launch_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    (tmp_path / 'a.launch').write_text('<launch/>\n')
+    (tmp_path / 'b.launch').write_text('<launch>\n')
+
+    assert ament_xmllint.main(['a.launch', '--extensions', 'launch']) == 0
+    assert 'No problems found' in capsys.readouterr().out
+    assert ament_xmllint.main(['--no-cache', '--extensions', 'launch']) == 1
+    assert 'b.launch' in capsys.readouterr().out
+
+
+def test_launch_file_in_container_command(tmp_path):
+    args = ament_xmllint.create_parser().parse_args(['a.launch', '--extensions', 'launch'])
+    cmd, _ = ament_xmllint.build_command(args, ['a.launch'], str(tmp_path))
+
+    assert cmd == ['ament_xmllint', '--extensions', 'launch', '--', 'a.launch']
+    parser_args = ament_xmllint.create_parser().parse_args(cmd[1:])
+    assert parser_args.paths == ['a.launch']
+    assert parser_args.extensions == ['launch']